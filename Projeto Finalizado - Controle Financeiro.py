@@ -1,19 +1,20 @@
 import streamlit as st
-import pandas as pd
 import uuid
 import os
-import hashlib
 from datetime import date, datetime
-import matplotlib.pyplot as plt
-from reportlab.platypus import Image
-from reportlab.lib.units import cm
 
-# PDF
-from reportlab.lib.pagesizes import A4
-from reportlab.pdfgen import canvas
-from io import BytesIO
+from financeiro import perfil
 
 
+# -----------------------------
+# Medição do rerun
+# -----------------------------
+# CF_DEBUG=1 mostra o painel de desempenho na barra lateral; CF_PERFIL_LOG
+# define o arquivo JSON lines dos reruns (sem ela, não há log)
+PAINEL_DESEMPENHO = os.environ.get("CF_DEBUG") == "1"
+perfil_rerun = perfil.PerfilRerun()
+perfil_rerun.marcar("cabecalho")
+
 # -----------------------------
 # Configuração e título
 # -----------------------------
@@ -61,194 +62,6 @@ with col_title:
 
 st.markdown("<div class='header-divider'></div>", unsafe_allow_html=True)
 
-# -----------------------------
-# Funções auxiliares
-# -----------------------------
-def gerar_nome_arquivo(email):
-    hash_email = hashlib.md5(email.strip().lower().encode()).hexdigest()
-    return f"gastos_{hash_email}.csv"
-
-def to_iso_date(d):
-    if isinstance(d, (pd.Timestamp, datetime)):
-        return d.date().isoformat()
-    if isinstance(d, date):
-        return d.isoformat()
-    try:
-        return pd.to_datetime(d, dayfirst=True).date().isoformat()
-    except Exception:
-        return None
-
-def ensure_schema(df):
-    expected = ["Id", "Data", "Tipo", "Descrição", "Valor", "Forma de pagamento", "Categoria"]
-    for c in expected:
-        if c not in df.columns:
-            df[c] = pd.Series(dtype="object")
-    return df[expected]
-
-def gerar_pdf(df, ano, mes):
-    from reportlab.lib.utils import ImageReader
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-
-    # ==========================
-    # DESENHAR LOGO NO PDF
-    # ==========================
-    logo_path = None
-    possible = [
-        "logo.png",
-        os.path.join(os.getcwd(), "logo.png"),
-        os.path.expanduser("~/OneDrive/logo.png"),
-    ]
-    
-    for p in possible:
-        if os.path.exists(p):
-            logo_path = p
-            break
-
-    if logo_path:
-        try:
-            img = ImageReader(logo_path)
-            iw, ih = img.getSize()
-            target_w = 90
-            target_h = (ih / iw) * target_w
-            x = (width - target_w) / 2
-            y = height - (target_h + 20)
-            c.drawImage(img, x, y, width=target_w, height=target_h, mask='auto')
-        except Exception as e:
-            print("Erro ao inserir logo no PDF:", e)
-        title_y = y - 25
-    else:
-        title_y = height - 70
-
-    # ==========================
-    # TÍTULO
-    # ==========================
-    c.setFont("Helvetica-Bold", 20)
-    c.setFillColorRGB(0.30, 0.40, 0.95)
-    c.drawCentredString(width/2, title_y, "Relatório Financeiro")
-
-    c.setFont("Helvetica", 12)
-    c.setFillColorRGB(0, 0, 0)
-    c.drawCentredString(width/2, title_y - 20, f"Período: {mes:02d}/{ano}")
-
-    c.setFont("Helvetica", 9)
-    c.setFillColorRGB(0.3, 0.3, 0.3)
-    c.drawCentredString(
-        width/2,
-        title_y - 35,
-        f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
-    )
-
-    # ==========================
-    # PREPARAR DADOS
-    # ==========================
-    df = df.copy()
-    df["Data"] = pd.to_datetime(df["Data"], errors="coerce")
-    df["Data Formatada"] = df["Data"].dt.strftime("%d/%m/%Y")
-    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0)
-
-    # ==========================
-    # RESUMO FINANCEIRO
-    # ==========================
-    resumo_y = title_y - 65
-    
-    total_receitas = df[df["Tipo"] == "Receita"]["Valor"].sum()
-    despesas_sem_cartao = df[(df["Tipo"] == "Despesa") & (df["Forma de pagamento"] != "Cartão")]["Valor"].sum()
-    despesas_cartao = df[(df["Tipo"] == "Despesa") & (df["Forma de pagamento"] == "Cartão")]["Valor"].sum()
-    saldo = total_receitas - despesas_sem_cartao
-
-    # Box do resumo
-    c.setFillColorRGB(0.95, 0.95, 0.95)
-    c.roundRect(70, resumo_y - 95, width - 140, 105, 8, fill=1, stroke=1)
-
-    c.setFont("Helvetica-Bold", 14)
-    c.setFillColorRGB(0, 0, 0)
-    c.drawCentredString(width/2, resumo_y - 15, "Resumo Financeiro:")
-
-    # Total de Receitas (verde)
-    c.setFont("Helvetica", 12)
-    c.setFillColorRGB(0, 0.6, 0)
-    c.drawString(90, resumo_y - 35, f"Total de Receitas: R$ {total_receitas:.2f}")
-
-    # Despesas sem cartão (vermelho)
-    c.setFillColorRGB(0.8, 0, 0)
-    c.drawString(90, resumo_y - 52, f"Total de Despesas (sem cartão): R$ {despesas_sem_cartao:.2f}")
-
-    # Saldo (preto)
-    c.setFont("Helvetica-Bold", 12)
-    c.setFillColorRGB(0, 0, 0)
-    c.drawString(90, resumo_y - 69, f"Saldo: R$ {saldo:.2f}")
-
-    # Gastos no cartão (laranja) - DENTRO DA CAIXA
-    c.setFont("Helvetica", 11)
-    c.setFillColorRGB(0.9, 0.5, 0)
-    c.drawString(90, resumo_y - 86, f"Gastos no Cartão (não descontados): R$ {despesas_cartao:.2f}")
-
-    # ==========================
-    # TABELA
-    # ==========================
-    y = resumo_y - 130
-    c.setFillColorRGB(0.40, 0.42, 0.95)
-    c.rect(40, y, width - 80, 22, fill=1, stroke=0)
-
-    c.setFont("Helvetica-Bold", 10)
-    c.setFillColorRGB(1, 1, 1)
-    c.drawString(50, y + 6, "Data")
-    c.drawString(110, y + 6, "Tipo")
-    c.drawString(165, y + 6, "Descrição")
-    c.drawString(320, y + 6, "Categoria")
-    c.drawString(420, y + 6, "Forma")
-    c.drawString(500, y + 6, "Valor")
-
-    y -= 26
-    row_height = 20
-
-    for i, row in df.iterrows():
-        if y < 60:
-            c.showPage()
-            y = height - 100
-
-            c.setFillColorRGB(0.40, 0.42, 0.95)
-            c.rect(40, y, width - 80, 22, fill=1, stroke=0)
-            c.setFont("Helvetica-Bold", 10)
-            c.setFillColorRGB(1, 1, 1)
-            c.drawString(50, y + 6, "Data")
-            c.drawString(110, y + 6, "Tipo")
-            c.drawString(165, y + 6, "Descrição")
-            c.drawString(320, y + 6, "Categoria")
-            c.drawString(420, y + 6, "Forma")
-            c.drawString(500, y + 6, "Valor")
-            y -= 26
-
-        if i % 2 == 0:
-            c.setFillColorRGB(0.95, 0.95, 0.95)
-            c.rect(40, y - 2, width - 80, row_height, fill=1, stroke=0)
-
-        c.setFont("Helvetica", 9)
-        c.setFillColorRGB(0, 0, 0)
-
-        c.drawString(50, y, str(row["Data Formatada"]))
-        c.drawString(110, y, str(row["Tipo"])[:8])
-        c.drawString(165, y, str(row["Descrição"])[:25])
-        c.drawString(320, y, str(row["Categoria"])[:15])
-        c.drawString(420, y, str(row["Forma de pagamento"])[:12])
-
-        # Cor do valor baseado no tipo
-        if row["Tipo"] == "Receita":
-            c.setFillColorRGB(0, 0.55, 0)
-        else:
-            c.setFillColorRGB(0.9, 0, 0)
-
-        c.drawRightString(530, y, f"R$ {row['Valor']:.2f}")
-
-        y -= row_height
-
-    c.save()
-    buffer.seek(0)
-    return buffer
-
-
 # -----------------------------
 # Entrada de e-mail
 # -----------------------------
@@ -257,53 +70,55 @@ if not email_usuario:
     st.warning("Por favor, digite seu e-mail para continuar.")
     st.stop()
 
+# pandas e os módulos do ledger só são importados depois do e-mail, para a tela
+# inicial abrir rápido; ReportLab e matplotlib ficam para quando um PDF ou
+# gráfico for de fato gerado
+perfil_rerun.marcar("imports")
+import pandas as pd
+
+from financeiro import backends, busca, cache_ledgers, graficos, importacao, recorrencias, relatorios, saldos, tendencias
+from financeiro.armazenamento import ConflitoDeEscrita
+from financeiro.esquema import converter_valor, to_iso_date
+
 # Caminhos de arquivos
-BASE_DIR = os.path.expanduser("~/OneDrive/ControleFinanceiro")
+BASE_DIR = backends.BASE_DIR
 os.makedirs(BASE_DIR, exist_ok=True)
-ARQUIVO_GASTOS = os.path.join(BASE_DIR, gerar_nome_arquivo(email_usuario))
-ARQUIVO_SALDOS = os.path.join(BASE_DIR, "saldos.csv")
+# Fora da pasta de dados por padrão: ela é sincronizada pelo OneDrive e cada
+# rerun viraria um upload
+ARQUIVO_PERFIL = os.environ.get("CF_PERFIL_LOG", "")
 
-# -----------------------------
-# Estado da sessão
-# -----------------------------
-if "gastos" not in st.session_state:
-    if os.path.exists(ARQUIVO_GASTOS):
+perfil_rerun.usuario = backends.hash_usuario(email_usuario)
+
+def concluir_rerun():
+    registro = perfil_rerun.finalizar()
+    if ARQUIVO_PERFIL:
         try:
-            df_gastos = pd.read_csv(ARQUIVO_GASTOS, sep=";")
-        except Exception:
-            df_gastos = pd.DataFrame(columns=["Id","Data","Tipo","Descrição","Valor","Forma de pagamento","Categoria"])
-    else:
-        df_gastos = pd.DataFrame(columns=["Id","Data","Tipo","Descrição","Valor","Forma de pagamento","Categoria"])
+            perfil.registrar(registro, ARQUIVO_PERFIL)
+        except OSError as e:
+            print("Erro ao gravar log de desempenho:", e)
+    return registro
 
-    if "Id" not in df_gastos.columns or df_gastos["Id"].duplicated().any():
-        df_gastos["Id"] = [str(uuid.uuid4()) for _ in range(len(df_gastos))]
+def reiniciar():
+    # st.rerun() interrompe o script: registra o perfil antes
+    concluir_rerun()
+    st.rerun()
 
-    df_gastos = ensure_schema(df_gastos)
-    st.session_state.gastos = df_gastos.to_dict(orient="records")
+perfil_rerun.marcar("carga")
 
-# Saldos
-if os.path.exists(ARQUIVO_SALDOS):
-    try:
-        df_saldos = pd.read_csv(ARQUIVO_SALDOS)
-    except Exception:
-        df_saldos = pd.DataFrame(columns=["Ano","Mês","Saldo"])
-else:
-    df_saldos = pd.DataFrame(columns=["Ano","Mês","Saldo"])
+# -----------------------------
+# Ledger do usuário
+# -----------------------------
+# Uma única instância por usuário no processo, compartilhada entre abas e
+# sessões. Só a lista de períodos é lida agora; cada mês é carregado (e tipado
+# uma única vez) quando é exibido
+ledger = cache_ledgers.obter_ledger(email_usuario, base_dir=BASE_DIR)
 
 # -----------------------------
-# DataFrame atualizado
+# Períodos disponíveis
 # -----------------------------
-df = pd.DataFrame(st.session_state.gastos)
-df = ensure_schema(df)
-df["Data"] = pd.to_datetime(df["Data"], format="%Y-%m-%d", errors="coerce")
-df = df.dropna(subset=["Data"])
-df["Data Formatada"] = df["Data"].dt.strftime("%d/%m/%Y")
-df["Ano"] = df["Data"].dt.year.astype(int)
-df["Mês"] = df["Data"].dt.month.astype(int)
-
-if not df.empty:
-    anos_disponiveis = sorted(df["Ano"].unique(), reverse=True)
-    meses_disponiveis = sorted(df["Mês"].unique())
+if ledger.periodos:
+    anos_disponiveis = ledger.anos()
+    meses_disponiveis = ledger.meses()
 else:
     anos_disponiveis = [datetime.now().year]
     meses_disponiveis = [datetime.now().month]
@@ -313,6 +128,7 @@ else:
 # -----------------------------
 
 # Controle de Transações
+perfil_rerun.marcar("formulario")
 with st.expander("💰 Adicionar Despesa", expanded=True):
     with st.form("form_transacao", clear_on_submit=True):
         col1, col2 = st.columns(2)
@@ -341,10 +157,32 @@ with st.expander("💰 Adicionar Despesa", expanded=True):
                 "Forma de pagamento": forma,
                 "Categoria": categoria
             }
-            st.session_state.gastos.append(novo)
-            pd.DataFrame(st.session_state.gastos).to_csv(ARQUIVO_GASTOS, sep=";", index=False)
+            ledger.inserir(novo)
             st.success(f"✅ {tipo} adicionada com sucesso!")
-            st.rerun()
+            reiniciar()
+
+# Importação de extratos
+perfil_rerun.marcar("importacao")
+with st.expander("📥 Importar Extrato (CSV/OFX)", expanded=False):
+    # A mensagem sobrevive ao rerun que atualiza os anos e meses do filtro
+    mensagem_importacao = st.session_state.pop("mensagem_importacao", None)
+    if mensagem_importacao:
+        st.success(mensagem_importacao)
+    arquivo_extrato = st.file_uploader("Extrato bancário ou fatura do cartão", type=["csv", "ofx", "txt"])
+    forma_extrato = st.selectbox("💳 Forma de pagamento das transações", ["Cartão", "Pix", "Dinheiro", "Boleto", "Transferência"], index=4)
+    despesas_positivas = st.checkbox(
+        "Compras aparecem com valor positivo (fatura do cartão)",
+        value=forma_extrato == "Cartão",
+        help="Sem coluna Tipo, define se valores positivos são despesas. Extratos de conta costumam trazer os débitos negativos.",
+    )
+    if arquivo_extrato is not None and st.button("📥 Importar"):
+        try:
+            importadas, duplicadas = importacao.importar(ledger, arquivo_extrato.getvalue(), arquivo_extrato.name, forma_extrato, despesas_positivas=despesas_positivas)
+        except ValueError as e:
+            st.warning(f"Não foi possível ler o extrato: {e}")
+        else:
+            st.session_state["mensagem_importacao"] = f"✅ {importadas} transação(ões) importada(s), {duplicadas} já existente(s) ignorada(s)."
+            reiniciar()
 
 # Filtro por mês/ano
 with st.expander("📅 Filtro por Mês e Ano", expanded=False):
@@ -352,179 +190,371 @@ with st.expander("📅 Filtro por Mês e Ano", expanded=False):
     ano_selecionado = colf1.selectbox("Ano", anos_disponiveis)
     mes_selecionado = colf2.selectbox("Mês", meses_disponiveis)
 
-df_filtrado = df[(df["Ano"] == int(ano_selecionado)) & (df["Mês"] == int(mes_selecionado))].copy()
+# -----------------------------
+# DataFrame do mês selecionado
+# -----------------------------
+# Frame tipado e compartilhado com o ledger: não deve ser alterado aqui
+perfil_rerun.marcar("filtro_mes")
+df_filtrado = ledger.mes(ano_selecionado, mes_selecionado)
+totais_mes = ledger.totais(ano_selecionado, mes_selecionado)
+perfil_rerun.contar("linhas_mes", len(df_filtrado))
+
+# Exclusões de registros que outra sessão alterou ao mesmo tempo são recusadas
+MENSAGEM_CONFLITO = "⚠️ Algum registro foi alterado em outra sessão enquanto você editava. Os dados foram recarregados: confira e tente de novo."
 
 # Saldo do mês como receita
+perfil_rerun.marcar("saldo_mes")
 with st.expander("💼 Adicionar Saldo do Mês como Receita", expanded=False):
-    # Verifica se já existe um saldo registrado neste mês
-    df_temp = pd.DataFrame(st.session_state.gastos)
-    if not df_temp.empty:
-        df_temp["Data"] = pd.to_datetime(df_temp["Data"], format="%Y-%m-%d", errors="coerce")
-        df_temp = df_temp.dropna(subset=["Data"])
-        df_temp["Ano"] = df_temp["Data"].dt.year.astype(int)
-        df_temp["Mês"] = df_temp["Data"].dt.month.astype(int)
-        
-        saldo_existente = df_temp[
-            (df_temp["Ano"] == int(ano_selecionado)) & 
-            (df_temp["Mês"] == int(mes_selecionado)) & 
-            (df_temp["Descrição"] == "Saldo inicial do mês")
-        ]
-        
-        if not saldo_existente.empty:
-            valor_atual = float(saldo_existente.iloc[0]["Valor"])
-            st.info(f"✅ Saldo do mês já registrado: R$ {valor_atual:.2f}")
-            
-            if st.button("🗑️ Remover saldo do mês"):
-                df_all = pd.DataFrame(st.session_state.gastos)
-                df_all = df_all[df_all["Id"] != saldo_existente.iloc[0]["Id"]]
-                st.session_state.gastos = df_all.to_dict(orient="records")
-                df_all.to_csv(ARQUIVO_GASTOS, sep=";", index=False)
-                st.success("Saldo removido!")
-                st.rerun()
-    
-    novo_saldo_str = st.text_input("Valor do saldo inicial (R$)", value="0,00")
+    # O saldo informado vem do índice agregado; as linhas só são lidas para remover
+    saldo_informado = ledger.saldo_informado(ano_selecionado, mes_selecionado)
+    saldo_existente = df_filtrado[saldos.linhas_de_saldo(df_filtrado)] if saldo_informado is not None else df_filtrado.iloc[0:0]
+
+    if saldo_informado is not None:
+        st.info(f"✅ Saldo do mês já registrado: R$ {saldo_informado:.2f}")
+
+        if st.button("🗑️ Remover saldo do mês"):
+            try:
+                ledger.excluir(*saldo_existente["Id"])
+            except ConflitoDeEscrita:
+                st.error(MENSAGEM_CONFLITO)
+            else:
+                st.success("Saldo removido! O saldo do mês anterior volta a ser transportado.")
+                reiniciar()
+    else:
+        st.caption(f"Sem saldo informado: o mês começa com o saldo final do anterior (R$ {ledger.saldo_inicial(ano_selecionado, mes_selecionado):.2f}).")
+
+    # Sugere o saldo transportado do mês anterior
+    sugestao = f"{ledger.saldo_inicial(ano_selecionado, mes_selecionado):.2f}".replace(".", ",")
+    novo_saldo_str = st.text_input("Valor do saldo inicial (R$)", value=sugestao)
     try:
-        novo_saldo = float(novo_saldo_str.replace(" ", "").replace(".", "").replace(",", "."))
+        novo_saldo = converter_valor(novo_saldo_str)
         if st.button("💾 Salvar saldo do mês"):
-            # Remove saldo anterior se existir
-            df_all = pd.DataFrame(st.session_state.gastos)
-            df_all["Data"] = pd.to_datetime(df_all["Data"], format="%Y-%m-%d", errors="coerce")
-            df_all = df_all.dropna(subset=["Data"])
-            df_all["Ano"] = df_all["Data"].dt.year.astype(int)
-            df_all["Mês"] = df_all["Data"].dt.month.astype(int)
-            
-            df_all = df_all[~(
-                (df_all["Ano"] == int(ano_selecionado)) & 
-                (df_all["Mês"] == int(mes_selecionado)) & 
-                (df_all["Descrição"] == "Saldo inicial do mês")
-            )]
-            
-            # Adiciona novo saldo como receita no primeiro dia do mês
-            from datetime import datetime
-            primeiro_dia = datetime(int(ano_selecionado), int(mes_selecionado), 1)
-            
-            novo_registro = {
-                "Id": str(uuid.uuid4()),
-                "Data": primeiro_dia.date().isoformat(),
-                "Tipo": "Receita",
-                "Descrição": "Saldo inicial do mês",
-                "Valor": float(novo_saldo),
-                "Forma de pagamento": "Saldo",
-                "Categoria": "Saldo Inicial"
-            }
-            
-            st.session_state.gastos = df_all.to_dict(orient="records")
-            st.session_state.gastos.append(novo_registro)
-            pd.DataFrame(st.session_state.gastos).to_csv(ARQUIVO_GASTOS, sep=";", index=False)
-            st.success("✅ Saldo do mês adicionado como receita!")
-            st.rerun()
+            # Adiciona novo saldo como receita no primeiro dia do mês,
+            # substituindo o anterior se existir
+            ids_antigos = saldo_existente["Id"].tolist()
+            novo_registro = saldos.registro_de_saldo(ano_selecionado, mes_selecionado, novo_saldo, str(uuid.uuid4()))
+
+            try:
+                ledger.excluir(*ids_antigos)
+            except ConflitoDeEscrita:
+                st.error(MENSAGEM_CONFLITO)
+            else:
+                ledger.inserir(novo_registro)
+                st.success("✅ Saldo do mês adicionado como receita!")
+                reiniciar()
     except ValueError:
         st.warning("Digite um valor válido para o saldo")
 
+# Recorrentes e parcelados
+perfil_rerun.marcar("recorrentes")
+with st.expander("🔁 Contas Recorrentes e Compras Parceladas", expanded=False):
+    with st.form("form_regra", clear_on_submit=True):
+        colr1, colr2 = st.columns(2)
+        modalidade = colr1.radio("Tipo de regra", ["Recorrente (todo mês)", "Parcelado"], horizontal=True)
+        inicio_regra = colr2.date_input("📅 Primeira ocorrência", value=date.today())
+        descricao_regra = st.text_input("📝 Descrição", key="descricao_regra")
+        colr3, colr4 = st.columns(2)
+        valor_regra = colr3.number_input("💵 Valor mensal ou total da compra (R$)", min_value=0.0, step=0.01)
+        parcelas_regra = colr4.number_input("🔢 Parcelas (só parcelado)", min_value=2, value=2, step=1)
+        colr5, colr6 = st.columns(2)
+        forma_regra = colr5.selectbox("💳 Forma de pagamento", ["Cartão", "Pix", "Dinheiro", "Boleto", "Transferência"], key="forma_regra")
+        categoria_regra = colr6.selectbox("📂 Categoria", ["Alimentação", "Transporte", "Moradia", "Lazer", "Saúde", "Internet", "Streaming", "Cartão de Crédito", "Outros"], key="categoria_regra")
+        if st.form_submit_button("➕ Adicionar regra") and valor_regra > 0:
+            parcelado = modalidade == "Parcelado"
+            ledger.salvar_regra(recorrencias.nova_regra(
+                "Despesa", descricao_regra, valor_regra, forma_regra, categoria_regra,
+                to_iso_date(inicio_regra), parcelas=int(parcelas_regra) if parcelado else None,
+            ))
+            st.success("✅ Regra adicionada!")
+            reiniciar()
+
+    regras_ativas = ledger.regras_ativas()
+    if regras_ativas:
+        st.markdown("**Regras cadastradas**")
+        for regra in regras_ativas:
+            colg1, colg2 = st.columns([5, 1])
+            detalhe = f"{regra['Parcelas']}x de R$ {regra['Valor']:.2f}" if regra.get("Parcelas") else f"R$ {regra['Valor']:.2f} por mês"
+            colg1.write(f"{regra['Descrição']} • {detalhe} • desde {regra['Inicio']}")
+            if colg2.button("🗑️", key=f"remover_regra_{regra['Id']}"):
+                ledger.remover_regra(regra["Id"])
+                reiniciar()
+
+    # Ajuste de uma ocorrência só neste mês (ex.: conta com valor diferente)
+    ocorrencias_mes = df_filtrado[df_filtrado["Id"].map(recorrencias.eh_ocorrencia).astype(bool)] if not df_filtrado.empty else df_filtrado
+    if not ocorrencias_mes.empty:
+        st.markdown(f"**Ajustar ocorrência de {mes_selecionado:02d}/{ano_selecionado}**")
+        rotulos = dict(zip(ocorrencias_mes["Id"], ocorrencias_mes["Descrição"]))
+        colo1, colo2, colo3 = st.columns([3, 2, 1])
+        id_ocorrencia = colo1.selectbox("Ocorrência", list(rotulos), format_func=rotulos.get)
+        valor_ocorrencia = colo2.number_input("💵 Novo valor (R$)", min_value=0.0, step=0.01, key="valor_ocorrencia")
+        if colo3.button("💾 Salvar"):
+            ledger.alterar_ocorrencia(id_ocorrencia, Valor=float(valor_ocorrencia))
+            st.success("✅ Ocorrência ajustada!")
+            reiniciar()
+        st.caption("Para pular a ocorrência só neste mês, exclua-a na tabela de transações.")
+
 # Resumo Financeiro
+perfil_rerun.marcar("resumo")
 with st.expander("📊 Resumo Financeiro do Mês", expanded=True):
     if not df_filtrado.empty:
-        df_filtrado["Valor"] = pd.to_numeric(df_filtrado["Valor"], errors="coerce")
-        
-        total_receitas = df_filtrado[df_filtrado["Tipo"] == "Receita"]["Valor"].sum()
-        despesas_sem_cartao = df_filtrado[(df_filtrado["Tipo"] == "Despesa") & (df_filtrado["Forma de pagamento"] != "Cartão")]["Valor"].sum()
-        despesas_cartao = df_filtrado[(df_filtrado["Tipo"] == "Despesa") & (df_filtrado["Forma de pagamento"] == "Cartão")]["Valor"].sum()
-        saldo = total_receitas - despesas_sem_cartao
+        # Totais do índice agregado: consulta direta, sem varrer as transações
+        total_receitas = totais_mes["receitas"]
+        despesas_sem_cartao = totais_mes["despesas_sem_cartao"]
+        despesas_cartao = totais_mes["despesas_cartao"]
+        fatura_cartao = totais_mes["fatura_cartao"]
+        inicio_ciclo, fim_ciclo, vencimento_fatura = ledger.ciclo_do_cartao(ano_selecionado, mes_selecionado)
+        # Saldo corrente: inicial informado ou transportado do mês anterior
+        saldo_inicial = ledger.saldo_inicial(ano_selecionado, mes_selecionado)
+        origem_saldo = "informado" if ledger.saldo_informado(ano_selecionado, mes_selecionado) is not None else "transportado do mês anterior"
+        saldo = ledger.saldo_final(ano_selecionado, mes_selecionado)
         
         st.markdown(f"""
         <div style='background-color: #e8e8e8; padding: 20px; margin: 20px 0; border-radius: 10px; border: 2px solid #ccc;'>
             <h3 style='text-align: center; margin-bottom: 15px; color: #333;'>Resumo Financeiro:</h3>
             <p style='color: #008000; font-size: 17px; font-weight: 600;'>Total de Receitas: R$ {total_receitas:.2f}</p>
             <p style='color: #cc0000; font-size: 17px; font-weight: 600;'>Total de Despesas (sem cartão): R$ {despesas_sem_cartao:.2f}</p>
-            <p style='font-weight: bold; font-size: 19px; color: #1a1a1a; margin-top: 10px;'>Saldo: R$ {saldo:.2f}</p>
+            <p style='color: #cc0000; font-size: 15px; font-weight: 600;'>💳 Fatura do Cartão (vence {vencimento_fatura:%d/%m/%Y}, compras de {inicio_ciclo:%d/%m} a {fim_ciclo:%d/%m}): R$ {fatura_cartao:.2f}</p>
+            <p style='color: #333; font-size: 15px;'>Saldo inicial ({origem_saldo}): R$ {saldo_inicial:.2f}</p>
+            <p style='font-weight: bold; font-size: 19px; color: #1a1a1a; margin-top: 10px;'>Saldo final: R$ {saldo:.2f}</p>
             <hr style='margin: 15px 0; border: none; border-top: 1px dashed #999;'>
             <p style='color: #ff8c00; font-size: 15px; font-weight: 600; background-color: #fff3cd; padding: 10px; border-radius: 5px; margin-top: 10px;'>
-                💳 Gastos no Cartão (não descontados): R$ {despesas_cartao:.2f}
+                💳 Gastos no Cartão no mês (entram nas próximas faturas): R$ {despesas_cartao:.2f}
             </p>
         </div>
         """, unsafe_allow_html=True)
     else:
         st.info("Sem dados para o período selecionado")
 
+# Cartão de crédito
+perfil_rerun.marcar("cartao")
+with st.expander("💳 Faturas do Cartão", expanded=False):
+    fechamento_atual, vencimento_atual = ledger.configuracao_cartao()
+    colc1, colc2, colc3 = st.columns([2, 2, 1])
+    dia_fechamento = colc1.number_input("Dia do fechamento", min_value=1, max_value=31, value=fechamento_atual, step=1)
+    dia_vencimento = colc2.number_input("Dia do vencimento", min_value=1, max_value=31, value=vencimento_atual, step=1)
+    if colc3.button("💾 Salvar datas", disabled=(dia_fechamento, dia_vencimento) == (fechamento_atual, vencimento_atual)):
+        ledger.configurar_cartao(dia_fechamento, dia_vencimento)
+        st.success("✅ Datas do cartão atualizadas!")
+        reiniciar()
+
+    tabela_faturas = ledger.faturas_do_cartao()
+    if tabela_faturas.empty:
+        st.info("Sem compras no cartão.")
+    else:
+        st.dataframe(
+            tabela_faturas.head(24),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Vencimento": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Compras de": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Compras até": st.column_config.DateColumn(format="DD/MM/YYYY"),
+                "Total": st.column_config.NumberColumn(format="R$ %.2f"),
+            },
+        )
+        st.caption("Cada fatura é descontada do saldo no mês do vencimento.")
+
 # Transações Filtradas
+perfil_rerun.marcar("tabela")
 with st.expander("📋 Transações do Mês", expanded=False):
     if not df_filtrado.empty:
-        h1, h2, h3, h4, h5, h6, h7 = st.columns([1.5, 1.5, 3, 2, 2, 2, 1])
-        h1.write("📅 Data")
-        h2.write("📊 Tipo")
-        h3.write("📝 Descrição")
-        h4.write("💵 Valor")
-        h5.write("💳 Forma")
-        h6.write("📂 Categoria")
-        h7.write("Excluir")
-
-        for i, row in df_filtrado.iterrows():
-            c1, c2, c3, c4, c5, c6, c7 = st.columns([1.5, 1.5, 3, 2, 2, 2, 1])
-            c1.write(row["Data Formatada"])
-            
-            if row["Tipo"] == "Receita":
-                c2.markdown(f"<span style='color: green;'>✅ {row['Tipo']}</span>", unsafe_allow_html=True)
-                c4.markdown(f"<span style='color: green;'>R$ {float(row['Valor']):.2f}</span>", unsafe_allow_html=True)
-            else:
-                c2.markdown(f"<span style='color: red;'>❌ {row['Tipo']}</span>", unsafe_allow_html=True)
-                c4.markdown(f"<span style='color: red;'>R$ {float(row['Valor']):.2f}</span>", unsafe_allow_html=True)
-            
-            c3.write(row["Descrição"])
-            c5.write(row["Forma de pagamento"])
-            c6.write(row["Categoria"])
-            
-            if c7.button("🗑️", key=f"del_{row['Id']}_{i}"):
-                df_all = pd.DataFrame(st.session_state.gastos)
-                df_all = df_all[df_all["Id"] != row["Id"]]
-                st.session_state.gastos = df_all.to_dict(orient="records")
-                df_all.to_csv(ARQUIVO_GASTOS, sep=";", index=False)
-                st.success("Registro excluído!")
-                st.rerun()
-
-        # Download PDF
-        pdf_buffer = gerar_pdf(df_filtrado, ano_selecionado, mes_selecionado)
-        st.download_button(
-            label="📄 Baixar relatório em PDF",
-            data=pdf_buffer,
-            file_name=f"relatorio_financeiro_{ano_selecionado}_{mes_selecionado}.pdf",
-            mime="application/pdf"
+        # Filtros e ordenação
+        colt1, colt2, colt3 = st.columns(3)
+        filtro_tipo = colt1.multiselect("📊 Tipo", sorted(df_filtrado["Tipo"].astype(str).unique()))
+        filtro_categoria = colt2.multiselect("📂 Categoria", sorted(df_filtrado["Categoria"].astype(str).unique()))
+        filtro_forma = colt3.multiselect("💳 Forma", sorted(df_filtrado["Forma de pagamento"].astype(str).unique()))
+
+        visiveis = df_filtrado
+        if filtro_tipo:
+            visiveis = visiveis[visiveis["Tipo"].isin(filtro_tipo)]
+        if filtro_categoria:
+            visiveis = visiveis[visiveis["Categoria"].isin(filtro_categoria)]
+        if filtro_forma:
+            visiveis = visiveis[visiveis["Forma de pagamento"].isin(filtro_forma)]
+
+        colo1, colo2, colo3 = st.columns([2, 1, 1])
+        ordenar_por = colo1.selectbox("Ordenar por", ["Data", "Valor", "Descrição", "Categoria", "Forma de pagamento", "Tipo"])
+        decrescente = colo2.checkbox("Decrescente")
+        visiveis = visiveis.sort_values(ordenar_por, ascending=not decrescente, kind="stable")
+
+        # Paginação: só a página atual vai para a tabela
+        TAMANHO_PAGINA = 50
+        total_paginas = max(1, -(-len(visiveis) // TAMANHO_PAGINA))
+        pagina = colo3.number_input("Página", min_value=1, max_value=total_paginas, value=1, step=1)
+        pagina_df = visiveis.iloc[(pagina - 1) * TAMANHO_PAGINA: pagina * TAMANHO_PAGINA]
+
+        tabela = pd.DataFrame({
+            "Excluir": False,
+            "📅 Data": pagina_df["Data Formatada"].to_numpy(),
+            "📊 Tipo": ["✅ Receita" if t == "Receita" else f"❌ {t}" for t in pagina_df["Tipo"]],
+            "📝 Descrição": pagina_df["Descrição"].to_numpy(),
+            "💵 Valor": pagina_df["Valor"].to_numpy(),
+            "💳 Forma": pagina_df["Forma de pagamento"].astype(str).to_numpy(),
+            "📂 Categoria": pagina_df["Categoria"].astype(str).to_numpy(),
+        }, index=pagina_df["Id"].to_numpy())
+
+        editado = st.data_editor(
+            tabela,
+            key=f"tabela_{ano_selecionado}_{mes_selecionado}_{pagina}",
+            hide_index=True,
+            use_container_width=True,
+            disabled=[c for c in tabela.columns if c != "Excluir"],
+            column_config={
+                "Excluir": st.column_config.CheckboxColumn("🗑️"),
+                "💵 Valor": st.column_config.NumberColumn(format="R$ %.2f"),
+            },
         )
+        st.caption(f"{len(visiveis)} transação(ões) • página {pagina} de {total_paginas}")
+
+        # Exclusão em lote: uma única operação no armazenamento e um único rerun
+        selecionados = editado.index[editado["Excluir"]].tolist()
+        if st.button(f"🗑️ Excluir selecionados ({len(selecionados)})", disabled=not selecionados):
+            try:
+                ledger.excluir(*selecionados)
+            except ConflitoDeEscrita:
+                st.error(MENSAGEM_CONFLITO)
+            else:
+                st.success(f"{len(selecionados)} registro(s) excluído(s)!")
+                reiniciar()
+
+        perfil_rerun.marcar("pdf")
+        # Download PDF: gerado só quando pedido, em segundo plano, e reaproveitado
+        # enquanto os arquivos do usuário não mudarem (a chave não lê as linhas)
+        periodos_relatorio = {"Mês": ("mes", mes_selecionado), "Trimestre": ("trimestre", (int(mes_selecionado) - 1) // 3 + 1), "Ano": ("ano", 0)}
+        escolha = st.radio("Período do relatório", list(periodos_relatorio), horizontal=True)
+        tipo_rel, numero_rel = periodos_relatorio[escolha]
+        chave_pdf = relatorios.chave_periodo(ledger, tipo_rel, ano_selecionado, numero_rel)
+        pdf_bytes = relatorios.pdf_em_cache(chave_pdf)
+        if pdf_bytes is None and st.button("📄 Gerar relatório em PDF"):
+            futuro = relatorios.solicitar_relatorio(ledger, tipo_rel, ano_selecionado, numero_rel)
+            with st.spinner("Gerando relatório..."):
+                pdf_bytes = futuro.result()
+        if pdf_bytes is not None:
+            sufixo = {"mes": f"{mes_selecionado}", "trimestre": f"T{numero_rel}", "ano": "anual"}[tipo_rel]
+            st.download_button(
+                label="📄 Baixar relatório em PDF",
+                data=pdf_bytes,
+                file_name=f"relatorio_financeiro_{ano_selecionado}_{sufixo}.pdf",
+                mime="application/pdf"
+            )
     else:
         st.info("Nenhuma transação no período selecionado.")
 
+# Busca em todos os meses
+perfil_rerun.marcar("busca")
+with st.expander("🔎 Buscar Transações", expanded=False):
+    colb1, colb2 = st.columns([3, 1])
+    consulta = colb1.text_input("Descrição, categoria ou forma de pagamento", placeholder="ex.: merc pix")
+    if consulta.strip():
+        pagina_busca = colb2.number_input("Página", min_value=1, value=1, step=1, key="pagina_busca")
+        total_busca, resultados = ledger.buscar(consulta, pagina=pagina_busca)
+        paginas_busca = max(1, -(-total_busca // busca.TAMANHO_PAGINA))
+        if resultados.empty:
+            st.info("Nenhuma transação encontrada.")
+        else:
+            st.dataframe(
+                pd.DataFrame({
+                    "📅 Data": pd.to_datetime(resultados["Data"], errors="coerce").dt.strftime("%d/%m/%Y").to_numpy(),
+                    "📊 Tipo": resultados["Tipo"].to_numpy(),
+                    "📝 Descrição": resultados["Descrição"].to_numpy(),
+                    "💵 Valor": resultados["Valor"].to_numpy(),
+                    "💳 Forma": resultados["Forma de pagamento"].to_numpy(),
+                    "📂 Categoria": resultados["Categoria"].to_numpy(),
+                }),
+                hide_index=True,
+                use_container_width=True,
+                column_config={"💵 Valor": st.column_config.NumberColumn(format="R$ %.2f")},
+            )
+            st.caption(f"{total_busca} transação(ões) • página {min(pagina_busca, paginas_busca)} de {paginas_busca}")
+
 # Gráfico por categoria
+perfil_rerun.marcar("graficos")
+def exibir_barras(totais, titulo, cor):
+    if graficos.MODO == "imagem":
+        st.image(graficos.barras_png(totais, titulo, cor))
+    else:
+        st.markdown(f"**{titulo}**")
+        st.bar_chart(totais.rename("Valor (R$)"), color=cor, x_label="Categoria", y_label="Valor (R$)")
+
 with st.expander(f"📊 Análise por Categoria - {mes_selecionado:02d}/{ano_selecionado}", expanded=False):
     if not df_filtrado.empty:
-        df_filtrado["Valor"] = pd.to_numeric(df_filtrado["Valor"], errors="coerce")
         
         tab1, tab2 = st.tabs(["💸 Despesas", "💰 Receitas"])
         
         with tab1:
-            despesas = df_filtrado[df_filtrado["Tipo"] == "Despesa"]
-            if not despesas.empty:
-                totais_despesa = despesas.groupby("Categoria")["Valor"].sum().sort_values(ascending=False)
-                fig, ax = plt.subplots()
-                ax.bar(totais_despesa.index, totais_despesa.values, color="#ff6b6b")
-                ax.set_ylabel("Valor (R$)")
-                ax.set_xlabel("Categoria")
-                ax.set_title("Despesas por Categoria")
-                plt.xticks(rotation=20)
-                st.pyplot(fig)
+            totais_despesa = ledger.por_categoria(ano_selecionado, mes_selecionado, "Despesa")
+            if not totais_despesa.empty:
+                exibir_barras(totais_despesa, "Despesas por Categoria", "#ff6b6b")
             else:
                 st.info("Sem despesas no período")
         
         with tab2:
-            receitas = df_filtrado[df_filtrado["Tipo"] == "Receita"]
-            if not receitas.empty:
-                totais_receita = receitas.groupby("Categoria")["Valor"].sum().sort_values(ascending=False)
-                fig, ax = plt.subplots()
-                ax.bar(totais_receita.index, totais_receita.values, color="#51cf66")
-                ax.set_ylabel("Valor (R$)")
-                ax.set_xlabel("Categoria")
-                ax.set_title("Receitas por Categoria")
-                plt.xticks(rotation=20)
-                st.pyplot(fig)
+            totais_receita = ledger.por_categoria(ano_selecionado, mes_selecionado, "Receita")
+            if not totais_receita.empty:
+                exibir_barras(totais_receita, "Receitas por Categoria", "#51cf66")
             else:
                 st.info("Sem receitas no período")
     else:
         st.info("Sem dados para análise.")
+
+# -----------------------------
+# Tendências de vários anos
+# -----------------------------
+perfil_rerun.marcar("tendencias")
+def exibir_tendencias(tipo):
+    dados = ledger.tendencias(tipo)
+    mensal = dados["mensal"]
+    if mensal.empty:
+        st.info("Sem histórico para este tipo.")
+        return
+    principais = [c for c in mensal.drop(columns="Total").sum().nlargest(5).index]
+    st.markdown("**Total por mês e média dos últimos 12 meses**")
+    st.line_chart(pd.DataFrame({"Total": mensal["Total"], "Média 12 meses": dados["media_12m"]["Total"]}))
+    st.markdown("**Principais categorias por mês**")
+    st.line_chart(mensal[principais])
+
+    st.markdown(f"**Variações em {mes_selecionado:02d}/{ano_selecionado}**")
+    resumo = tendencias.resumo_do_mes(dados, ano_selecionado, mes_selecionado)
+    if resumo.empty:
+        st.info("Sem lançamentos no mês selecionado.")
+    else:
+        st.dataframe(
+            resumo.style.format({"Total": "R$ {:,.2f}", "Média 12 meses": "R$ {:,.2f}", "Mês a mês %": "{:+.1f}%", "Ano a ano %": "{:+.1f}%"}, na_rep="—"),
+            use_container_width=True,
+        )
+
+    st.markdown("**Categorias que mais cresceram**")
+    crescimento = dados["crescimento"].head(5)
+    st.dataframe(
+        crescimento.style.format({"Atual": "R$ {:,.2f}", "Anterior": "R$ {:,.2f}", "Diferença": "R$ {:+,.2f}", "Variação %": "{:+.1f}%"}, na_rep="—"),
+        use_container_width=True,
+    )
+
+with st.expander("📈 Tendências", expanded=False):
+    tab_desp, tab_rec = st.tabs(["💸 Despesas", "💰 Receitas"])
+    with tab_desp:
+        exibir_tendencias("Despesa")
+    with tab_rec:
+        exibir_tendencias("Receita")
+
+# -----------------------------
+# Desempenho do rerun
+# -----------------------------
+registro_perfil = concluir_rerun()
+if PAINEL_DESEMPENHO:
+    with st.sidebar:
+        st.markdown("### 🔧 Desempenho do rerun")
+        st.metric("Tempo total", f"{registro_perfil['total_ms']:.1f} ms")
+        st.dataframe(
+            pd.Series(registro_perfil["fases_ms"], name="ms").sort_values(ascending=False),
+            use_container_width=True,
+        )
+        if registro_perfil["contadores"]:
+            st.dataframe(pd.Series(registro_perfil["contadores"], name="quantidade"), use_container_width=True)
+        if ARQUIVO_PERFIL:
+            estatisticas = perfil.percentis(ARQUIVO_PERFIL, perfil_rerun.usuario)
+            if estatisticas["n"]:
+                st.caption(
+                    f"Últimos {estatisticas['n']} reruns: p50 {estatisticas['p50_ms']:.1f} ms • "
+                    f"p95 {estatisticas['p95_ms']:.1f} ms"
+                )
@@ -0,0 +1 @@
+"""Núcleo do Controle Financeiro (armazenamento e regras, sem Streamlit)."""
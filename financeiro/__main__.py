@@ -0,0 +1,45 @@
+"""Linha de comando do Controle Financeiro.
+
+    python -m financeiro relatorios --ano 2025 [--mes 6] [--saida relatorios] [--processos 8]
+    python -m financeiro migrar sqlite|parquet
+"""
+import argparse
+import os
+from datetime import date
+
+from .backends import BASE_DIR
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m financeiro", description="Controle Financeiro sem navegador")
+    parser.add_argument("--base-dir", default=BASE_DIR, help="Pasta com os gastos_<hash>.csv|.sqlite|.parquet")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    p_rel = comandos.add_parser("relatorios", help="Gera PDFs e resumos em CSV para todos os usuários do backend CF_BACKEND")
+    p_rel.add_argument("--ano", type=int, default=date.today().year)
+    p_rel.add_argument("--mes", type=int, help="Só este mês (sem o relatório anual)")
+    p_rel.add_argument("--saida", default="relatorios", help="Pasta de saída (uma subpasta por usuário)")
+    p_rel.add_argument("--processos", type=int, default=os.cpu_count(), help="Processos em paralelo")
+    p_rel.add_argument("--sem-anual", action="store_true", help="Não gera o relatório anual")
+
+    p_mig = comandos.add_parser("migrar", help="Migra os CSVs para outro backend")
+    p_mig.add_argument("backend", choices=["sqlite", "parquet"])
+
+    args = parser.parse_args(argv)
+
+    if args.comando == "relatorios":
+        from .lote import gerar_lote
+
+        resultado = gerar_lote(args.base_dir, args.ano, args.mes, args.saida, args.processos, not args.sem_anual)
+        print(f"{resultado['usuarios']} usuário(s), {resultado['pdfs']} PDF(s), {len(resultado['erros'])} erro(s)")
+        return 1 if resultado["erros"] else 0
+
+    if args.comando == "migrar":
+        from .backends import migrar_csvs
+
+        print(f"{migrar_csvs(args.backend, args.base_dir)} arquivo(s) migrado(s) para {args.backend}")
+        return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,129 @@
+"""Índice de totais por (Ano, Mês) -> (Tipo, Categoria, Forma de pagamento).
+
+É a fonte única do resumo do mês, dos gráficos por categoria, do cabeçalho
+do PDF e do saldo corrente. Todos os meses são indexados na abertura a partir
+dos agregados do backend (``agregados_mensais``), sem carregar as transações,
+e depois só recebem somas e subtrações a cada inserção/exclusão, então trocar
+de mês no filtro é uma consulta ao dicionário. Os meses alterados ficam em
+``sujos`` até o saldo corrente recalcular, e ``revisao`` muda a cada alteração
+(chave dos caches de tendências).
+
+Os totais são guardados em centavos inteiros: somas e subtrações repetidas não
+acumulam erro de ponto flutuante, e só a saída é convertida para reais.
+"""
+import pandas as pd
+
+from .esquema import para_centavos
+from .saldos import CELULA_SALDO
+
+CHAVE = ["Tipo", "Categoria", "Forma de pagamento"]
+COLUNAS_AGREGADAS = ["Ano", "Mês", *CHAVE, "Centavos", "Quantidade"]
+
+
+def agregar_mensal(df):
+    # Transações no formato de COLUNAS -> uma linha por (Ano, Mês, Tipo,
+    # Categoria, Forma) com a soma em centavos e a quantidade
+    datas = pd.to_datetime(df["Data"], format="%Y-%m-%d", errors="coerce")
+    base = pd.DataFrame({
+        "Ano": datas.dt.year,
+        "Mês": datas.dt.month,
+        **{c: df[c].fillna("").astype(str) for c in CHAVE},
+        "Centavos": para_centavos(df["Valor"]),
+    })[datas.notna()]
+    grupos = base.groupby(["Ano", "Mês", *CHAVE])["Centavos"].agg(Centavos="sum", Quantidade="count")
+    return grupos.reset_index()[COLUNAS_AGREGADAS]
+
+
+def somar_agregados(*tabelas):
+    # Junta tabelas no formato de COLUNAS_AGREGADAS somando as mesmas células
+    tabelas = [t for t in tabelas if not t.empty]
+    if not tabelas:
+        return pd.DataFrame(columns=COLUNAS_AGREGADAS)
+    if len(tabelas) == 1:
+        return tabelas[0]
+    juntas = pd.concat(tabelas, ignore_index=True)
+    return juntas.groupby(["Ano", "Mês", *CHAVE], as_index=False)[["Centavos", "Quantidade"]].sum()[COLUNAS_AGREGADAS]
+
+
+class IndiceAgregado:
+    def __init__(self):
+        # {(ano, mes): {(tipo, categoria, forma): [centavos, quantidade]}}
+        self._meses = {}
+        self.sujos = set()
+        self.revisao = 0
+
+    def __contains__(self, periodo):
+        return periodo in self._meses
+
+    def periodos(self):
+        return sorted(p for p, celulas in self._meses.items() if celulas)
+
+    def celulas(self, ano, mes):
+        return self._meses.get((int(ano), int(mes)), {})
+
+    def indexar_agregados(self, agregados):
+        # Substitui o índice inteiro pelas linhas de agregar_mensal
+        meses = {}
+        for ano, mes, tipo, categoria, forma, centavos, n in agregados[COLUNAS_AGREGADAS].itertuples(index=False):
+            meses.setdefault((int(ano), int(mes)), {})[(tipo, categoria, forma)] = [int(centavos), int(n)]
+        self.sujos |= set(self._meses) | set(meses)
+        self._meses = meses
+        self.revisao += 1
+
+    def indexar_mes(self, ano, mes, df):
+        celulas = {}
+        if not df.empty:
+            centavos = df[CHAVE].assign(Centavos=para_centavos(df["Valor"]))
+            grupos = centavos.groupby(CHAVE, observed=True)["Centavos"].agg(["sum", "count"])
+            for chave, (total, n) in zip(grupos.index, grupos.itertuples(index=False)):
+                celulas[tuple(chave)] = [int(total), int(n)]
+        # Recarregar um mês já indexado não conta como alteração
+        if self._meses.get((int(ano), int(mes))) != celulas:
+            self._meses[(int(ano), int(mes))] = celulas
+            self.sujos.add((int(ano), int(mes)))
+            self.revisao += 1
+
+    def _aplicar(self, ano, mes, df, sinal):
+        if df.empty:
+            return
+        celulas = self._meses.setdefault((int(ano), int(mes)), {})
+        self.sujos.add((int(ano), int(mes)))
+        self.revisao += 1
+        for tipo, categoria, forma, centavos in zip(df["Tipo"], df["Categoria"], df["Forma de pagamento"], para_centavos(df["Valor"])):
+            celula = celulas.setdefault((tipo, categoria, forma), [0, 0])
+            celula[0] += sinal * int(centavos)
+            celula[1] += sinal
+            if celula[1] <= 0:
+                del celulas[(tipo, categoria, forma)]
+
+    def adicionar(self, ano, mes, df):
+        self._aplicar(ano, mes, df, +1)
+
+    def remover(self, ano, mes, df):
+        self._aplicar(ano, mes, df, -1)
+
+    def totais(self, ano, mes):
+        # O saldo informado não é receita do mês: ele é o saldo inicial
+        receitas = despesas_sem_cartao = despesas_cartao = 0
+        for (tipo, categoria, forma), (total, _) in self._meses.get((int(ano), int(mes)), {}).items():
+            if (tipo, categoria, forma) == CELULA_SALDO:
+                continue
+            if tipo == "Receita":
+                receitas += total
+            elif tipo == "Despesa" and forma == "Cartão":
+                despesas_cartao += total
+            elif tipo == "Despesa":
+                despesas_sem_cartao += total
+        return {
+            "receitas": receitas / 100,
+            "despesas_sem_cartao": despesas_sem_cartao / 100,
+            "despesas_cartao": despesas_cartao / 100,
+            "saldo": (receitas - despesas_sem_cartao) / 100,
+        }
+
+    def por_categoria(self, ano, mes, tipo):
+        totais = {}
+        for (t, categoria, _), (total, _) in self._meses.get((int(ano), int(mes)), {}).items():
+            if t == tipo:
+                totais[categoria] = totais.get(categoria, 0) + total
+        return (pd.Series(totais, dtype="int64") / 100).sort_values(ascending=False)
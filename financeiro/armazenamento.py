@@ -0,0 +1,367 @@
+"""Armazenamento dos gastos: snapshot CSV + journal de eventos (append-only).
+
+Cada alteração (inserção, exclusão, atualização) vira uma linha JSON no
+journal ``gastos_<md5>.journal``; o CSV ``gastos_<md5>.csv`` continua sendo o
+snapshot no formato de sempre. De tempos em tempos o journal é compactado em
+segundo plano para dentro do snapshot.
+
+Várias sessões, processos (workers do servidor, linha de comando) ou o próprio
+OneDrive podem mexer no mesmo usuário. Por isso:
+
+- snapshot e contador são gravados num temporário e trocados com ``os.replace``;
+- escrita no journal e compactação seguram travas por usuário, de thread e de
+  arquivo (``gastos_<md5>.escrita.lock``/``.compactacao.lock``), sem trava global;
+- cada escrita incrementa a revisão em ``gastos_<md5>.revisao`` e marca seus
+  eventos com ela (``"rev"``). Quem informa ``revisao_esperada`` e outro
+  processo gravou antes recebe os eventos que faltam em ``mesclar`` (ainda com
+  a trava) ou, se eles já foram compactados, ``RevisaoDesatualizada``.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from . import perfil
+from .colunar import TabelaColunar
+from .esquema import COLUNAS, ensure_schema
+
+# Quantidade de eventos no journal que dispara uma compactação em segundo plano
+LIMITE_COMPACTACAO = 500
+
+_travas = {}
+_travas_lock = threading.Lock()
+_eventos_pendentes = {}
+_compactando = set()
+
+
+def caminho_journal(arquivo):
+    return os.path.splitext(arquivo)[0] + ".journal"
+
+
+def _caminho_em_compactacao(arquivo):
+    return caminho_journal(arquivo) + ".compactando"
+
+
+class RevisaoDesatualizada(RuntimeError):
+    # Outro processo gravou depois da revisão que o chamador conhece
+    def __init__(self, atual):
+        super().__init__(f"Os dados foram alterados (revisão atual {atual})")
+        self.atual = atual
+
+
+class ConflitoDeEscrita(RuntimeError):
+    # A alteração atinge registros que outra sessão alterou ao mesmo tempo
+    def __init__(self, ids):
+        super().__init__(f"{len(ids)} registro(s) foram alterados em outra sessão")
+        self.ids = list(ids)
+
+
+def _trava(arquivo):
+    with _travas_lock:
+        if arquivo not in _travas:
+            _travas[arquivo] = threading.Lock()
+        return _travas[arquivo]
+
+
+def _travar_arquivo(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        while True:
+            try:
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK desiste depois de ~10 s; uma compactação longa pode passar disso
+                continue
+
+
+def _destravar_arquivo(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def travar(arquivo, nome="escrita"):
+    # Trava de thread (mesmo processo) + trava consultiva no arquivo .lock
+    # (outros processos), sempre nessa ordem
+    with _trava(f"{arquivo}#{nome}"):
+        with open(f"{os.path.splitext(arquivo)[0]}.{nome}.lock", "a+b") as f:
+            _travar_arquivo(f)
+            try:
+                yield
+            finally:
+                _destravar_arquivo(f)
+
+
+# -----------------------------
+# Revisão
+# -----------------------------
+def _caminho_revisao(arquivo):
+    return os.path.splitext(arquivo)[0] + ".revisao"
+
+
+def revisao(arquivo):
+    try:
+        with open(_caminho_revisao(arquivo), encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _incrementar_revisao(arquivo):
+    # Chamado com a trava de escrita
+    nova = revisao(arquivo) + 1
+    temporario = _caminho_revisao(arquivo) + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        f.write(str(nova))
+    os.replace(temporario, _caminho_revisao(arquivo))
+    return nova
+
+
+# -----------------------------
+# Leitura (snapshot + replay)
+# -----------------------------
+def _ler_snapshot_df(arquivo, tolerante=True):
+    # ``tolerante``: um snapshot ilegível abre como vazio (só na carga, como
+    # sempre foi); a compactação lê com ``tolerante=False`` para nunca regravar
+    # o snapshot a partir de uma leitura que falhou
+    if os.path.exists(arquivo):
+        perfil.contar_arquivo("bytes_lidos", arquivo)
+        try:
+            df = pd.read_csv(arquivo, sep=";")
+        except Exception:
+            if not tolerante:
+                raise
+            df = pd.DataFrame(columns=COLUNAS)
+    else:
+        df = pd.DataFrame(columns=COLUNAS)
+
+    regerados = False
+    if "Id" not in df.columns or df["Id"].isna().any() or df["Id"].duplicated().any():
+        df["Id"] = [str(uuid.uuid4()) for _ in range(len(df))]
+        regerados = len(df) > 0
+
+    return ensure_schema(df), regerados
+
+
+def _ler_snapshot(arquivo, tolerante=True):
+    df, regerados = _ler_snapshot_df(arquivo, tolerante)
+    return df.to_dict(orient="records"), regerados
+
+
+def _aplicar_journal(registros, caminho):
+    # Replay idempotente: inserir/atualizar sobrescrevem pelo Id e excluir ignora
+    # Ids ausentes, então reaplicar um journal já compactado não altera nada.
+    if not os.path.exists(caminho):
+        return 0
+    perfil.contar_arquivo("bytes_lidos", caminho)
+    n = 0
+    with open(caminho, encoding="utf-8") as f:
+        for linha in f:
+            try:
+                evento = json.loads(linha)
+            except ValueError:
+                # Última linha truncada por uma queda no meio da escrita
+                continue
+            op = evento.get("op")
+            if op in ("inserir", "atualizar"):
+                registro = evento["registro"]
+                registros[registro["Id"]] = {c: registro.get(c) for c in COLUNAS}
+            elif op == "excluir":
+                registros.pop(evento["Id"], None)
+            n += 1
+    return n
+
+
+class _EstadoFinal(dict):
+    # Replay do journal guardando só o estado final de cada Id (None = excluído),
+    # para aplicar tudo de uma vez na tabela colunar
+    def pop(self, id_, padrao=None):
+        self[id_] = None
+
+
+def _reconstruir(arquivo):
+    lista, regerados = _ler_snapshot(arquivo)
+    registros = {r["Id"]: r for r in lista}
+    n = _aplicar_journal(registros, _caminho_em_compactacao(arquivo))
+    n += _aplicar_journal(registros, caminho_journal(arquivo))
+    return registros, n, regerados
+
+
+def assinatura(caminho):
+    try:
+        st = os.stat(caminho)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def versao(arquivo):
+    # Muda a cada escrita no snapshot ou nos journals (inclusive de outro processo)
+    return tuple(assinatura(c) for c in (arquivo, caminho_journal(arquivo), _caminho_em_compactacao(arquivo)))
+
+
+def carregar_gastos(arquivo):
+    # A trava de compactação impede que o journal troque de nome no meio da leitura
+    with travar(arquivo, "compactacao"):
+        registros, n, regerados = _reconstruir(arquivo)
+        _eventos_pendentes[arquivo] = n
+        if regerados:
+            # Ids novos precisam ir para o disco, senão o journal apontaria para
+            # Ids que deixam de existir na próxima leitura.
+            with travar(arquivo):
+                _gravar_snapshot(arquivo, registros.values())
+                for caminho in (caminho_journal(arquivo), _caminho_em_compactacao(arquivo)):
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+                _eventos_pendentes[arquivo] = 0
+                _incrementar_revisao(arquivo)
+    return list(registros.values())
+
+
+def carregar_tabela(arquivo):
+    # Mesmo conteúdo de carregar_gastos, montado direto na TabelaColunar sem
+    # passar por um dict por registro
+    with travar(arquivo, "compactacao"):
+        df, regerados = _ler_snapshot_df(arquivo)
+        if not regerados:
+            tabela = TabelaColunar.de_dataframe(df)
+            alteracoes = _EstadoFinal()
+            n = _aplicar_journal(alteracoes, _caminho_em_compactacao(arquivo))
+            n += _aplicar_journal(alteracoes, caminho_journal(arquivo))
+            tabela.remover(list(alteracoes))
+            tabela.acrescentar(r for r in alteracoes.values() if r is not None)
+            _eventos_pendentes[arquivo] = n
+            return tabela
+    # Ids regerados precisam ir para o disco antes (carregar_gastos grava)
+    return TabelaColunar.de_registros(carregar_gastos(arquivo))
+
+
+# -----------------------------
+# Escrita (journal)
+# -----------------------------
+def _eventos_desde(arquivo, revisao_conhecida, atual):
+    # Eventos das revisões (revisao_conhecida, atual] ou None se algum já saiu
+    # do journal (compactação) ou a revisão avançou sem eventos
+    eventos = []
+    for caminho in (_caminho_em_compactacao(arquivo), caminho_journal(arquivo)):
+        if not os.path.exists(caminho):
+            continue
+        with open(caminho, encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    evento = json.loads(linha)
+                except ValueError:
+                    continue
+                if evento.get("rev", 0) > revisao_conhecida:
+                    eventos.append(evento)
+    if {e["rev"] for e in eventos} != set(range(revisao_conhecida + 1, atual + 1)):
+        return None
+    return eventos
+
+
+def _registrar(arquivo, eventos, revisao_esperada=None, mesclar=None):
+    # Retorna a nova revisão
+    with travar(arquivo):
+        atual = revisao(arquivo)
+        if revisao_esperada is not None and atual != revisao_esperada:
+            faltantes = _eventos_desde(arquivo, revisao_esperada, atual) if mesclar else None
+            if faltantes is None:
+                raise RevisaoDesatualizada(atual)
+            # Pode levantar ConflitoDeEscrita, e então nada é gravado
+            mesclar(faltantes, atual)
+        nova = atual + 1
+        linhas = "".join(json.dumps(dict(e, rev=nova), ensure_ascii=False, default=str) + "\n" for e in eventos)
+        with open(caminho_journal(arquivo), "a", encoding="utf-8") as f:
+            f.write(linhas)
+            f.flush()
+            os.fsync(f.fileno())
+        _incrementar_revisao(arquivo)
+        _eventos_pendentes[arquivo] = _eventos_pendentes.get(arquivo, 0) + len(eventos)
+        pendentes = _eventos_pendentes[arquivo]
+    perfil.contar("bytes_gravados", len(linhas.encode("utf-8")))
+
+    if pendentes >= LIMITE_COMPACTACAO:
+        compactar_em_segundo_plano(arquivo)
+    return nova
+
+
+def inserir(arquivo, *registros, revisao_esperada=None, mesclar=None):
+    return _registrar(arquivo, [{"op": "inserir", "registro": r} for r in registros], revisao_esperada, mesclar)
+
+
+def atualizar(arquivo, *registros, revisao_esperada=None, mesclar=None):
+    return _registrar(arquivo, [{"op": "atualizar", "registro": r} for r in registros], revisao_esperada, mesclar)
+
+
+def excluir(arquivo, *ids, revisao_esperada=None, mesclar=None):
+    return _registrar(arquivo, [{"op": "excluir", "Id": i} for i in ids], revisao_esperada, mesclar)
+
+
+# -----------------------------
+# Compactação
+# -----------------------------
+def _gravar_snapshot(arquivo, registros):
+    temporario = arquivo + ".tmp"
+    pd.DataFrame(list(registros), columns=COLUNAS).to_csv(temporario, sep=";", index=False)
+    os.replace(temporario, arquivo)
+    perfil.contar_arquivo("bytes_gravados", arquivo)
+
+
+def compactar(arquivo):
+    journal = caminho_journal(arquivo)
+    em_compactacao = _caminho_em_compactacao(arquivo)
+
+    with travar(arquivo, "compactacao"):
+        if not os.path.exists(journal) and not os.path.exists(em_compactacao):
+            return
+        # O snapshot só muda com a trava de compactação, então pode ser lido
+        # antes de mexer no journal: se a leitura falhar, snapshot e journal
+        # ficam como estavam
+        lista, _ = _ler_snapshot(arquivo, tolerante=False)
+        registros = {r["Id"]: r for r in lista}
+
+        # Só a troca de nome do journal segura a trava de escrita: novos eventos
+        # seguem para um journal vazio enquanto o snapshot é regravado.
+        with travar(arquivo):
+            if os.path.exists(journal) and not os.path.exists(em_compactacao):
+                os.replace(journal, em_compactacao)
+            _eventos_pendentes[arquivo] = 0
+
+        if not os.path.exists(em_compactacao):
+            return
+
+        _aplicar_journal(registros, em_compactacao)
+        _gravar_snapshot(arquivo, registros.values())
+        os.remove(em_compactacao)
+
+
+def _compactar_e_liberar(arquivo):
+    try:
+        compactar(arquivo)
+    except Exception as e:
+        print("Erro ao compactar journal:", e)
+    finally:
+        _compactando.discard(arquivo)
+
+
+def compactar_em_segundo_plano(arquivo):
+    with _travas_lock:
+        if arquivo in _compactando:
+            return
+        _compactando.add(arquivo)
+    threading.Thread(target=_compactar_e_liberar, args=(arquivo,), daemon=True).start()
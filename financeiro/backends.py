@@ -0,0 +1,574 @@
+"""Camada de armazenamento plugável dos gastos de cada usuário.
+
+Todos os backends expõem a mesma interface:
+
+- ``periodos()``: lista ordenada de ``(ano, mes)`` com transações;
+- ``carregar(ano=None, mes=None)``: registros (dicts no formato de ``COLUNAS``),
+  filtrando o mês direto no armazenamento quando informado;
+- ``agregados_mensais()``: somas em centavos por (Ano, Mês, Tipo, Categoria,
+  Forma), no formato de ``agregados.agregar_mensal``, sem montar registros;
+- ``existentes(*ids)``: os registros atuais dos Ids que já existem (para quem
+  regrava um Id descontar a versão antiga);
+- ``inserir(*registros)``, ``atualizar(*registros)`` e ``excluir(*ids)``, que
+  retornam os períodos alterados por outros processos e incorporados durante
+  a escrita (ou ``None``);
+- ``versao()``: assinatura dos arquivos (mtime/tamanho), que muda a cada
+  escrita, usada para saber se um ledger em memória ficou desatualizado;
+- ``cartao_por_dia()``: somas em centavos das compras no cartão por dia, no
+  formato de ``faturas.agregar_cartao``, para o índice de faturas;
+- ``caminho_regras``/``caminho_cartao``: onde ficam as regras de
+  recorrentes/parcelados (``recorrencias``) e o fechamento/vencimento do
+  cartão (``faturas``), ``gastos_<md5>.regras.json`` e ``.cartao.json`` em
+  qualquer backend.
+
+O backend é escolhido pela variável de ambiente ``CF_BACKEND``
+(``csv`` - padrão -, ``sqlite`` ou ``parquet``).
+"""
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+
+import pandas as pd
+
+from . import armazenamento, perfil
+from .agregados import COLUNAS_AGREGADAS, agregar_mensal
+from .esquema import COLUNAS
+from .faturas import COLUNAS_CARTAO, agregar_cartao
+
+BASE_DIR = os.path.expanduser("~/OneDrive/ControleFinanceiro")
+BACKEND_PADRAO = os.environ.get("CF_BACKEND", "csv")
+
+# Quantas vezes uma escrita é mesclada e refeita quando outro processo grava antes
+TENTATIVAS_ESCRITA = 5
+
+
+def hash_usuario(email):
+    return hashlib.md5(email.strip().lower().encode()).hexdigest()
+
+
+def gerar_nome_arquivo(email, extensao="csv"):
+    return f"gastos_{hash_usuario(email)}.{extensao}"
+
+
+def caminho_regras(caminho_dados):
+    # gastos_<md5>.csv|.sqlite|.parquet -> gastos_<md5>.regras.json
+    return os.path.splitext(caminho_dados)[0] + ".regras.json"
+
+
+def caminho_cartao(caminho_dados):
+    return os.path.splitext(caminho_dados)[0] + ".cartao.json"
+
+
+def periodo_da_data(data):
+    # "2025-03-14" -> (2025, 3); datas inválidas ficam fora dos períodos
+    try:
+        return int(data[:4]), int(data[5:7])
+    except (TypeError, ValueError):
+        return 0, 0
+
+
+def _comparavel(registro):
+    # Registros vindos do journal (JSON) e do snapshot (pandas) diferem em tipos
+    # e NaN; normaliza antes de comparar
+    if registro is None:
+        return None
+    normalizado = {}
+    for c in COLUNAS:
+        v = registro.get(c)
+        if v is None or (isinstance(v, float) and v != v):
+            normalizado[c] = None
+        elif c == "Valor":
+            try:
+                normalizado[c] = round(float(v), 2)
+            except (TypeError, ValueError):
+                normalizado[c] = str(v)
+        else:
+            normalizado[c] = str(v)
+    return normalizado
+
+
+# -----------------------------
+# CSV + journal
+# -----------------------------
+class BackendCSV:
+    # O CSV não permite ler só um mês: o arquivo é lido uma vez para uma
+    # TabelaColunar (centavos, dias e códigos em arrays numpy) e cada mês é
+    # selecionado pelo intervalo de dias.
+    #
+    # Cada escrita informa a revisão lida junto com os dados. Se outro processo
+    # gravou antes, os eventos dele são aplicados aqui e a escrita segue, a menos
+    # que algum dos registros alterados aqui também tenha mudado lá
+    # (ConflitoDeEscrita). Se esses eventos já foram compactados, o arquivo
+    # inteiro é relido e a escrita é refeita.
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.caminho_regras = caminho_regras(arquivo)
+        self.caminho_cartao = caminho_cartao(arquivo)
+        self._tabela = None
+        self._revisao = None
+
+    def _indice(self):
+        if self._tabela is None:
+            # Lida antes dos dados: no pior caso a primeira escrita faz uma mescla à toa
+            self._revisao = armazenamento.revisao(self.arquivo)
+            self._tabela = armazenamento.carregar_tabela(self.arquivo)
+        return self._tabela
+
+    def _registro(self, id_):
+        return self._tabela.get(id_)
+
+    def _mesclar(self, ids, exclusao=False):
+        # Relê o arquivo inteiro; todos os períodos passam a contar como
+        # alterados. Excluir um registro que outro processo também excluiu não
+        # é conflito.
+        conhecidos = {i: _comparavel(self._registro(i)) for i in ids}
+        anteriores = set(self._tabela.periodos())
+        self._tabela = None
+        atuais = self._indice()
+        conflitos = []
+        for i in ids:
+            atual = _comparavel(self._registro(i))
+            if atual != conhecidos[i] and not (exclusao and atual is None):
+                conflitos.append(i)
+        if conflitos:
+            raise armazenamento.ConflitoDeEscrita(conflitos)
+        return anteriores | set(atuais.periodos())
+
+    def _aplicar_eventos(self, eventos, atual, ids, exclusao=False):
+        # Eventos de outro processo, recebidos com a trava de escrita. São
+        # aplicados mesmo havendo conflito, para a memória refletir o disco.
+        finais = {}
+        conflitos = []
+        for evento in eventos:
+            if evento.get("op") == "excluir":
+                id_ = evento["Id"]
+                if id_ in ids and not exclusao:
+                    conflitos.append(id_)
+                finais[id_] = None
+            else:
+                registro = {c: evento["registro"].get(c) for c in COLUNAS}
+                id_ = registro["Id"]
+                if id_ in ids:
+                    conflitos.append(id_)
+                finais[id_] = registro
+        alterados = {self._tabela.periodo_do_id(i) for i in finais} - {None}
+        alterados |= {periodo_da_data(r["Data"]) for r in finais.values() if r is not None}
+        self._tabela.remover(list(finais))
+        self._tabela.acrescentar(r for r in finais.values() if r is not None)
+        self._revisao = atual
+        if conflitos:
+            raise armazenamento.ConflitoDeEscrita(sorted(set(conflitos)))
+        return alterados
+
+    def _escrever(self, gravar, ids, *args):
+        self._indice()
+        exclusao = gravar is armazenamento.excluir
+        conjunto_ids = set(ids)
+        alterados = set()
+
+        def mesclar(eventos, atual):
+            perfil.contar("mesclas_escrita")
+            alterados.update(self._aplicar_eventos(eventos, atual, conjunto_ids, exclusao))
+
+        for _ in range(TENTATIVAS_ESCRITA):
+            try:
+                self._revisao = gravar(self.arquivo, *args, revisao_esperada=self._revisao, mesclar=mesclar)
+                return alterados
+            except armazenamento.RevisaoDesatualizada:
+                perfil.contar("mesclas_escrita")
+                alterados |= self._mesclar(ids, exclusao)
+        raise armazenamento.ConflitoDeEscrita(ids)
+
+    def versao(self):
+        return armazenamento.versao(self.arquivo)
+
+    def memoria(self):
+        return 0 if self._tabela is None else self._tabela.memoria()
+
+    def periodos(self):
+        return sorted(p for p in self._indice().periodos() if p != (0, 0))
+
+    def agregados_mensais(self):
+        return self._indice().agregados_mensais()
+
+    def cartao_por_dia(self):
+        return self._indice().cartao_por_dia()
+
+    def carregar(self, ano=None, mes=None):
+        tabela = self._indice()
+        if ano is None:
+            return tabela.registros()
+        return tabela.registros(tabela.linhas_do_periodo(int(ano), int(mes)))
+
+    def carregar_dataframe(self):
+        # Todas as transações direto das colunas, sem passar por dicts
+        return self._indice().para_dataframe()
+
+    def existentes(self, *ids):
+        tabela = self._indice()
+        return [tabela[i] for i in ids if i in tabela]
+
+    def inserir(self, *registros):
+        # Um lote inteiro vira uma única escrita no journal
+        if not registros:
+            return None
+        alterados = self._escrever(armazenamento.inserir, [r["Id"] for r in registros], *registros)
+        self._tabela.acrescentar(registros)
+        return alterados
+
+    def atualizar(self, *registros):
+        if not registros:
+            return None
+        alterados = self._escrever(armazenamento.atualizar, [r["Id"] for r in registros], *registros)
+        self._tabela.acrescentar(registros)
+        return alterados
+
+    def excluir(self, *ids):
+        if not ids:
+            return None
+        alterados = self._escrever(armazenamento.excluir, list(ids), *ids)
+        self._tabela.remover(ids)
+        return alterados
+
+
+# -----------------------------
+# SQLite
+# -----------------------------
+class BackendSQLite:
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.caminho_regras = caminho_regras(caminho)
+        self.caminho_cartao = caminho_cartao(caminho)
+        self._con = sqlite3.connect(caminho, check_same_thread=False)
+        with self._con:
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS gastos (
+                    Id TEXT PRIMARY KEY,
+                    Data TEXT,
+                    Ano INTEGER,
+                    Mes INTEGER,
+                    Tipo TEXT,
+                    Descricao TEXT,
+                    Valor REAL,
+                    Forma TEXT,
+                    Categoria TEXT
+                )
+            """)
+            self._con.execute("CREATE INDEX IF NOT EXISTS idx_gastos_periodo ON gastos (Ano, Mes)")
+
+    @staticmethod
+    def _linha(r):
+        ano, mes = periodo_da_data(r["Data"])
+        return (r["Id"], r["Data"], ano, mes, r["Tipo"], r["Descrição"],
+                r["Valor"], r["Forma de pagamento"], r["Categoria"])
+
+    def versao(self):
+        return armazenamento.assinatura(self.caminho)
+
+    def periodos(self):
+        cur = self._con.execute("SELECT DISTINCT Ano, Mes FROM gastos WHERE Ano > 0 ORDER BY Ano, Mes")
+        return [tuple(p) for p in cur.fetchall()]
+
+    def carregar(self, ano=None, mes=None):
+        sql = "SELECT Id, Data, Tipo, Descricao, Valor, Forma, Categoria FROM gastos"
+        if ano is None:
+            cur = self._con.execute(sql)
+        else:
+            cur = self._con.execute(sql + " WHERE Ano = ? AND Mes = ?", (int(ano), int(mes)))
+        return [dict(zip(COLUNAS, linha)) for linha in cur.fetchall()]
+
+    def existentes(self, *ids):
+        sql = "SELECT Id, Data, Tipo, Descricao, Valor, Forma, Categoria FROM gastos WHERE Id IN ({})"
+        registros = []
+        # Em blocos: o SQLite limita a quantidade de parâmetros por consulta
+        for inicio in range(0, len(ids), 500):
+            bloco = ids[inicio:inicio + 500]
+            cur = self._con.execute(sql.format(",".join("?" * len(bloco))), bloco)
+            registros.extend(dict(zip(COLUNAS, linha)) for linha in cur.fetchall())
+        return registros
+
+    def agregados_mensais(self):
+        cur = self._con.execute("""
+            SELECT Ano, Mes, COALESCE(Tipo, ''), COALESCE(Categoria, ''), COALESCE(Forma, ''),
+                   SUM(CAST(ROUND(COALESCE(Valor, 0) * 100) AS INTEGER)), COUNT(*)
+            FROM gastos WHERE Ano > 0 GROUP BY 1, 2, 3, 4, 5
+        """)
+        return pd.DataFrame(cur.fetchall(), columns=COLUNAS_AGREGADAS)
+
+    def cartao_por_dia(self):
+        cur = self._con.execute("""
+            SELECT Data, SUM(CAST(ROUND(COALESCE(Valor, 0) * 100) AS INTEGER)), COUNT(*)
+            FROM gastos WHERE Ano > 0 AND Tipo = 'Despesa' AND Forma = 'Cartão' GROUP BY Data
+        """)
+        df = pd.DataFrame(cur.fetchall(), columns=COLUNAS_CARTAO)
+        df["Data"] = pd.to_datetime(df["Data"], format="%Y-%m-%d", errors="coerce")
+        return df.dropna(subset=["Data"])
+
+    def inserir(self, *registros):
+        with self._con:
+            self._con.executemany(
+                "INSERT OR REPLACE INTO gastos VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [self._linha(r) for r in registros],
+            )
+
+    atualizar = inserir
+
+    def excluir(self, *ids):
+        with self._con:
+            self._con.executemany("DELETE FROM gastos WHERE Id = ?", [(i,) for i in ids])
+
+
+# -----------------------------
+# Parquet particionado por Ano/Mês
+# -----------------------------
+def _linhas_do_resumo(df):
+    # Agregados do mês e compras no cartão por dia de uma partição, como listas
+    # (o formato do resumo.json)
+    agregados = [
+        [int(a), int(m), t, c, f, int(v), int(n)]
+        for a, m, t, c, f, v, n in agregar_mensal(df).itertuples(index=False)
+    ]
+    cartao = [[d.strftime("%Y-%m-%d"), int(v), int(n)] for d, v, n in agregar_cartao(df).itertuples(index=False)]
+    return agregados, cartao
+
+
+class BackendParquet:
+    # Layout: <diretorio>/Ano=2025/Mes=3/gastos.parquet
+    # O índice Id -> partição é um CSV só de acréscimos (_ids.csv); entradas
+    # antigas de Ids já excluídos são inofensivas. Escritas seguram a trava do
+    # usuário e releem o índice se outro processo o alterou.
+    # Ao lado de cada partição fica resumo.json com os agregados do mês e as
+    # compras no cartão por dia, gravado junto com ela; a abertura lê só os
+    # resumos, e uma partição sem resumo válido é lida uma vez para os dois.
+
+    def __init__(self, diretorio):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise RuntimeError("O backend parquet requer o pacote pyarrow (pip install pyarrow)")
+        self.diretorio = diretorio
+        self.caminho_regras = caminho_regras(diretorio)
+        self.caminho_cartao = caminho_cartao(diretorio)
+        os.makedirs(diretorio, exist_ok=True)
+        self._indice = None
+        self._assinatura_indice = None
+        # {(ano, mes): (assinatura da partição, agregados, cartão por dia)}
+        self._resumos = {}
+
+    def _caminho_particao(self, ano, mes):
+        return os.path.join(self.diretorio, f"Ano={ano}", f"Mes={mes}", "gastos.parquet")
+
+    def _ler_particao(self, ano, mes):
+        caminho = self._caminho_particao(ano, mes)
+        if not os.path.exists(caminho):
+            return pd.DataFrame(columns=COLUNAS)
+        perfil.contar_arquivo("bytes_lidos", caminho)
+        return pd.read_parquet(caminho)
+
+    def _caminho_resumo(self, ano, mes):
+        return os.path.join(os.path.dirname(self._caminho_particao(ano, mes)), "resumo.json")
+
+    def _gravar_particao(self, ano, mes, df):
+        caminho = self._caminho_particao(ano, mes)
+        if df.empty:
+            for arquivo in (caminho, self._caminho_resumo(ano, mes)):
+                if os.path.exists(arquivo):
+                    os.remove(arquivo)
+            return
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = caminho + ".tmp"
+        df = df[COLUNAS].astype({"Id": str, "Valor": float})
+        df.to_parquet(temporario, index=False)
+        # O resumo guarda a assinatura do arquivo novo (os.replace mantém
+        # mtime e tamanho) e é gravado antes dele: se o processo cair no meio,
+        # o resumo não corresponde à partição e é ignorado
+        self._gravar_resumo(ano, mes, armazenamento.assinatura(temporario), *_linhas_do_resumo(df))
+        os.replace(temporario, caminho)
+        perfil.contar_arquivo("bytes_gravados", caminho)
+
+    def _gravar_resumo(self, ano, mes, assinatura, agregados, cartao):
+        caminho = self._caminho_resumo(ano, mes)
+        dados = {"particao": list(assinatura), "agregados": agregados, "cartao": cartao}
+        with open(caminho + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(caminho + ".tmp", caminho)
+
+    def _resumo(self, ano, mes):
+        # (linhas dos agregados, linhas do cartão por dia) da partição: da
+        # memória, do resumo.json ou, sem resumo válido (partição antiga ou
+        # gravada por fora), da própria partição
+        assinatura = armazenamento.assinatura(self._caminho_particao(ano, mes))
+        guardado = self._resumos.get((ano, mes))
+        if guardado is not None and guardado[0] == assinatura:
+            return guardado[1:]
+        try:
+            with open(self._caminho_resumo(ano, mes), encoding="utf-8") as f:
+                dados = json.load(f)
+        except (OSError, ValueError):
+            dados = {}
+        if tuple(dados.get("particao") or ()) == assinatura:
+            agregados, cartao = dados["agregados"], dados["cartao"]
+        else:
+            agregados, cartao = _linhas_do_resumo(self._ler_particao(ano, mes))
+        self._resumos[(ano, mes)] = (assinatura, agregados, cartao)
+        return agregados, cartao
+
+    def _caminho_indice(self):
+        return os.path.join(self.diretorio, "_ids.csv")
+
+    def _indice_ids(self):
+        assinatura = armazenamento.assinatura(self._caminho_indice())
+        if self._indice is None or assinatura != self._assinatura_indice:
+            self._indice = {}
+            if assinatura is not None:
+                df = pd.read_csv(self._caminho_indice(), sep=";", dtype={"Id": str})
+                self._indice = dict(zip(df["Id"], zip(df["Ano"].astype(int), df["Mes"].astype(int))))
+            self._assinatura_indice = assinatura
+        return self._indice
+
+    def versao(self):
+        caminhos = glob.glob(os.path.join(self.diretorio, "Ano=*", "Mes=*", "gastos.parquet"))
+        return tuple(sorted((c, armazenamento.assinatura(c)) for c in caminhos + [self._caminho_indice()]))
+
+    def periodos(self):
+        periodos = []
+        for caminho in glob.glob(os.path.join(self.diretorio, "Ano=*", "Mes=*", "gastos.parquet")):
+            mes_dir = os.path.dirname(caminho)
+            ano = int(os.path.basename(os.path.dirname(mes_dir)).split("=")[1])
+            mes = int(os.path.basename(mes_dir).split("=")[1])
+            if ano > 0:
+                periodos.append((ano, mes))
+        return sorted(periodos)
+
+    def agregados_mensais(self):
+        linhas = [linha for p in self.periodos() for linha in self._resumo(*p)[0]]
+        return pd.DataFrame(linhas, columns=COLUNAS_AGREGADAS)
+
+    def cartao_por_dia(self):
+        # Um dia só aparece na partição do seu mês: basta juntar as linhas
+        linhas = [linha for p in self.periodos() for linha in self._resumo(*p)[1]]
+        cartao = pd.DataFrame(linhas, columns=COLUNAS_CARTAO)
+        cartao["Data"] = pd.to_datetime(cartao["Data"], format="%Y-%m-%d")
+        return cartao
+
+    def carregar(self, ano=None, mes=None):
+        if ano is not None:
+            return self._ler_particao(int(ano), int(mes)).to_dict(orient="records")
+        registros = []
+        for a, m in self.periodos() + [(0, 0)]:
+            registros.extend(self._ler_particao(a, m).to_dict(orient="records"))
+        return registros
+
+    def existentes(self, *ids):
+        indice = self._indice_ids()
+        por_particao = {}
+        for i in ids:
+            if i in indice:
+                por_particao.setdefault(indice[i], set()).add(i)
+        registros = []
+        for (ano, mes), ids_particao in por_particao.items():
+            # O índice pode ter entradas antigas de Ids já excluídos
+            atual = self._ler_particao(ano, mes)
+            registros.extend(atual[atual["Id"].isin(ids_particao)].to_dict(orient="records"))
+        return registros
+
+    def inserir(self, *registros):
+        if not registros:
+            return None
+        with armazenamento.travar(self.diretorio):
+            self._inserir(registros)
+        return None
+
+    def _inserir(self, registros):
+        indice = self._indice_ids()
+        # Uma atualização pode mover o registro de mês: remove da partição antiga
+        antigos = [r["Id"] for r in registros if r["Id"] in indice]
+        if antigos:
+            self._excluir(antigos)
+
+        novos = pd.DataFrame(list(registros), columns=COLUNAS)
+        periodos = [periodo_da_data(d) for d in novos["Data"]]
+        novos["_Ano"] = [p[0] for p in periodos]
+        novos["_Mes"] = [p[1] for p in periodos]
+        for (ano, mes), grupo in novos.groupby(["_Ano", "_Mes"]):
+            atual = self._ler_particao(ano, mes)
+            grupo = grupo[COLUNAS]
+            self._gravar_particao(ano, mes, grupo if atual.empty else pd.concat([atual, grupo], ignore_index=True))
+
+        entradas = novos[["Id", "_Ano", "_Mes"]].rename(columns={"_Ano": "Ano", "_Mes": "Mes"})
+        novo_arquivo = not os.path.exists(self._caminho_indice())
+        entradas.to_csv(self._caminho_indice(), sep=";", index=False, mode="a", header=novo_arquivo)
+        indice.update(zip(entradas["Id"], zip(entradas["Ano"], entradas["Mes"])))
+        self._assinatura_indice = armazenamento.assinatura(self._caminho_indice())
+
+    atualizar = inserir
+
+    def excluir(self, *ids):
+        with armazenamento.travar(self.diretorio):
+            self._excluir(ids)
+        return None
+
+    def _excluir(self, ids):
+        indice = self._indice_ids()
+        por_particao = {}
+        for i in ids:
+            if i in indice:
+                por_particao.setdefault(indice.pop(i), set()).add(i)
+        for (ano, mes), ids_particao in por_particao.items():
+            atual = self._ler_particao(ano, mes)
+            self._gravar_particao(ano, mes, atual[~atual["Id"].isin(ids_particao)])
+
+
+# -----------------------------
+# Fábrica e migração
+# -----------------------------
+_CLASSES = {"csv": BackendCSV, "sqlite": BackendSQLite, "parquet": BackendParquet}
+
+
+def abrir_backend(email, tipo=None, base_dir=BASE_DIR):
+    return abrir_backend_do_usuario(hash_usuario(email), tipo, base_dir)
+
+
+def abrir_backend_do_usuario(usuario, tipo=None, base_dir=BASE_DIR):
+    # ``usuario``: o <md5> de gastos_<md5>.csv|.sqlite|.parquet
+    tipo = tipo or BACKEND_PADRAO
+    if tipo not in _CLASSES:
+        raise ValueError(f"Backend desconhecido: {tipo}")
+    os.makedirs(base_dir, exist_ok=True)
+    return _CLASSES[tipo](os.path.join(base_dir, f"gastos_{usuario}.{tipo}"))
+
+
+def usuarios(tipo=None, base_dir=BASE_DIR):
+    # <md5> de todos os usuários com dados no backend (a extensão é o tipo; no
+    # CSV, antes da primeira compactação só existe o journal)
+    tipo = tipo or BACKEND_PADRAO
+    if tipo not in _CLASSES:
+        raise ValueError(f"Backend desconhecido: {tipo}")
+    extensoes = [tipo, "journal"] if tipo == "csv" else [tipo]
+    encontrados = set()
+    for extensao in extensoes:
+        for caminho in glob.glob(os.path.join(base_dir, f"gastos_*.{extensao}")):
+            encontrados.add(os.path.basename(caminho)[len("gastos_"):-len(extensao) - 1])
+    return sorted(encontrados)
+
+
+def migrar_csvs(tipo, base_dir=BASE_DIR):
+    # Copia cada gastos_<md5>.csv (snapshot + journal) para o backend escolhido,
+    # mantendo o mesmo <md5> no nome. Retorna a quantidade de arquivos migrados.
+    migrados = 0
+    for usuario in usuarios("csv", base_dir):
+        nome = f"gastos_{usuario}"
+        arquivo = os.path.join(base_dir, nome + ".csv")
+        if tipo == "sqlite":
+            destino = BackendSQLite(os.path.join(base_dir, nome + ".sqlite"))
+        elif tipo == "parquet":
+            destino = BackendParquet(os.path.join(base_dir, nome + ".parquet"))
+        else:
+            raise ValueError(f"Backend de destino inválido: {tipo}")
+        destino.inserir(*armazenamento.carregar_gastos(arquivo))
+        migrados += 1
+    return migrados
+
@@ -0,0 +1,155 @@
+"""Benchmark das operações principais sobre ledgers sintéticos, sem Streamlit.
+
+Uso::
+
+    python -m financeiro.benchmark --linhas 10000 100000 1000000 --backend csv --json resultado.json
+
+Para cada tamanho é gerado um ledger com o esquema de ``COLUNAS`` espalhado
+por vários anos, categorias e formas de pagamento (com um "Saldo inicial do
+mês" por mês) e são medidas: carga inicial, filtro do mês, totais do resumo,
+busca do saldo do mês, inserção, exclusão, PDF do mês e gráfico por categoria.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from . import backends, graficos, relatorios
+from .esquema import COLUNAS
+from .ledger import Ledger
+
+CATEGORIAS_DESPESA = ["Alimentação", "Transporte", "Moradia", "Lazer", "Saúde", "Internet", "Streaming", "Cartão de Crédito", "Outros"]
+CATEGORIAS_RECEITA = ["Salário", "Freelance", "Investimentos", "Venda", "Outros"]
+FORMAS = ["Cartão", "Pix", "Dinheiro", "Boleto", "Transferência"]
+
+EMAIL_BENCHMARK = "benchmark@exemplo.com"
+
+
+# -----------------------------
+# Ledger sintético
+# -----------------------------
+def gerar_ledger(n_linhas, anos=10, ano_final=2025, semente=0):
+    rng = np.random.default_rng(semente)
+    inicio = pd.Timestamp(ano_final - anos + 1, 1, 1)
+    dias = (pd.Timestamp(ano_final, 12, 31) - inicio).days + 1
+
+    datas = inicio + pd.to_timedelta(rng.integers(0, dias, n_linhas), unit="D")
+    receita = rng.random(n_linhas) < 0.15
+    categorias = np.where(
+        receita,
+        rng.choice(CATEGORIAS_RECEITA, n_linhas),
+        rng.choice(CATEGORIAS_DESPESA, n_linhas),
+    )
+    df = pd.DataFrame({
+        "Id": [str(uuid.UUID(int=int(i), version=4)) for i in rng.integers(0, 2**63, n_linhas, dtype=np.int64)],
+        "Data": datas.strftime("%Y-%m-%d"),
+        "Tipo": np.where(receita, "Receita", "Despesa"),
+        "Descrição": pd.Series(categorias).str.cat(rng.integers(1, 500, n_linhas).astype(str), sep=" #"),
+        "Valor": np.where(receita, rng.uniform(500, 8000, n_linhas), rng.uniform(5, 900, n_linhas)).round(2),
+        "Forma de pagamento": rng.choice(FORMAS, n_linhas),
+        "Categoria": categorias,
+    })
+
+    meses = pd.date_range(inicio, pd.Timestamp(ano_final, 12, 1), freq="MS")
+    saldos = pd.DataFrame({
+        "Id": [f"saldo-{m:%Y-%m}" for m in meses],
+        "Data": meses.strftime("%Y-%m-%d"),
+        "Tipo": "Receita",
+        "Descrição": "Saldo inicial do mês",
+        "Valor": rng.uniform(0, 5000, len(meses)).round(2),
+        "Forma de pagamento": "Saldo",
+        "Categoria": "Saldo Inicial",
+    })
+    return pd.concat([df, saldos], ignore_index=True)[COLUNAS]
+
+
+def preparar_backend(df, tipo, base_dir):
+    # Grava o ledger sintético no backend escolhido (fora da medição)
+    if tipo == "csv":
+        df.to_csv(os.path.join(base_dir, backends.gerar_nome_arquivo(EMAIL_BENCHMARK)), sep=";", index=False)
+    else:
+        backends.abrir_backend(EMAIL_BENCHMARK, tipo, base_dir).inserir(*df.to_dict(orient="records"))
+
+
+# -----------------------------
+# Medição
+# -----------------------------
+def _cronometrar(funcao, repeticoes=1):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        resultado = funcao()
+    return (time.perf_counter() - inicio) * 1000 / repeticoes, resultado
+
+
+def medir(n_linhas, tipo="csv", repeticoes=20):
+    resultados = {"linhas": n_linhas, "backend": tipo}
+    with tempfile.TemporaryDirectory() as base_dir:
+        df = gerar_ledger(n_linhas)
+        preparar_backend(df, tipo, base_dir)
+        ano, mes = 2025, 6
+
+        def carga_inicial():
+            ledger = Ledger(backends.abrir_backend(EMAIL_BENCHMARK, tipo, base_dir))
+            ledger.anos()
+            return ledger
+
+        resultados["carga_inicial_ms"], ledger = _cronometrar(carga_inicial)
+        resultados["filtro_mes_ms"], df_mes = _cronometrar(lambda: ledger.mes(ano, mes))
+        resultados["filtro_mes_cache_ms"], _ = _cronometrar(lambda: ledger.mes(ano, mes), repeticoes)
+        resultados["totais_ms"], totais = _cronometrar(lambda: ledger.totais(ano, mes), repeticoes)
+        resultados["saldo_mes_ms"], _ = _cronometrar(
+            lambda: (ledger.saldo_inicial(ano, mes), ledger.saldo_final(ano, mes)), repeticoes
+        )
+
+        novos = [
+            {"Id": str(uuid.uuid4()), "Data": f"{ano}-{mes:02d}-15", "Tipo": "Despesa", "Descrição": "benchmark",
+             "Valor": 10.0, "Forma de pagamento": "Pix", "Categoria": "Outros"}
+            for _ in range(repeticoes)
+        ]
+        fila = iter(novos)
+        resultados["inserir_ms"], _ = _cronometrar(lambda: ledger.inserir(next(fila)), repeticoes)
+        fila = iter(novos)
+        resultados["excluir_ms"], _ = _cronometrar(lambda: ledger.excluir(next(fila)["Id"]), repeticoes)
+
+        df_mes = ledger.mes(ano, mes)
+        totais = ledger.totais(ano, mes)
+        resultados["linhas_mes"] = len(df_mes)
+        resultados["gerar_pdf_ms"], _ = _cronometrar(lambda: relatorios.gerar_pdf(df_mes, ano, mes, totais))
+
+        despesas = ledger.por_categoria(ano, mes, "Despesa")
+        graficos._cache.clear()
+        resultados["grafico_png_ms"], _ = _cronometrar(lambda: graficos.barras_png(despesas, "Despesas por Categoria", "#ff6b6b"))
+        resultados["grafico_png_cache_ms"], _ = _cronometrar(
+            lambda: graficos.barras_png(despesas, "Despesas por Categoria", "#ff6b6b"), repeticoes
+        )
+    return resultados
+
+
+def imprimir_tabela(resultados):
+    tabela = pd.DataFrame(resultados).set_index(["backend", "linhas"]).T
+    with pd.option_context("display.float_format", "{:.2f}".format, "display.width", 200):
+        print(tabela)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do Controle Financeiro com ledgers sintéticos")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--backend", nargs="+", default=["csv"], choices=["csv", "sqlite", "parquet"])
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument("--json", help="Arquivo para salvar os resultados em JSON")
+    args = parser.parse_args(argv)
+
+    resultados = [medir(n, tipo, args.repeticoes) for tipo in args.backend for n in args.linhas]
+    imprimir_tabela(resultados)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Busca textual em ``Descrição``, ``Categoria`` e ``Forma de pagamento`` em
+todos os meses do ledger.
+
+O índice invertido guarda, para cada termo (minúsculo e sem acentos), o
+conjunto das transações que o contêm, e o vocabulário fica ordenado para que
+um termo da busca case como prefixo ("merc" encontra "Mercado" e "mercearia")
+com uma busca binária. Cada termo da consulta restringe o resultado
+(interseção), então a busca não passa pelas linhas, só pelos conjuntos.
+
+O índice é montado uma vez por ledger, na primeira busca, e depois acompanha
+as inserções e exclusões.
+"""
+import re
+import sys
+from bisect import bisect_left, insort
+
+import numpy as np
+import pandas as pd
+
+from .esquema import COLUNAS, sem_acentos
+
+CAMPOS_BUSCA = ["Descrição", "Categoria", "Forma de pagamento"]
+TAMANHO_PAGINA = 50
+
+_PALAVRA = re.compile(r"\w+")
+
+
+def termos(texto):
+    return _PALAVRA.findall(sem_acentos(texto))
+
+
+class IndiceBusca:
+    def __init__(self):
+        # {Id: tupla nos campos de COLUNAS}, {termo: {Ids}}, termos ordenados
+        self._registros = {}
+        self._postings = {}
+        self._vocabulario = []
+        self._termos_do_texto = {}
+
+    def __len__(self):
+        return len(self._registros)
+
+    def _termos_de(self, texto):
+        # Descrições e categorias se repetem muito: normaliza cada texto uma vez
+        if texto not in self._termos_do_texto:
+            self._termos_do_texto[texto] = tuple(termos(texto))
+        return self._termos_do_texto[texto]
+
+    def _termos_do_registro(self, valores):
+        encontrados = set()
+        for campo in CAMPOS_BUSCA:
+            texto = valores[COLUNAS.index(campo)]
+            if texto is not None and texto == texto:
+                encontrados.update(self._termos_de(str(texto)))
+        return encontrados
+
+    def adicionar(self, *registros):
+        self.adicionar_dataframe(pd.DataFrame(list(registros), columns=COLUNAS))
+
+    def adicionar_dataframe(self, df):
+        # Um Id já indexado é substituído, como no backend
+        df = df.drop_duplicates("Id", keep="last")
+        ids = df["Id"].astype(str).to_numpy(dtype=object)
+        self.remover(*(i for i in ids if i in self._registros))
+        self._registros.update(zip(ids, zip(*(df[c].to_numpy(dtype=object) for c in COLUNAS))))
+        for campo in CAMPOS_BUSCA:
+            # Agrupa os Ids por texto distinto e indexa cada texto uma vez
+            codigos, distintos = pd.factorize(df[campo].fillna("").astype(str))
+            ordem = np.argsort(codigos, kind="stable")
+            limites = np.searchsorted(codigos[ordem], np.arange(len(distintos) + 1))
+            for codigo, texto in enumerate(distintos):
+                ids_do_texto = ids[ordem[limites[codigo]:limites[codigo + 1]]]
+                for termo in self._termos_de(texto):
+                    conjunto = self._postings.get(termo)
+                    if conjunto is None:
+                        conjunto = self._postings[termo] = set()
+                        insort(self._vocabulario, termo)
+                    conjunto.update(ids_do_texto)
+
+    def remover(self, *ids):
+        for id_ in ids:
+            valores = self._registros.pop(id_, None)
+            if valores is None:
+                continue
+            for termo in self._termos_do_registro(valores):
+                conjunto = self._postings.get(termo)
+                if conjunto is None:
+                    continue
+                conjunto.discard(id_)
+                if not conjunto:
+                    del self._postings[termo]
+                    del self._vocabulario[bisect_left(self._vocabulario, termo)]
+
+    def _ids_do_prefixo(self, prefixo):
+        inicio = bisect_left(self._vocabulario, prefixo)
+        fim = bisect_left(self._vocabulario, prefixo + "\U0010ffff", inicio)
+        if fim - inicio == 1:
+            return self._postings[self._vocabulario[inicio]]
+        return set().union(*(self._postings[t] for t in self._vocabulario[inicio:fim]))
+
+    def ids(self, consulta):
+        # Ids que têm, para cada termo da consulta, algum termo com esse prefixo
+        resultado = None
+        for prefixo in sorted(set(termos(consulta)), key=len, reverse=True):
+            encontrados = self._ids_do_prefixo(prefixo)
+            resultado = set(encontrados) if resultado is None else resultado & encontrados
+            if not resultado:
+                return set()
+        return resultado or set()
+
+    def buscar(self, consulta, pagina=1, tamanho=TAMANHO_PAGINA):
+        # (total de resultados, DataFrame da página), mais recentes primeiro;
+        # uma página depois da última devolve a última
+        encontrados = [self._registros[i] for i in self.ids(consulta)]
+        data = COLUNAS.index("Data")
+        encontrados.sort(key=lambda r: r[data] or "", reverse=True)
+        ultima = max(1, -(-len(encontrados) // tamanho))
+        inicio = (min(max(1, int(pagina)), ultima) - 1) * tamanho
+        return len(encontrados), pd.DataFrame(encontrados[inicio:inicio + tamanho], columns=COLUNAS)
+
+    def memoria(self):
+        # Estimativa: tuplas dos registros + conjuntos e dicionários do índice
+        # (os textos são os mesmos objetos do backend e não entram na conta)
+        tuplas = len(self._registros) * sys.getsizeof((None,) * len(COLUNAS))
+        conjuntos = sum(sys.getsizeof(s) for s in self._postings.values())
+        return tuplas + conjuntos + sys.getsizeof(self._registros) + sys.getsizeof(self._postings) + sys.getsizeof(self._vocabulario)
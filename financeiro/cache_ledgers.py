@@ -0,0 +1,89 @@
+"""Cache de ledgers compartilhado por todas as sessões do processo.
+
+Abas e sessões do mesmo usuário usam a mesma instância de ``Ledger`` em vez de
+cada uma carregar (e tipar) a sua cópia do arquivo. A entrada é descartada
+quando a versão dos arquivos no disco (mtime/tamanho dos dados e das regras de
+recorrentes) deixa de ser a que o ledger conhece, ou seja, quando outro processo gravou nos dados. Acima do
+limite de memória (``CF_CACHE_MB``) os ledgers usados há mais tempo saem
+primeiro.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+from . import perfil
+from .backends import BACKEND_PADRAO, BASE_DIR, abrir_backend, gerar_nome_arquivo
+from .ledger import Ledger
+
+LIMITE_MEMORIA = int(os.environ.get("CF_CACHE_MB", "512")) * 1024 * 1024
+
+_ledgers = OrderedDict()
+_lock = threading.Lock()
+_carregando = {}
+
+
+def _chave(email, tipo, base_dir):
+    return tipo, os.path.join(os.path.abspath(base_dir), gerar_nome_arquivo(email))
+
+
+def _trava_carga(chave):
+    # Duas sessões pedindo o mesmo usuário frio leem o arquivo uma única vez
+    with _lock:
+        if chave not in _carregando:
+            _carregando[chave] = threading.Lock()
+        return _carregando[chave]
+
+
+def obter_ledger(email, tipo=None, base_dir=BASE_DIR):
+    tipo = tipo or BACKEND_PADRAO
+    chave = _chave(email, tipo, base_dir)
+    with _trava_carga(chave):
+        with _lock:
+            ledger = _ledgers.get(chave)
+            if ledger is not None:
+                _ledgers.move_to_end(chave)
+        if ledger is not None and ledger.versao_no_disco() == ledger.versao:
+            perfil.contar("cache_ledger_acertos")
+            ledger_atual = ledger
+        else:
+            perfil.contar("cache_ledger_cargas")
+            ledger_atual = Ledger(abrir_backend(email, tipo, base_dir))
+            with _lock:
+                _ledgers[chave] = ledger_atual
+                _ledgers.move_to_end(chave)
+    aplicar_limite(manter=chave)
+    return ledger_atual
+
+
+def memoria_total():
+    with _lock:
+        ledgers = list(_ledgers.values())
+    return sum(ledger.memoria() for ledger in ledgers)
+
+
+def aplicar_limite(limite=None, manter=None):
+    # Descarta os ledgers menos usados até caber no limite; ``manter`` (o que
+    # acabou de ser pedido) nunca é descartado, mesmo sozinho acima do limite.
+    # Sessões que ainda seguram um ledger descartado terminam o rerun com ele e
+    # recebem um novo no próximo.
+    limite = LIMITE_MEMORIA if limite is None else limite
+    with _lock:
+        itens = list(_ledgers.items())
+    tamanhos = {chave: ledger.memoria() for chave, ledger in itens}
+    total = sum(tamanhos.values())
+    descartados = 0
+    for chave, _ in itens:
+        if total <= limite:
+            break
+        if chave == manter:
+            continue
+        with _lock:
+            if _ledgers.pop(chave, None) is not None:
+                total -= tamanhos[chave]
+                descartados += 1
+    return descartados
+
+
+def limpar():
+    with _lock:
+        _ledgers.clear()
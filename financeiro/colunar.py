@@ -0,0 +1,272 @@
+"""Representação colunar e compacta das transações de um usuário em memória.
+
+Em vez de um dict por transação, cada coluna é um array numpy:
+
+- ``centavos``: valor em centavos (int64), sem erro de arredondamento nas somas;
+- ``dias``: data como número de dias desde 1970-01-01 (int32);
+- ``Tipo``/``Categoria``/``Forma de pagamento``: códigos int32 de um dicionário
+  por coluna (``Dicionario``);
+- ``descricao``: referências a uma tabela de textos internados, então
+  descrições repetidas ("Uber", "iFood", ...) existem uma única vez.
+
+A tabela converte de/para o DataFrame no formato de ``COLUNAS`` (e daí para o
+CSV) e responde ``in``/``get`` por Id como o dict de registros que substitui.
+Exclusões só desativam a linha; as linhas mortas são descartadas quando passam
+da metade da tabela.
+"""
+import sys
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .esquema import COLUNAS, ensure_schema, para_centavos
+
+EPOCA = date(1970, 1, 1)
+# Datas inválidas ficam fora de qualquer período, como (0, 0) nos backends
+DIA_INVALIDO = np.iinfo(np.int32).min
+
+COLUNAS_CODIFICADAS = {"Tipo": "tipo", "Categoria": "categoria", "Forma de pagamento": "forma"}
+
+
+class Dicionario:
+    # Texto <-> código inteiro, na ordem em que os textos aparecem
+    def __init__(self):
+        self.valores = []
+        self._codigos = {}
+
+    def codificar(self, valor):
+        codigo = self._codigos.get(valor)
+        if codigo is None:
+            codigo = self._codigos[valor] = len(self.valores)
+            self.valores.append(valor)
+        return codigo
+
+    def codigo(self, valor):
+        # Código de um texto já visto, ou -1
+        return self._codigos.get(valor, -1)
+
+    def codificar_serie(self, serie):
+        inverso, distintos = pd.factorize(serie)
+        codigos = np.fromiter((self.codificar(v) for v in distintos), dtype=np.int32, count=len(distintos))
+        return codigos[inverso]
+
+    def decodificar(self, codigos):
+        return np.asarray(self.valores, dtype=object)[codigos] if len(codigos) else np.empty(0, dtype=object)
+
+
+def _texto(serie):
+    return serie.fillna("").astype(str)
+
+
+def dias_de(serie):
+    datas = pd.to_datetime(serie, format="%Y-%m-%d", errors="coerce")
+    dias = (datas - pd.Timestamp(EPOCA)).dt.days
+    return dias.fillna(DIA_INVALIDO).astype(np.int32).to_numpy()
+
+
+class TabelaColunar:
+    def __init__(self):
+        self.n = 0
+        self.ids = np.empty(0, dtype=object)
+        self.centavos = np.empty(0, dtype=np.int64)
+        self.dias = np.empty(0, dtype=np.int32)
+        self.tipo = np.empty(0, dtype=np.int32)
+        self.categoria = np.empty(0, dtype=np.int32)
+        self.forma = np.empty(0, dtype=np.int32)
+        self.descricao = np.empty(0, dtype=object)
+        self.ativo = np.empty(0, dtype=bool)
+        self.dicionarios = {c: Dicionario() for c in COLUNAS_CODIFICADAS}
+        self._linha_do_id = {}
+        self._textos = {}
+        self._bytes_textos = 0
+        self._bytes_ids = 0
+
+    # -----------------------------
+    # Conversão
+    # -----------------------------
+    @classmethod
+    def de_dataframe(cls, df):
+        tabela = cls()
+        tabela.acrescentar_dataframe(df)
+        return tabela
+
+    @classmethod
+    def de_registros(cls, registros):
+        return cls.de_dataframe(pd.DataFrame(list(registros), columns=COLUNAS))
+
+    @classmethod
+    def de_csv(cls, caminho):
+        return cls.de_dataframe(pd.read_csv(caminho, sep=";", dtype={"Id": str, "Descrição": str}))
+
+    def para_dataframe(self, linhas=None):
+        # DataFrame no formato de COLUNAS (Data ISO, Valor em reais)
+        if linhas is None:
+            linhas = np.flatnonzero(self.ativo[:self.n])
+        dias = self.dias[linhas]
+        validos = dias != DIA_INVALIDO
+        datas = pd.Series(pd.Timestamp(EPOCA) + pd.to_timedelta(np.where(validos, dias, 0), unit="D"))
+        data_iso = datas.dt.strftime("%Y-%m-%d").where(validos, None)
+        colunas = {
+            "Id": self.ids[linhas],
+            "Data": data_iso.to_numpy(dtype=object),
+            "Descrição": self.descricao[linhas],
+            "Valor": self.centavos[linhas] / 100,
+        }
+        for coluna, atributo in COLUNAS_CODIFICADAS.items():
+            colunas[coluna] = self.dicionarios[coluna].decodificar(getattr(self, atributo)[linhas])
+        return pd.DataFrame(colunas, columns=COLUNAS)
+
+    def para_csv(self, caminho):
+        self.para_dataframe().to_csv(caminho, sep=";", index=False)
+
+    def registros(self, linhas=None):
+        return self.para_dataframe(linhas).to_dict(orient="records")
+
+    # -----------------------------
+    # Acesso por Id
+    # -----------------------------
+    def __len__(self):
+        return len(self._linha_do_id)
+
+    def __contains__(self, id_):
+        return id_ in self._linha_do_id
+
+    def __getitem__(self, id_):
+        return self.registros([self._linha_do_id[id_]])[0]
+
+    def get(self, id_, padrao=None):
+        return self[id_] if id_ in self._linha_do_id else padrao
+
+    # -----------------------------
+    # Alterações
+    # -----------------------------
+    def _reservar(self, k):
+        necessario = self.n + k
+        if necessario <= len(self.ativo):
+            return
+        capacidade = max(necessario, 2 * len(self.ativo), 1024)
+        for atributo in ("ids", "centavos", "dias", "tipo", "categoria", "forma", "descricao", "ativo"):
+            antigo = getattr(self, atributo)
+            novo = np.zeros(capacidade, dtype=antigo.dtype) if antigo.dtype != object else np.empty(capacidade, dtype=object)
+            novo[:self.n] = antigo[:self.n]
+            setattr(self, atributo, novo)
+
+    def _internar(self, textos):
+        inverso, distintos = pd.factorize(textos)
+        internados = np.empty(len(distintos), dtype=object)
+        for i, texto in enumerate(distintos):
+            existente = self._textos.get(texto)
+            if existente is None:
+                existente = self._textos[texto] = texto
+                self._bytes_textos += sys.getsizeof(texto)
+            internados[i] = existente
+        return internados[inverso]
+
+    def acrescentar_dataframe(self, df):
+        # Ids já presentes são substituídos; num mesmo lote vale a última linha
+        df = ensure_schema(df.copy())
+        df["Id"] = _texto(df["Id"])
+        df = df.drop_duplicates("Id", keep="last")
+        if self._linha_do_id:
+            self.remover(df["Id"])
+        k = len(df)
+        if not k:
+            return
+        self._reservar(k)
+        inicio, fim = self.n, self.n + k
+        ids = df["Id"].to_numpy(dtype=object)
+        self.ids[inicio:fim] = ids
+        self.centavos[inicio:fim] = para_centavos(df["Valor"]).to_numpy()
+        self.dias[inicio:fim] = dias_de(df["Data"])
+        for coluna, atributo in COLUNAS_CODIFICADAS.items():
+            getattr(self, atributo)[inicio:fim] = self.dicionarios[coluna].codificar_serie(_texto(df[coluna]))
+        self.descricao[inicio:fim] = self._internar(_texto(df["Descrição"]))
+        self.ativo[inicio:fim] = True
+        self._linha_do_id.update(zip(ids, range(inicio, fim)))
+        self._bytes_ids += sum(map(sys.getsizeof, ids))
+        self.n = fim
+
+    def acrescentar(self, registros):
+        self.acrescentar_dataframe(pd.DataFrame(list(registros), columns=COLUNAS))
+
+    def remover(self, ids):
+        linhas = [self._linha_do_id.pop(i) for i in ids if i in self._linha_do_id]
+        if not linhas:
+            return
+        self.ativo[linhas] = False
+        self._bytes_ids -= sum(sys.getsizeof(i) for i in self.ids[linhas])
+        self.ids[linhas] = None
+        self.descricao[linhas] = None
+        if self.n > 1024 and len(self._linha_do_id) < self.n // 2:
+            self._compactar()
+
+    def _compactar(self):
+        vivas = np.flatnonzero(self.ativo[:self.n])
+        for atributo in ("ids", "centavos", "dias", "tipo", "categoria", "forma", "descricao", "ativo"):
+            setattr(self, atributo, getattr(self, atributo)[vivas].copy())
+        self.n = len(vivas)
+        self._linha_do_id = dict(zip(self.ids, range(self.n)))
+
+    # -----------------------------
+    # Consultas
+    # -----------------------------
+    def linhas_do_periodo(self, ano, mes):
+        inicio = (date(ano, mes, 1) - EPOCA).days
+        fim = (date(ano + mes // 12, mes % 12 + 1, 1) - EPOCA).days
+        dias = self.dias[:self.n]
+        return np.flatnonzero(self.ativo[:self.n] & (dias >= inicio) & (dias < fim))
+
+    def periodos(self):
+        dias = self.dias[:self.n][self.ativo[:self.n]]
+        validos = dias[dias != DIA_INVALIDO]
+        meses = np.unique(validos.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64))
+        periodos = [(1970 + int(m) // 12, int(m) % 12 + 1) for m in meses]
+        if len(validos) < len(dias):
+            periodos.append((0, 0))
+        return periodos
+
+    def agregados_mensais(self):
+        # Mesmo resultado de agregados.agregar_mensal, agrupando os códigos
+        vivas = self.ativo[:self.n] & (self.dias[:self.n] != DIA_INVALIDO)
+        meses = self.dias[:self.n][vivas].astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        base = pd.DataFrame({
+            "mes": meses,
+            **{atributo: getattr(self, atributo)[:self.n][vivas] for atributo in COLUNAS_CODIFICADAS.values()},
+            "Centavos": self.centavos[:self.n][vivas],
+        })
+        grupos = base.groupby(["mes", *COLUNAS_CODIFICADAS.values()])["Centavos"].agg(["sum", "count"]).reset_index()
+        colunas = {"Ano": 1970 + grupos["mes"] // 12, "Mês": grupos["mes"] % 12 + 1}
+        for coluna, atributo in COLUNAS_CODIFICADAS.items():
+            colunas[coluna] = self.dicionarios[coluna].decodificar(grupos[atributo].to_numpy())
+        colunas["Centavos"] = grupos["sum"]
+        colunas["Quantidade"] = grupos["count"]
+        return pd.DataFrame(colunas)
+
+    def cartao_por_dia(self):
+        # Mesmo resultado de faturas.agregar_cartao, direto dos códigos e dias
+        despesa = self.dicionarios["Tipo"].codigo("Despesa")
+        cartao = self.dicionarios["Forma de pagamento"].codigo("Cartão")
+        vivas = (self.ativo[:self.n] & (self.dias[:self.n] != DIA_INVALIDO)
+                 & (self.tipo[:self.n] == despesa) & (self.forma[:self.n] == cartao))
+        dias, inverso = np.unique(self.dias[:self.n][vivas], return_inverse=True)
+        return pd.DataFrame({
+            "Data": dias.astype("datetime64[D]").astype("datetime64[ns]"),
+            "Centavos": np.bincount(inverso, weights=self.centavos[:self.n][vivas], minlength=len(dias)).astype(np.int64),
+            "Quantidade": np.bincount(inverso, minlength=len(dias)).astype(np.int64),
+        })
+
+    def periodo_do_id(self, id_):
+        linha = self._linha_do_id.get(id_)
+        if linha is None:
+            return None
+        dia = int(self.dias[linha])
+        if dia == DIA_INVALIDO:
+            return 0, 0
+        data = EPOCA + timedelta(days=dia)
+        return data.year, data.month
+
+    def memoria(self):
+        # Bytes dos arrays + índice por Id + textos de Ids e descrições (contados uma vez)
+        arrays = sum(getattr(self, a).nbytes for a in ("ids", "centavos", "dias", "tipo", "categoria", "forma", "descricao", "ativo"))
+        return arrays + sys.getsizeof(self._linha_do_id) + self._bytes_ids + self._bytes_textos
@@ -0,0 +1,72 @@
+import unicodedata
+
+import pandas as pd
+from datetime import date, datetime
+
+# Colunas persistidas de cada transação
+COLUNAS = ["Id", "Data", "Tipo", "Descrição", "Valor", "Forma de pagamento", "Categoria"]
+
+
+def to_iso_date(d):
+    if isinstance(d, (pd.Timestamp, datetime)):
+        return d.date().isoformat()
+    if isinstance(d, date):
+        return d.isoformat()
+    try:
+        return pd.to_datetime(d, dayfirst=True).date().isoformat()
+    except Exception:
+        return None
+
+
+def ensure_schema(df):
+    for c in COLUNAS:
+        if c not in df.columns:
+            df[c] = pd.Series(dtype="object")
+    return df[COLUNAS]
+
+
+def to_iso_dates(serie):
+    # Versão vetorizada de to_iso_date para colunas inteiras: tenta os formatos
+    # mais comuns em extratos, um por vez, só nas linhas ainda sem data
+    texto = serie.astype(str).str.strip()
+    datas = pd.to_datetime(texto, format="%Y-%m-%d", errors="coerce")
+    for formato in ("%d/%m/%Y", "%d/%m/%y", "%Y%m%d", "%d-%m-%Y", "%d.%m.%Y"):
+        faltando = datas.isna()
+        if not faltando.any():
+            break
+        datas[faltando] = pd.to_datetime(texto[faltando], format=formato, errors="coerce")
+    return datas.dt.strftime("%Y-%m-%d").where(datas.notna(), None)
+
+
+def converter_valor(texto):
+    # "1.234,56" -> 1234.56; levanta ValueError se não for um número
+    return float(texto.replace(" ", "").replace(".", "").replace(",", "."))
+
+
+def converter_valores(serie):
+    # Versão vetorizada: aceita "1.234,56", "-1234.56", "R$ 10,00" e "(10,00)"
+    texto = serie.astype(str).str.strip().str.replace(r"[R$\s]", "", regex=True)
+    entre_parenteses = texto.str.startswith("(") & texto.str.endswith(")")
+    texto = texto.str.strip("()")
+    brasileiro = texto.str.contains(",", regex=False)
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    valores = pd.to_numeric(texto, errors="coerce")
+    return valores.where(~entre_parenteses, -valores)
+
+
+def sem_acentos(texto):
+    # "Açaí Pão" -> "acai pao" (busca, importação e deduplicação)
+    decomposto = unicodedata.normalize("NFKD", str(texto))
+    return "".join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def sem_acentos_serie(serie):
+    # Versão para colunas: cada texto distinto é convertido uma vez; nulos viram ""
+    codigos, distintos = pd.factorize(serie.fillna("").astype(str))
+    convertidos = pd.Index([sem_acentos(t) for t in distintos], dtype=object)
+    return pd.Series(convertidos.take(codigos) if len(codigos) else [], index=serie.index, dtype=object)
+
+
+def para_centavos(serie):
+    # Valores em reais -> centavos inteiros (int64); inválidos viram 0
+    return (pd.to_numeric(serie, errors="coerce").fillna(0) * 100).round().astype("int64")
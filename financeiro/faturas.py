@@ -0,0 +1,145 @@
+"""Faturas do cartão de crédito: cada despesa no "Cartão" cai na fatura do
+ciclo em que foi feita, e o total da fatura sai do saldo no mês do vencimento.
+
+Com fechamento no dia ``F`` e vencimento no dia ``V``, uma compra até o dia
+``F`` (ou o último dia do mês, se o mês for mais curto) entra na fatura que
+fecha no mesmo mês; depois disso, na do mês seguinte. A fatura vence no mês
+do fechamento se ``V > F`` e no mês seguinte caso contrário.
+
+O índice guarda o total em centavos por mês de vencimento. É montado de uma
+vez a partir das somas por dia das compras no cartão (``cartao_por_dia`` dos
+backends), com o mês de vencimento calculado em arrays numpy, e depois só
+recebe somas e subtrações nas inserções e exclusões. Como o ``IndiceAgregado``,
+marca em ``sujos`` os meses alterados para o saldo corrente recalcular.
+
+O fechamento e o vencimento de cada usuário ficam em ``gastos_<md5>.cartao.json``.
+"""
+import calendar
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from .esquema import para_centavos
+
+FECHAMENTO_PADRAO = 25
+VENCIMENTO_PADRAO = 5
+COLUNAS_CARTAO = ["Data", "Centavos", "Quantidade"]
+
+
+def eh_compra_no_cartao(df):
+    return (df["Tipo"] == "Despesa") & (df["Forma de pagamento"] == "Cartão")
+
+
+def agregar_cartao(df):
+    # Transações no formato de COLUNAS -> soma em centavos das compras no
+    # cartão por dia (Data datetime64)
+    compras = df[eh_compra_no_cartao(df)]
+    base = pd.DataFrame({
+        "Data": pd.to_datetime(compras["Data"], format="%Y-%m-%d", errors="coerce"),
+        "Centavos": para_centavos(compras["Valor"]),
+    }).dropna(subset=["Data"])
+    grupos = base.groupby("Data")["Centavos"].agg(Centavos="sum", Quantidade="count")
+    return grupos.reset_index()[COLUNAS_CARTAO]
+
+
+def ler_configuracao(caminho):
+    try:
+        with open(caminho, encoding="utf-8") as f:
+            dados = json.load(f)
+        return int(dados["fechamento"]), int(dados["vencimento"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return FECHAMENTO_PADRAO, VENCIMENTO_PADRAO
+
+
+def gravar_configuracao(caminho, fechamento, vencimento):
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump({"fechamento": int(fechamento), "vencimento": int(vencimento)}, f)
+    os.replace(temporario, caminho)
+
+
+def _periodo(indice):
+    # Meses desde 1970-01 -> (ano, mes)
+    return 1970 + int(indice) // 12, int(indice) % 12 + 1
+
+
+class IndiceFaturas:
+    def __init__(self, fechamento=FECHAMENTO_PADRAO, vencimento=VENCIMENTO_PADRAO):
+        self.fechamento = int(fechamento)
+        self.vencimento = int(vencimento)
+        # {(ano, mes) do vencimento: [centavos, quantidade]}
+        self._faturas = {}
+        self.sujos = set()
+
+    def _meses_de_vencimento(self, dias):
+        # datetime64[D] -> array com o mês de vencimento (meses desde 1970-01)
+        meses = dias.astype("datetime64[M]")
+        dia = (dias - meses.astype("datetime64[D]")).astype(np.int64) + 1
+        dias_no_mes = ((meses + 1).astype("datetime64[D]") - meses.astype("datetime64[D]")).astype(np.int64)
+        fecha_em = meses.astype(np.int64) + (dia > np.minimum(self.fechamento, dias_no_mes))
+        return fecha_em + (1 if self.vencimento <= self.fechamento else 0)
+
+    def _aplicar(self, datas, centavos, quantidades, sinal):
+        dias = pd.to_datetime(pd.Series(datas), format="%Y-%m-%d", errors="coerce").to_numpy(dtype="datetime64[D]")
+        validas = ~np.isnat(dias)
+        if not validas.any():
+            return
+        tabela = pd.DataFrame({
+            "mes": self._meses_de_vencimento(dias[validas]),
+            "Centavos": np.asarray(centavos)[validas],
+            "Quantidade": np.asarray(quantidades)[validas],
+        })
+        for mes, total, n in tabela.groupby("mes")[["Centavos", "Quantidade"]].sum().itertuples():
+            periodo = _periodo(mes)
+            fatura = self._faturas.setdefault(periodo, [0, 0])
+            fatura[0] += sinal * int(total)
+            fatura[1] += sinal * int(n)
+            if fatura[1] <= 0:
+                del self._faturas[periodo]
+            self.sujos.add(periodo)
+
+    def indexar(self, *tabelas):
+        # Substitui o índice pelas somas por dia (formato de COLUNAS_CARTAO)
+        self.sujos |= set(self._faturas)
+        self._faturas = {}
+        for tabela in tabelas:
+            if not tabela.empty:
+                self._aplicar(tabela["Data"], tabela["Centavos"].to_numpy(), tabela["Quantidade"].to_numpy(), +1)
+
+    def _aplicar_transacoes(self, df, sinal):
+        compras = df[eh_compra_no_cartao(df)]
+        self._aplicar(compras["Data"], para_centavos(compras["Valor"]).to_numpy(), np.ones(len(compras), dtype=np.int64), sinal)
+
+    def adicionar(self, df):
+        self._aplicar_transacoes(df, +1)
+
+    def remover(self, df):
+        self._aplicar_transacoes(df, -1)
+
+    def periodos(self):
+        return sorted(self._faturas)
+
+    def centavos(self, ano, mes):
+        return self._faturas.get((int(ano), int(mes)), [0, 0])[0]
+
+    def ciclo(self, ano, mes):
+        # (primeira compra, última compra, vencimento) da fatura que vence em ano/mes
+        fecha_em = int(ano) * 12 + int(mes) - 1 - (1 if self.vencimento <= self.fechamento else 0)
+        ano_f, mes_f = divmod(fecha_em, 12)
+        ano_a, mes_a = divmod(fecha_em - 1, 12)
+        fechamento = date(ano_f, mes_f + 1, min(self.fechamento, calendar.monthrange(ano_f, mes_f + 1)[1]))
+        anterior = date(ano_a, mes_a + 1, min(self.fechamento, calendar.monthrange(ano_a, mes_a + 1)[1]))
+        vencimento = date(int(ano), int(mes), min(self.vencimento, calendar.monthrange(int(ano), int(mes))[1]))
+        return anterior + timedelta(days=1), fechamento, vencimento
+
+    def tabela(self):
+        # Uma linha por fatura, da mais recente para a mais antiga
+        linhas = []
+        for ano, mes in reversed(self.periodos()):
+            inicio, fim, vencimento = self.ciclo(ano, mes)
+            centavos, n = self._faturas[(ano, mes)]
+            linhas.append({"Vencimento": vencimento, "Compras de": inicio, "Compras até": fim, "Compras": n, "Total": centavos / 100})
+        return pd.DataFrame(linhas, columns=["Vencimento", "Compras de", "Compras até", "Compras", "Total"])
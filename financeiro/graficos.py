@@ -0,0 +1,62 @@
+"""Gráficos de totais por categoria.
+
+No modo ``nativo`` (padrão) o app usa os gráficos do próprio Streamlit e o
+matplotlib nem é importado. PNGs (modo ``imagem`` ou para embutir no PDF) são
+renderizados com a API orientada a objetos do matplotlib - sem pyplot, então
+nenhuma figura fica registrada no processo - e guardados num cache LRU pela
+série agregada.
+"""
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+MODO = os.environ.get("CF_GRAFICOS", "nativo")
+
+# Quantidade de imagens mantidas no cache
+LIMITE_CACHE = 64
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _chave(totais, titulo, cor):
+    return titulo, cor, tuple(map(str, totais.index)), tuple(round(float(v), 2) for v in totais.to_numpy())
+
+
+def _renderizar(totais, titulo, cor):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    try:
+        ax = fig.subplots()
+        ax.bar([str(c) for c in totais.index], totais.to_numpy(), color=cor)
+        ax.set_ylabel("Valor (R$)")
+        ax.set_xlabel("Categoria")
+        ax.set_title(titulo)
+        ax.tick_params(axis="x", labelrotation=20)
+        fig.tight_layout()
+        buffer = BytesIO()
+        fig.savefig(buffer, format="png", dpi=100)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def barras_png(totais, titulo, cor):
+    chave = _chave(totais, titulo, cor)
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+
+    png = _renderizar(totais, titulo, cor)
+
+    with _cache_lock:
+        _cache[chave] = png
+        _cache.move_to_end(chave)
+        while len(_cache) > LIMITE_CACHE:
+            _cache.popitem(last=False)
+    return png
@@ -0,0 +1,187 @@
+"""Importação em lote de extratos bancários e faturas de cartão (CSV ou OFX).
+
+O arquivo é lido em blocos e normalizado de forma vetorizada (datas, valores,
+tipo e categoria por regras). Linhas que já existem no ledger são descartadas
+pelo hash do conteúdo, e o lote restante é gravado numa única escrita.
+
+Sem coluna ``Tipo``, o sinal do valor define receita ou despesa. Extratos de
+conta trazem débitos negativos; faturas de cartão em CSV costumam trazer as
+compras positivas (e pagamentos/estornos negativos), então com a forma
+"Cartão" o padrão é ``despesas_positivas=True``. OFX segue a especificação
+(débito negativo) em qualquer caso, salvo se a opção for informada.
+"""
+import io
+import re
+import uuid
+
+import pandas as pd
+
+from .esquema import COLUNAS, converter_valores, para_centavos, sem_acentos, sem_acentos_serie, to_iso_dates
+
+TAMANHO_BLOCO = 20000
+
+# Primeira regra que casar com a descrição define a categoria (sem acentos,
+# minúsculas). O que não casar fica em "Outros".
+REGRAS_PADRAO = [
+    (r"salario|folha|proventos", "Salário"),
+    (r"mercado|supermerc|padaria|acougue|ifood|restaurante|lanchonete|rappi", "Alimentação"),
+    (r"uber|\b99\b|posto|combust|estacionamento|metro|onibus|pedagio", "Transporte"),
+    (r"aluguel|condominio|energia|\bluz\b|saneamento|\bagua\b|\bgas\b|iptu", "Moradia"),
+    (r"netflix|spotify|prime video|disney|hbo|globoplay|youtube", "Streaming"),
+    (r"internet|\bvivo\b|\bclaro\b|\btim\b|\boi\b|telefone", "Internet"),
+    (r"farmacia|drogaria|hospital|clinica|laboratorio|plano de saude", "Saúde"),
+    (r"cinema|teatro|\bshow\b|\bbar\b|viagem|hotel", "Lazer"),
+    (r"fatura|cartao de credito", "Cartão de Crédito"),
+]
+
+_CANDIDATAS = {
+    "Data": ["data", "date", "data lancamento", "data da compra", "dt lancamento"],
+    "Descrição": ["descricao", "historico", "lancamento", "description", "title", "memo", "estabelecimento", "detalhe"],
+    "Valor": ["valor", "valor (r$)", "amount", "quantia", "valor r$"],
+}
+
+
+def _normalizar_texto(serie):
+    return sem_acentos_serie(serie).str.strip()
+
+
+# -----------------------------
+# Normalização vetorizada
+# -----------------------------
+def categorizar(descricoes, regras=REGRAS_PADRAO):
+    texto = _normalizar_texto(descricoes)
+    categorias = pd.Series(None, index=descricoes.index, dtype=object)
+    for padrao, categoria in regras:
+        livres = categorias.isna()
+        if not livres.any():
+            break
+        categorias[livres & texto.str.contains(padrao, regex=True)] = categoria
+    return categorias.fillna("Outros")
+
+
+def normalizar(bruto, forma, regras=REGRAS_PADRAO, despesas_positivas=False):
+    # bruto: DataFrame com Data, Descrição e Valor em texto (Tipo/Categoria opcionais)
+    df = pd.DataFrame(index=bruto.index)
+    df["Data"] = to_iso_dates(bruto["Data"])
+    valores = converter_valores(bruto["Valor"])
+    if "Tipo" in bruto.columns:
+        df["Tipo"] = bruto["Tipo"].where(bruto["Tipo"].isin(["Receita", "Despesa"]), "Despesa")
+    else:
+        despesa = valores.gt(0) if despesas_positivas else valores.lt(0)
+        df["Tipo"] = despesa.map({True: "Despesa", False: "Receita"})
+    df["Descrição"] = bruto["Descrição"].fillna("").astype(str).str.strip()
+    df["Valor"] = valores.abs().round(2)
+    df["Forma de pagamento"] = bruto["Forma de pagamento"] if "Forma de pagamento" in bruto.columns else forma
+    if "Categoria" in bruto.columns:
+        df["Categoria"] = bruto["Categoria"].fillna("Outros")
+    else:
+        df["Categoria"] = categorizar(df["Descrição"], regras)
+    return df.dropna(subset=["Data", "Valor"])
+
+
+# -----------------------------
+# Leitura dos formatos
+# -----------------------------
+def _mapear_colunas(colunas):
+    normalizadas = {sem_acentos(c).strip(): c for c in colunas}
+    mapa = {}
+    for destino, candidatas in _CANDIDATAS.items():
+        for candidata in candidatas:
+            if candidata in normalizadas:
+                mapa[normalizadas[candidata]] = destino
+                break
+        else:
+            raise ValueError(f"Coluna de {destino} não encontrada no CSV")
+    # Arquivos exportados pelo próprio app trazem Tipo/Categoria/Forma
+    for extra in ("Tipo", "Categoria", "Forma de pagamento"):
+        if extra in colunas:
+            mapa[extra] = extra
+    return mapa
+
+
+def ler_csv(texto, forma, regras=REGRAS_PADRAO, despesas_positivas=None):
+    if despesas_positivas is None:
+        despesas_positivas = forma == "Cartão"
+    primeira_linha = texto.split("\n", 1)[0]
+    sep = ";" if primeira_linha.count(";") >= primeira_linha.count(",") else ","
+    blocos = []
+    mapa = None
+    for bloco in pd.read_csv(io.StringIO(texto), sep=sep, dtype=str, chunksize=TAMANHO_BLOCO):
+        if mapa is None:
+            mapa = _mapear_colunas(list(bloco.columns))
+        bruto = bloco[list(mapa)].rename(columns=mapa)
+        blocos.append(normalizar(bruto, forma, regras, despesas_positivas))
+    if not blocos:
+        return pd.DataFrame(columns=COLUNAS[1:])
+    return pd.concat(blocos, ignore_index=True)
+
+
+_TRANSACAO_OFX = re.compile(r"<STMTTRN>(.*?)(?:</STMTTRN>|(?=<STMTTRN>)|(?=</BANKTRANLIST>))", re.S | re.I)
+
+
+def _campo_ofx(bloco, campo):
+    m = re.search(rf"<{campo}>([^<\r\n]*)", bloco, re.I)
+    return m.group(1).strip() if m else None
+
+
+def ler_ofx(texto, forma, regras=REGRAS_PADRAO, despesas_positivas=None):
+    blocos = _TRANSACAO_OFX.findall(texto)
+    bruto = pd.DataFrame({
+        "Data": [(_campo_ofx(b, "DTPOSTED") or "")[:8] for b in blocos],
+        "Valor": [_campo_ofx(b, "TRNAMT") for b in blocos],
+        "Descrição": [_campo_ofx(b, "MEMO") or _campo_ofx(b, "NAME") or "" for b in blocos],
+    })
+    return normalizar(bruto, forma, regras, bool(despesas_positivas))
+
+
+def ler_extrato(conteudo, nome, forma, regras=REGRAS_PADRAO, despesas_positivas=None):
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode("latin-1")
+    if nome.lower().endswith(".ofx") or "<OFX>" in conteudo[:2000].upper():
+        return ler_ofx(conteudo, forma, regras, despesas_positivas)
+    return ler_csv(conteudo, forma, regras, despesas_positivas)
+
+
+# -----------------------------
+# Deduplicação e gravação
+# -----------------------------
+def hashes_conteudo(df):
+    # Hash de (Data, Tipo, Valor em centavos, descrição normalizada) + número da
+    # ocorrência: duas compras iguais no mesmo dia continuam sendo duas linhas.
+    if df.empty:
+        return pd.Series([], dtype="uint64")
+    datas = df["Data"]
+    if pd.api.types.is_datetime64_any_dtype(datas):
+        datas = datas.dt.strftime("%Y-%m-%d")
+    base = pd.DataFrame({
+        "Data": datas.astype(str).to_numpy(),
+        "Tipo": df["Tipo"].astype(str).to_numpy(),
+        "Centavos": para_centavos(df["Valor"]).to_numpy(),
+        "Descrição": _normalizar_texto(df["Descrição"]).to_numpy(),
+    })
+    conteudo = pd.util.hash_pandas_object(base, index=False)
+    ocorrencia = conteudo.groupby(conteudo).cumcount().astype("uint64")
+    return pd.util.hash_pandas_object(pd.DataFrame({"h": conteudo.to_numpy(), "n": ocorrencia.to_numpy()}), index=False)
+
+
+def remover_duplicados(novos, ledger):
+    # Compara só com os meses cobertos pelo extrato
+    meses = novos["Data"].str[:7].drop_duplicates()
+    periodos = set(zip(meses.str[:4].astype(int), meses.str[5:7].astype(int)))
+    existentes = [ledger.mes(a, m) for a, m in sorted(periodos) if (a, m) in ledger.periodos]
+    if not existentes:
+        return novos
+    indice = set(hashes_conteudo(pd.concat(existentes, ignore_index=True)).to_numpy())
+    return novos[~hashes_conteudo(novos).isin(indice).to_numpy()]
+
+
+def importar(ledger, conteudo, nome, forma="Transferência", regras=REGRAS_PADRAO, despesas_positivas=None):
+    # Retorna (importadas, duplicadas)
+    lidas = ler_extrato(conteudo, nome, forma, regras, despesas_positivas)
+    novas = remover_duplicados(lidas, ledger).copy()
+    novas.insert(0, "Id", [str(uuid.uuid4()) for _ in range(len(novas))])
+    ledger.inserir(*novas[COLUNAS].to_dict(orient="records"))
+    return len(novas), len(lidas) - len(novas)
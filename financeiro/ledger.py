@@ -0,0 +1,392 @@
+"""Ledger tipado do usuário, mantido entre os reruns do Streamlit.
+
+Cada mês é lido do backend e convertido uma única vez para um DataFrame com
+colunas tipadas (``Data`` datetime64, ``Valor`` float, ``Tipo``/``Categoria``/
+``Forma de pagamento`` categóricas) e as derivadas ``Data Formatada``, ``Ano`` e
+``Mês``. Inserções e exclusões alteram apenas a partição do mês afetado e
+atualizam o índice de totais (``agregados``) junto. O índice cobre todos os
+meses desde a abertura e alimenta o saldo corrente (``saldos``) e as
+tendências de vários anos (``tendencias``), calculadas uma vez por revisão do
+índice. A busca textual (``busca``) tem o seu índice montado na primeira
+busca e mantido junto com as inserções e exclusões.
+
+Recorrentes e parcelados (``recorrencias``) não estão no backend: as
+ocorrências entram no índice agregado na abertura e no DataFrame de um mês só
+quando ele é carregado. Excluir uma ocorrência grava uma exceção na regra.
+
+As compras no cartão também alimentam o índice de faturas (``faturas``), que
+desconta cada fatura do saldo no mês do vencimento.
+
+O mesmo ``Ledger`` pode ser usado por várias sessões ao mesmo tempo (ver
+``cache_ledgers``): leituras e alterações passam por uma trava, e os DataFrames
+de cada mês nunca são alterados no lugar, só substituídos. Meses que outro
+processo alterou (e que o backend mesclou durante uma escrita) são descartados
+e recarregados no próximo acesso.
+"""
+import threading
+from datetime import date
+
+import pandas as pd
+
+from . import perfil, recorrencias, tendencias
+from .agregados import IndiceAgregado, somar_agregados
+from .armazenamento import ConflitoDeEscrita, assinatura
+from .backends import periodo_da_data
+from .busca import TAMANHO_PAGINA, IndiceBusca
+from .esquema import COLUNAS, ensure_schema
+from .faturas import IndiceFaturas, gravar_configuracao, ler_configuracao
+from .saldos import SaldoCorrente
+
+COLUNAS_CATEGORICAS = ["Tipo", "Categoria", "Forma de pagamento"]
+
+
+def tipar(df):
+    df = ensure_schema(df).copy()
+    df["Id"] = df["Id"].astype(str)
+    df["Data"] = pd.to_datetime(df["Data"], format="%Y-%m-%d", errors="coerce")
+    df = df.dropna(subset=["Data"])
+    df["Descrição"] = df["Descrição"].fillna("").astype(str)
+    df["Valor"] = pd.to_numeric(df["Valor"], errors="coerce").fillna(0.0).astype(float)
+    for c in COLUNAS_CATEGORICAS:
+        df[c] = df[c].fillna("").astype(str).astype("category")
+    df["Data Formatada"] = df["Data"].dt.strftime("%d/%m/%Y")
+    df["Ano"] = df["Data"].dt.year.astype(int)
+    df["Mês"] = df["Data"].dt.month.astype(int)
+    return df.reset_index(drop=True)
+
+
+def concatenar(a, b):
+    # Unifica as categorias antes do concat para não cair para dtype object
+    if a.empty:
+        return b
+    a, b = a.copy(), b.copy()
+    for c in COLUNAS_CATEGORICAS:
+        categorias = a[c].cat.categories.union(b[c].cat.categories)
+        a[c] = a[c].cat.set_categories(categorias)
+        b[c] = b[c].cat.set_categories(categorias)
+    return pd.concat([a, b], ignore_index=True)
+
+
+class Ledger:
+    def __init__(self, backend):
+        self.backend = backend
+        self._trava = threading.RLock()
+        self._recarregar()
+
+    def _recarregar(self):
+        # Lida antes dos dados: uma escrita externa durante a carga deixa a
+        # versão desatualizada e o ledger é recarregado no próximo acesso
+        self.versao = self.versao_no_disco()
+        periodos = self.backend.periodos()
+        hoje = date.today()
+        self.regras = recorrencias.Regras(self.backend.caminho_regras, max([(hoje.year, hoje.month), *periodos]))
+        self._meses = {}
+        self._bytes = {}
+        self._periodo_do_id = {}
+        self.agregados = IndiceAgregado()
+        self.faturas = IndiceFaturas(*ler_configuracao(self.backend.caminho_cartao))
+        self._indexar(periodos)
+        self.saldos = SaldoCorrente(self.agregados, self.faturas)
+        self._tendencias = {}
+        self._busca = None
+
+    def versao_no_disco(self):
+        return self.backend.versao(), assinatura(self.backend.caminho_regras), assinatura(self.backend.caminho_cartao)
+
+    def _indexar(self, periodos=None):
+        # Períodos, índice agregado e faturas a partir do backend + ocorrências das regras
+        periodos = self.backend.periodos() if periodos is None else periodos
+        self.periodos = set(periodos) | self.regras.periodos()
+        self.agregados.indexar_agregados(somar_agregados(self.backend.agregados_mensais(), self.regras.agregados_mensais()))
+        self.faturas.indexar(self.backend.cartao_por_dia(), self.regras.cartao_por_dia())
+
+    def _esquecer_mes(self, chave):
+        df = self._meses.pop(chave, None)
+        self._bytes.pop(chave, None)
+        if df is not None:
+            for i in df["Id"]:
+                self._periodo_do_id.pop(i, None)
+
+    def _descartar_meses(self, periodos):
+        if not periodos:
+            return
+        for chave in periodos:
+            self._esquecer_mes(chave)
+        self._indexar()
+        # Não se sabe quais Ids mudaram: o índice de busca é refeito se for usado
+        self._busca = None
+
+    def _gravado_fora(self, antes, *componentes):
+        # ``antes`` é a versão lida logo antes de uma escrita nossa; se ela já
+        # não era a conhecida nos ``componentes`` (0 backend, 1 regras,
+        # 2 cartão), outro processo gravou e o ledger é recarregado inteiro
+        if any(antes[i] != self.versao[i] for i in componentes):
+            perfil.contar("ledger_recarregado_apos_escrita")
+            self._recarregar()
+            return True
+        self.versao = self.versao_no_disco()
+        return False
+
+    def _gravar(self, operacao, *args):
+        # Retorna True quando os índices foram refeitos a partir do disco:
+        # eles já incluem esta escrita e não devem receber a alteração de novo
+        antes = self.versao_no_disco()
+        try:
+            alterados = operacao(*args)
+        except ConflitoDeEscrita:
+            # O backend já releu o disco; o que está em memória não vale mais
+            self._recarregar()
+            raise
+        # O CSV informa o que mesclou de outros processos (``alterados``);
+        # SQLite e Parquet não, então qualquer mudança anterior recarrega tudo
+        if self._gravado_fora(antes, *((1, 2) if alterados is not None else (0, 1, 2))):
+            return True
+        self._descartar_meses(alterados or ())
+        return bool(alterados)
+
+    def memoria(self):
+        # Bytes aproximados: meses tipados + registros crus mantidos pelo backend
+        # (com a trava: ``aplicar_limite`` chama de outra sessão enquanto esta
+        # pode estar carregando um mês)
+        estimar_backend = getattr(self.backend, "memoria", None)
+        with self._trava:
+            busca = self._busca.memoria() if self._busca is not None else 0
+            return sum(self._bytes.values()) + busca + (estimar_backend() if estimar_backend else 0)
+
+    def _guardar_mes(self, chave, df):
+        self._meses[chave] = df
+        self._bytes[chave] = int(df.memory_usage(deep=True).sum())
+
+    def anos(self):
+        return sorted({a for a, _ in self.periodos}, reverse=True)
+
+    def meses(self):
+        return sorted({m for _, m in self.periodos})
+
+    def mes(self, ano, mes):
+        chave = (int(ano), int(mes))
+        with self._trava:
+            if chave not in self._meses:
+                registros = self.backend.carregar(*chave) + self.regras.ocorrencias(*chave)
+                df = tipar(pd.DataFrame(registros, columns=COLUNAS))
+                perfil.contar("linhas_carregadas", len(df))
+                self._guardar_mes(chave, df)
+                self._periodo_do_id.update(dict.fromkeys(df["Id"], chave))
+                self.agregados.indexar_mes(*chave, df)
+            return self._meses[chave]
+
+    def totais(self, ano, mes):
+        # ``saldo`` é o resultado do mês (já descontada a fatura do cartão que
+        # vence nele); ``saldo_inicial``/``saldo_final`` são os do saldo corrente
+        with self._trava:
+            totais = self.agregados.totais(ano, mes)
+            fatura = self.faturas.centavos(ano, mes)
+            totais["fatura_cartao"] = fatura / 100
+            totais["saldo"] = (round(totais["saldo"] * 100) - fatura) / 100
+            totais["saldo_inicial"] = self.saldos.inicial(ano, mes)
+            totais["saldo_final"] = self.saldos.final(ano, mes)
+            return totais
+
+    def por_categoria(self, ano, mes, tipo):
+        with self._trava:
+            return self.agregados.por_categoria(ano, mes, tipo)
+
+    def saldo_inicial(self, ano, mes):
+        with self._trava:
+            return self.saldos.inicial(ano, mes)
+
+    def saldo_final(self, ano, mes):
+        with self._trava:
+            return self.saldos.final(ano, mes)
+
+    def saldo_informado(self, ano, mes):
+        with self._trava:
+            return self.saldos.informado(ano, mes)
+
+    def tendencias(self, tipo):
+        with self._trava:
+            chave = (tipo, self.agregados.revisao)
+            if chave not in self._tendencias:
+                perfil.contar("tendencias_calculadas")
+                self._tendencias = {c: v for c, v in self._tendencias.items() if c[1] == chave[1]}
+                self._tendencias[chave] = tendencias.calcular(self.agregados, tipo)
+            return self._tendencias[chave]
+
+    def buscar(self, consulta, pagina=1, tamanho=TAMANHO_PAGINA):
+        with self._trava:
+            if self._busca is None:
+                perfil.contar("indice_busca_montado")
+                self._busca = IndiceBusca()
+                carregar_dataframe = getattr(self.backend, "carregar_dataframe", None)
+                if carregar_dataframe is not None:
+                    self._busca.adicionar_dataframe(carregar_dataframe())
+                else:
+                    self._busca.adicionar(*self.backend.carregar())
+                self._busca.adicionar(*self.regras.todas_ocorrencias())
+            return self._busca.buscar(consulta, pagina, tamanho)
+
+    # -----------------------------
+    # Cartão de crédito
+    # -----------------------------
+    def configuracao_cartao(self):
+        return self.faturas.fechamento, self.faturas.vencimento
+
+    def configurar_cartao(self, fechamento, vencimento):
+        # Outro ciclo muda o vencimento de todas as compras: refaz o índice
+        with self._trava:
+            antes = self.versao_no_disco()
+            gravar_configuracao(self.backend.caminho_cartao, fechamento, vencimento)
+            if self._gravado_fora(antes, 0, 1, 2):
+                return
+            self.faturas.fechamento, self.faturas.vencimento = int(fechamento), int(vencimento)
+            self.faturas.indexar(self.backend.cartao_por_dia(), self.regras.cartao_por_dia())
+
+    def faturas_do_cartao(self):
+        with self._trava:
+            return self.faturas.tabela()
+
+    def ciclo_do_cartao(self, ano, mes):
+        return self.faturas.ciclo(ano, mes)
+
+    def _descontar(self, registros):
+        # Tira dos índices e dos meses carregados as versões antigas de
+        # registros que vão ser regravados com o mesmo Id
+        ids = {r["Id"] for r in registros}
+        por_periodo = {}
+        for r in registros:
+            por_periodo.setdefault(periodo_da_data(r["Data"]), []).append(r)
+        for chave, antigos in por_periodo.items():
+            if chave == (0, 0):
+                continue
+            df_antigos = tipar(pd.DataFrame(antigos, columns=COLUNAS))
+            self.agregados.remover(*chave, df_antigos)
+            self.faturas.remover(df_antigos)
+            if chave in self._meses:
+                df = self._meses[chave]
+                self._guardar_mes(chave, df[~df["Id"].isin(ids)].reset_index(drop=True))
+            if not self.agregados.celulas(*chave):
+                self.periodos.discard(chave)
+        for i in ids:
+            self._periodo_do_id.pop(i, None)
+
+    def inserir(self, *registros):
+        # Um Id que já existe é atualizado: a versão antiga sai dos totais
+        if not registros:
+            return
+        with self._trava:
+            antigos = self.backend.existentes(*(r["Id"] for r in registros))
+            if self._gravar(self.backend.inserir, *registros):
+                for chave in {periodo_da_data(r["Data"]) for r in (*registros, *antigos)}:
+                    self._esquecer_mes(chave)
+                return
+            self._descontar(antigos)
+            if self._busca is not None:
+                self._busca.adicionar(*registros)
+            por_periodo = {}
+            for r in registros:
+                por_periodo.setdefault(periodo_da_data(r["Data"]), []).append(r)
+            for chave, novos in por_periodo.items():
+                if chave == (0, 0):
+                    continue
+                self.periodos.add(chave)
+                df_novos = tipar(pd.DataFrame(novos, columns=COLUNAS))
+                self.agregados.adicionar(*chave, df_novos)
+                self.faturas.adicionar(df_novos)
+                if chave in self._meses:
+                    self._guardar_mes(chave, concatenar(self._meses[chave], df_novos))
+                    self._periodo_do_id.update(dict.fromkeys(df_novos["Id"], chave))
+
+    def excluir(self, *ids):
+        ocorrencias = [i for i in ids if recorrencias.eh_ocorrencia(i)]
+        ids = tuple(i for i in ids if not recorrencias.eh_ocorrencia(i))
+        with self._trava:
+            if ocorrencias:
+                self.pular_ocorrencias(*ocorrencias)
+            if not ids:
+                return
+            if self._gravar(self.backend.excluir, *ids):
+                for chave in {self._periodo_do_id[i] for i in ids if i in self._periodo_do_id}:
+                    self._esquecer_mes(chave)
+                return
+            if self._busca is not None:
+                self._busca.remover(*ids)
+            # Sem o mês carregado não dá para descontar os valores: reagrega tudo
+            reagregar = any(i not in self._periodo_do_id for i in ids)
+            afetados = {self._periodo_do_id.pop(i) for i in ids if i in self._periodo_do_id}
+            for chave in afetados:
+                df = self._meses[chave]
+                removidos = df["Id"].isin(ids)
+                if not reagregar:
+                    self.agregados.remover(*chave, df[removidos])
+                    self.faturas.remover(df[removidos])
+                df = df[~removidos].reset_index(drop=True)
+                self._guardar_mes(chave, df)
+                if df.empty:
+                    self.periodos.discard(chave)
+            if reagregar:
+                self._indexar()
+
+    # -----------------------------
+    # Recorrentes e parcelados
+    # -----------------------------
+    def _alterar_regra(self, id_regra, alterar):
+        antes = self.versao_no_disco()
+        antiga, nova, externo = self.regras.alterar(id_regra, alterar)
+        if externo:
+            # Outro processo também mexeu nas regras: refaz tudo que vem delas
+            self._recarregar()
+            return
+        if self._gravado_fora(antes, 0, 2):
+            return
+        antes = recorrencias.ocorrencias_da_regra(antiga, self.regras.horizonte)
+        depois = recorrencias.ocorrencias_da_regra(nova, self.regras.horizonte)
+        for chave in set(antes) | set(depois):
+            if antes.get(chave) == depois.get(chave):
+                continue
+            if chave in antes:
+                self.agregados.remover(*chave, pd.DataFrame([antes[chave]], columns=COLUNAS))
+                self.faturas.remover(pd.DataFrame([antes[chave]], columns=COLUNAS))
+            if chave in depois:
+                self.agregados.adicionar(*chave, pd.DataFrame([depois[chave]], columns=COLUNAS))
+                self.faturas.adicionar(pd.DataFrame([depois[chave]], columns=COLUNAS))
+            self._esquecer_mes(chave)
+            if self._busca is not None:
+                if chave in antes:
+                    self._busca.remover(antes[chave]["Id"])
+                if chave in depois:
+                    self._busca.adicionar(depois[chave])
+        self.periodos = set(self.backend.periodos()) | self.regras.periodos()
+
+    def regras_ativas(self):
+        with self._trava:
+            return list(self.regras.regras.values())
+
+    def salvar_regra(self, regra):
+        with self._trava:
+            self._alterar_regra(regra["Id"], lambda _: regra)
+
+    def remover_regra(self, id_regra):
+        with self._trava:
+            self._alterar_regra(id_regra, lambda _: None)
+
+    def _alterar_excecao(self, id_ocorrencia, excecao):
+        id_regra, (ano, mes) = recorrencias.origem(id_ocorrencia)
+
+        def alterar(regra):
+            if regra is None:
+                return None
+            excecoes = regra.setdefault("Excecoes", {})
+            chave = f"{ano:04d}-{mes:02d}"
+            excecoes[chave] = None if excecao is None else {**(excecoes.get(chave) or {}), **excecao}
+            return regra
+        self._alterar_regra(id_regra, alterar)
+
+    def pular_ocorrencias(self, *ids):
+        with self._trava:
+            for id_ in ids:
+                self._alterar_excecao(id_, None)
+
+    def alterar_ocorrencia(self, id_ocorrencia, **campos):
+        # Só esta ocorrência muda (ex.: valor da conta de luz do mês)
+        with self._trava:
+            self._alterar_excecao(id_ocorrencia, campos)
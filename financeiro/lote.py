@@ -0,0 +1,81 @@
+"""Geração em lote de relatórios para todos os usuários, sem Streamlit.
+
+Percorre os usuários do backend configurado (``CF_BACKEND``: os
+``gastos_<md5>.csv``, ``.sqlite`` ou ``.parquet`` de ``BASE_DIR``) e grava em
+``<saida>/<md5>/`` os PDFs (mensais e/ou anual) e um CSV de resumo por mês.
+Cada usuário é processado num processo separado do pool.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from . import relatorios
+from .backends import BACKEND_PADRAO, abrir_backend_do_usuario, usuarios
+from .ledger import Ledger
+
+
+def _gravar_pdf(buffer, caminho):
+    with open(caminho, "wb") as f:
+        f.write(buffer.getvalue())
+
+
+def processar_usuario(base_dir, usuario, ano, mes=None, saida="relatorios", anual=True, tipo=BACKEND_PADRAO):
+    # Retorna (usuario, quantidade de PDFs gerados)
+    destino = os.path.join(saida, usuario)
+    os.makedirs(destino, exist_ok=True)
+
+    ledger = Ledger(abrir_backend_do_usuario(usuario, tipo, base_dir))
+    meses = [mes] if mes else sorted(m for a, m in ledger.periodos if a == int(ano))
+    gerados = 0
+
+    resumo = []
+    for m in meses:
+        df, totais = relatorios.dados_do_periodo(ledger, "mes", ano, m)
+        resumo.append({
+            "Ano": int(ano),
+            "Mês": int(m),
+            "Receitas": round(totais["receitas"], 2),
+            "Despesas (sem cartão)": round(totais["despesas_sem_cartao"], 2),
+            "Gastos no Cartão": round(totais["despesas_cartao"], 2),
+            "Fatura do Cartão": round(totais["fatura_cartao"], 2),
+            "Saldo Inicial": round(totais["saldo_inicial"], 2),
+            "Saldo Final": round(totais["saldo_final"], 2),
+            "Transações": len(df),
+        })
+        if df.empty:
+            continue
+        _gravar_pdf(relatorios.gerar_pdf(df, int(ano), int(m), totais),
+                    os.path.join(destino, f"relatorio_financeiro_{ano}_{int(m):02d}.pdf"))
+        gerados += 1
+
+    if anual and not mes and meses:
+        df, totais = relatorios.dados_do_periodo(ledger, "ano", ano, 0)
+        _gravar_pdf(relatorios.gerar_relatorio(df, relatorios.descrever_periodo("ano", ano, 0), totais, True, True),
+                    os.path.join(destino, f"relatorio_financeiro_{ano}_anual.pdf"))
+        gerados += 1
+
+    if resumo:
+        sufixo = f"{ano}_{int(mes):02d}" if mes else f"{ano}"
+        pd.DataFrame(resumo).to_csv(os.path.join(destino, f"resumo_{sufixo}.csv"), sep=";", index=False)
+    return usuario, gerados
+
+
+def gerar_lote(base_dir, ano, mes=None, saida="relatorios", processos=None, anual=True, progresso=print, tipo=BACKEND_PADRAO):
+    # Retorna {"usuarios", "pdfs", "erros": [(usuario, mensagem)]}
+    todos = usuarios(tipo, base_dir)
+    resultado = {"usuarios": 0, "pdfs": 0, "erros": []}
+    with ProcessPoolExecutor(max_workers=processos) as pool:
+        futuros = {pool.submit(processar_usuario, base_dir, u, ano, mes, saida, anual, tipo): u for u in todos}
+        for futuro in as_completed(futuros):
+            usuario = futuros[futuro]
+            try:
+                _, gerados = futuro.result()
+                resultado["usuarios"] += 1
+                resultado["pdfs"] += gerados
+            except Exception as e:
+                resultado["erros"].append((usuario, str(e)))
+                progresso(f"Erro no usuário {usuario}: {e}")
+                continue
+            progresso(f"[{resultado['usuarios'] + len(resultado['erros'])}/{len(todos)}] {usuario}: {gerados} PDF(s)")
+    return resultado
@@ -0,0 +1,128 @@
+"""Medição por rerun: tempo de cada fase do script, linhas processadas e bytes
+lidos/gravados no armazenamento.
+
+O perfil do rerun atual fica numa variável por thread (o Streamlit executa
+cada sessão na sua própria thread), então o armazenamento pode chamar
+``contar`` sem receber o perfil como parâmetro. Ao final, o registro vira uma
+linha JSON no arquivo de log, de onde saem os percentis p50/p95 por usuário.
+
+O log é rotacionado ao passar de ``TAMANHO_MAXIMO_LOG`` (o anterior fica em
+``<log>.1``) e os percentis leem só o final do arquivo.
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+# Quantas linhas do final do log entram no cálculo dos percentis
+JANELA_PERCENTIS = 2000
+# Bytes lidos do final do log para os percentis (linhas têm poucas centenas de bytes)
+BYTES_PERCENTIS = JANELA_PERCENTIS * 1024
+TAMANHO_MAXIMO_LOG = 5 * 1024 * 1024
+
+_atual = threading.local()
+_log_lock = threading.Lock()
+
+
+class PerfilRerun:
+    # O script do Streamlit é linear: marcar("fase") encerra a fase anterior e
+    # começa a próxima, sem precisar reindentar os blocos em ``with``.
+
+    def __init__(self, usuario=None):
+        self.usuario = usuario
+        self.inicio = time.perf_counter()
+        self.fases = {}
+        self.contadores = {}
+        self._fase = None
+        self._inicio_fase = self.inicio
+        _atual.perfil = self
+
+    def marcar(self, nome):
+        agora = time.perf_counter()
+        if self._fase is not None:
+            self.fases[self._fase] = self.fases.get(self._fase, 0.0) + (agora - self._inicio_fase) * 1000
+        self._fase = nome
+        self._inicio_fase = agora
+
+    def contar(self, nome, n=1):
+        self.contadores[nome] = self.contadores.get(nome, 0) + n
+
+    def finalizar(self):
+        self.marcar(None)
+        if getattr(_atual, "perfil", None) is self:
+            _atual.perfil = None
+        return {
+            "ts": datetime.now().isoformat(timespec="seconds"),
+            "usuario": self.usuario,
+            "total_ms": round((time.perf_counter() - self.inicio) * 1000, 2),
+            "fases_ms": {k: round(v, 2) for k, v in self.fases.items()},
+            "contadores": dict(self.contadores),
+        }
+
+
+def contar(nome, n=1):
+    # Soma no perfil do rerun em andamento; sem perfil ativo não faz nada
+    perfil = getattr(_atual, "perfil", None)
+    if perfil is not None:
+        perfil.contar(nome, n)
+
+
+def contar_arquivo(nome, caminho):
+    try:
+        contar(nome, os.path.getsize(caminho))
+    except OSError:
+        pass
+
+
+# -----------------------------
+# Log e percentis
+# -----------------------------
+def registrar(registro, caminho):
+    linha = json.dumps(registro, ensure_ascii=False) + "\n"
+    with _log_lock:
+        try:
+            if os.path.getsize(caminho) >= TAMANHO_MAXIMO_LOG:
+                os.replace(caminho, caminho + ".1")
+        except OSError:
+            pass
+        with open(caminho, "a", encoding="utf-8") as f:
+            f.write(linha)
+
+
+def _ultimas_linhas(caminho):
+    # Só o final do arquivo; a primeira linha lida pode estar pela metade
+    with open(caminho, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        tamanho = f.tell()
+        f.seek(max(0, tamanho - BYTES_PERCENTIS))
+        dados = f.read()
+    linhas = dados.decode("utf-8", errors="replace").splitlines()
+    if tamanho > BYTES_PERCENTIS:
+        linhas = linhas[1:]
+    return linhas[-JANELA_PERCENTIS:]
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    k = (len(ordenados) - 1) * p / 100
+    i = int(k)
+    j = min(i + 1, len(ordenados) - 1)
+    return ordenados[i] + (ordenados[j] - ordenados[i]) * (k - i)
+
+
+def percentis(caminho, usuario=None):
+    # {"n", "p50_ms", "p95_ms"} dos últimos reruns registrados (do usuário, se informado)
+    if not os.path.exists(caminho):
+        return {"n": 0, "p50_ms": None, "p95_ms": None}
+    totais = []
+    for linha in _ultimas_linhas(caminho):
+        try:
+            registro = json.loads(linha)
+        except ValueError:
+            continue
+        if usuario is None or registro.get("usuario") == usuario:
+            totais.append(registro["total_ms"])
+    return {"n": len(totais), "p50_ms": _percentil(totais, 50), "p95_ms": _percentil(totais, 95)}
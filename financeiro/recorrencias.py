@@ -0,0 +1,217 @@
+"""Lançamentos recorrentes (contas mensais) e parcelados, guardados como regras.
+
+Uma regra é gravada uma única vez em ``gastos_<md5>.regras.json``, ao lado dos
+dados do usuário, e as ocorrências de cada mês são geradas só quando o mês é
+exibido ou entra num relatório; o arquivo de transações e o tempo de abertura
+não crescem a cada conta repetida. Para o índice agregado (resumo, saldo e
+tendências) basta somar o valor da regra em cada mês em que ela ocorre.
+
+Formato de uma regra::
+
+    {"Id", "Tipo", "Descrição", "Valor", "Forma de pagamento", "Categoria",
+     "Inicio": "2025-03-10",      # primeira ocorrência (dia usado em todas)
+     "Parcelas": 10 | null,       # null: recorrente sem fim definido
+     "Fim": "2026-02" | null,     # último mês de uma recorrente (opcional)
+     "Excecoes": {"2025-07": null | {"Valor": 99.9, ...}}}
+
+Uma exceção ``null`` pula a ocorrência do mês; um dict substitui campos só
+daquela ocorrência. Recorrentes sem fim vão até o ``horizonte`` informado pelo
+ledger (o mês atual ou o último mês com lançamentos).
+
+Cada ocorrência tem Id ``rec:<Id da regra>:<AAAA-MM>``, então excluir a
+ocorrência na tabela do mês vira uma exceção na regra.
+"""
+import calendar
+import json
+import os
+import shutil
+import uuid
+from datetime import date
+
+import pandas as pd
+
+from . import armazenamento
+from .agregados import COLUNAS_AGREGADAS, agregar_mensal
+from .esquema import COLUNAS
+from .faturas import COLUNAS_CARTAO, agregar_cartao
+
+PREFIXO = "rec:"
+CAMPOS_SUBSTITUIVEIS = ["Descrição", "Valor", "Forma de pagamento", "Categoria"]
+
+
+def _chave_mes(ano, mes):
+    return f"{int(ano):04d}-{int(mes):02d}"
+
+
+def _periodo(texto):
+    return int(texto[:4]), int(texto[5:7])
+
+
+def _somar_meses(ano, mes, n):
+    indice = int(ano) * 12 + int(mes) - 1 + n
+    return indice // 12, indice % 12 + 1
+
+
+def nova_regra(tipo, descricao, valor, forma, categoria, inicio, parcelas=None, fim=None):
+    # Parcelado: ``valor`` é o total da compra, dividido em centavos entre as
+    # parcelas; a diferença do arredondamento fica na primeira
+    regra = {
+        "Id": str(uuid.uuid4()),
+        "Tipo": tipo,
+        "Descrição": descricao,
+        "Valor": float(valor),
+        "Forma de pagamento": forma,
+        "Categoria": categoria,
+        "Inicio": inicio,
+        "Parcelas": int(parcelas) if parcelas else None,
+        "Fim": fim,
+        "Excecoes": {},
+    }
+    if regra["Parcelas"]:
+        centavos = int(round(float(valor) * 100))
+        parcela, resto = divmod(centavos, regra["Parcelas"])
+        regra["Valor"] = parcela / 100
+        if resto:
+            regra["Excecoes"][inicio[:7]] = {"Valor": (parcela + resto) / 100}
+    return regra
+
+
+def eh_ocorrencia(id_):
+    return isinstance(id_, str) and id_.startswith(PREFIXO)
+
+
+def origem(id_):
+    # "rec:<regra>:2025-03" -> ("<regra>", (2025, 3))
+    id_regra, mes = id_[len(PREFIXO):].rsplit(":", 1)
+    return id_regra, _periodo(mes)
+
+
+def meses_da_regra(regra, horizonte):
+    # Todos os (ano, mes) em que a regra ocorre, incluindo os pulados
+    inicio = _periodo(regra["Inicio"])
+    if regra.get("Parcelas"):
+        n = int(regra["Parcelas"])
+    else:
+        fim = _periodo(regra["Fim"]) if regra.get("Fim") else tuple(horizonte)
+        n = (fim[0] * 12 + fim[1]) - (inicio[0] * 12 + inicio[1]) + 1
+    return [_somar_meses(*inicio, k) for k in range(max(n, 0))]
+
+
+def ocorrencia(regra, ano, mes, numero=None):
+    # Registro no formato de COLUNAS, ou None se a ocorrência foi pulada
+    chave = _chave_mes(ano, mes)
+    excecoes = regra.get("Excecoes") or {}
+    if chave in excecoes and excecoes[chave] is None:
+        return None
+    dia = min(int(regra["Inicio"][8:10]), calendar.monthrange(int(ano), int(mes))[1])
+    descricao = regra["Descrição"]
+    if regra.get("Parcelas") and numero is not None:
+        descricao = f"{descricao} ({numero}/{regra['Parcelas']})"
+    registro = {
+        "Id": f"{PREFIXO}{regra['Id']}:{chave}",
+        "Data": date(int(ano), int(mes), dia).isoformat(),
+        "Tipo": regra["Tipo"],
+        "Descrição": descricao,
+        "Valor": float(regra["Valor"]),
+        "Forma de pagamento": regra["Forma de pagamento"],
+        "Categoria": regra["Categoria"],
+    }
+    for campo, valor in (excecoes.get(chave) or {}).items():
+        if campo in CAMPOS_SUBSTITUIVEIS:
+            registro[campo] = float(valor) if campo == "Valor" else valor
+    return registro
+
+
+def ocorrencias_da_regra(regra, horizonte):
+    # {(ano, mes): registro} das ocorrências não puladas
+    if regra is None:
+        return {}
+    ocorrencias = {}
+    for numero, (ano, mes) in enumerate(meses_da_regra(regra, horizonte), start=1):
+        registro = ocorrencia(regra, ano, mes, numero)
+        if registro is not None:
+            ocorrencias[(ano, mes)] = registro
+    return ocorrencias
+
+
+class Regras:
+    def __init__(self, caminho, horizonte):
+        self.caminho = caminho
+        self.horizonte = tuple(horizonte)
+        self.regras = {}
+        self._assinatura = None
+        self.ilegivel = False
+        self._ler()
+
+    def _ler(self):
+        # Um arquivo truncado ou em conflito de sincronização abre como sem
+        # regras (o app continua abrindo) e só é substituído na próxima
+        # alteração, depois de guardado em ``<arquivo>.ilegivel``
+        self._assinatura = armazenamento.assinatura(self.caminho)
+        self.ilegivel = False
+        try:
+            with open(self.caminho, encoding="utf-8") as f:
+                regras = json.load(f).get("regras", [])
+            self.regras = {r["Id"]: r for r in regras}
+        except FileNotFoundError:
+            self.regras = {}
+        except (ValueError, AttributeError, KeyError, TypeError) as e:
+            print("Erro ao ler as regras de recorrentes:", e)
+            self.ilegivel = True
+            self.regras = {}
+
+    def _gravar(self):
+        if self.ilegivel:
+            shutil.copyfile(self.caminho, self.caminho + ".ilegivel")
+            self.ilegivel = False
+        temporario = self.caminho + ".tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump({"regras": list(self.regras.values())}, f, ensure_ascii=False, indent=1)
+        os.replace(temporario, self.caminho)
+        self._assinatura = armazenamento.assinatura(self.caminho)
+
+    def alterar(self, id_regra, alterar):
+        # Lê o arquivo de novo com a trava, aplica ``alterar(regra) -> regra
+        # nova ou None`` e grava. Retorna (antiga, nova, externo), em que
+        # ``externo`` indica que outro processo tinha alterado as regras
+        with armazenamento.travar(self.caminho):
+            externo = armazenamento.assinatura(self.caminho) != self._assinatura
+            if externo:
+                self._ler()
+            antiga = self.regras.get(id_regra)
+            nova = alterar(json.loads(json.dumps(antiga)) if antiga is not None else None)
+            if nova is None:
+                self.regras.pop(id_regra, None)
+            else:
+                self.regras[id_regra] = nova
+            self._gravar()
+        return antiga, nova, externo
+
+    def ocorrencias(self, ano, mes):
+        # Só as regras que passam pelo mês são expandidas
+        registros = []
+        for regra in self.regras.values():
+            meses = meses_da_regra(regra, self.horizonte)
+            if (int(ano), int(mes)) in meses:
+                registro = ocorrencia(regra, ano, mes, meses.index((int(ano), int(mes))) + 1)
+                if registro is not None:
+                    registros.append(registro)
+        return registros
+
+    def todas_ocorrencias(self):
+        return [r for regra in self.regras.values() for r in ocorrencias_da_regra(regra, self.horizonte).values()]
+
+    def periodos(self):
+        return {p for regra in self.regras.values() for p in ocorrencias_da_regra(regra, self.horizonte)}
+
+    def agregados_mensais(self):
+        registros = self.todas_ocorrencias()
+        if not registros:
+            return pd.DataFrame(columns=COLUNAS_AGREGADAS)
+        return agregar_mensal(pd.DataFrame(registros, columns=COLUNAS))
+
+    def cartao_por_dia(self):
+        registros = self.todas_ocorrencias()
+        if not registros:
+            return pd.DataFrame(columns=COLUNAS_CARTAO)
+        return agregar_cartao(pd.DataFrame(registros, columns=COLUNAS))
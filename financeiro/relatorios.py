@@ -0,0 +1,514 @@
+"""Relatórios em PDF (mês, trimestre ou ano), gerados sob demanda.
+
+O ReportLab só é importado dentro das funções que desenham o PDF, para não
+pesar na abertura do app.
+
+O PDF só é montado quando o usuário pede, numa thread de trabalho, e os bytes
+ficam em cache pelo usuário, período e versão dos arquivos do ledger: montar a
+chave não lê nenhuma transação, e as linhas do período só são carregadas na
+thread que gera o PDF. O logo é
+decodificado uma única vez por processo e o cabeçalho da tabela é um único
+Form XObject reaproveitado em todas as páginas.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+
+import pandas as pd
+
+from . import graficos
+from .esquema import COLUNAS, para_centavos
+from .ledger import concatenar, tipar
+from .saldos import CELULA_SALDO, linhas_de_saldo
+
+# Quantos PDFs prontos ficam guardados em memória
+LIMITE_CACHE = 32
+
+FORM_CABECALHO = "cabecalho_tabela"
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="pdf")
+_cache = OrderedDict()
+_pendentes = {}
+_cache_lock = threading.Lock()
+
+
+# -----------------------------
+# Logo e cabeçalhos
+# -----------------------------
+@lru_cache(maxsize=1)
+def _logo():
+    # (ImageReader, largura, altura) já na escala do PDF, ou None sem logo.
+    # A imagem é reduzida uma vez para ~3x a largura impressa: embutir o PNG
+    # original custava segundos de codificação em cada PDF.
+    from PIL import Image
+    from reportlab.lib.utils import ImageReader
+
+    possible = [
+        "logo.png",
+        os.path.join(os.getcwd(), "logo.png"),
+        os.path.expanduser("~/OneDrive/logo.png"),
+    ]
+    for p in possible:
+        if os.path.exists(p):
+            try:
+                target_w = 90
+                with Image.open(p) as original:
+                    iw, ih = original.size
+                    reduzida = original.copy()
+                reduzida.thumbnail((target_w * 3, target_w * 3 * ih / iw))
+                return ImageReader(reduzida), target_w, (ih / iw) * target_w
+            except Exception as e:
+                print("Erro ao inserir logo no PDF:", e)
+                return None
+    return None
+
+
+def _definir_cabecalho_tabela(c, width):
+    # Desenhado uma vez como Form XObject e reaproveitado em toda página
+    c.beginForm(FORM_CABECALHO)
+    c.setFillColorRGB(0.40, 0.42, 0.95)
+    c.rect(40, 0, width - 80, 22, fill=1, stroke=0)
+
+    c.setFont("Helvetica-Bold", 10)
+    c.setFillColorRGB(1, 1, 1)
+    c.drawString(50, 6, "Data")
+    c.drawString(110, 6, "Tipo")
+    c.drawString(165, 6, "Descrição")
+    c.drawString(320, 6, "Categoria")
+    c.drawString(420, 6, "Forma")
+    c.drawString(500, 6, "Valor")
+    c.endForm()
+
+
+@lru_cache(maxsize=1)
+def _configurar_reportlab():
+    # Uma vez por processo, na primeira geração (o import do ReportLab é
+    # adiado). Os streams já saem comprimidos; a codificação ASCII85 só aumenta
+    # o arquivo e, sem a extensão C do ReportLab, dominava o tempo de
+    # relatórios grandes
+    from reportlab import rl_config
+
+    rl_config.useA85 = 0
+
+
+def _desenhar_cabecalho_tabela(c, y):
+    c.saveState()
+    c.translate(0, y)
+    c.doForm(FORM_CABECALHO)
+    c.restoreState()
+
+
+def _desenhar_topo(c, width, height, periodo):
+    # ==========================
+    # DESENHAR LOGO NO PDF
+    # ==========================
+    logo = _logo()
+    if logo:
+        img, target_w, target_h = logo
+        x = (width - target_w) / 2
+        y = height - (target_h + 20)
+        c.drawImage(img, x, y, width=target_w, height=target_h, mask='auto')
+        title_y = y - 25
+    else:
+        title_y = height - 70
+
+    # ==========================
+    # TÍTULO
+    # ==========================
+    c.setFont("Helvetica-Bold", 20)
+    c.setFillColorRGB(0.30, 0.40, 0.95)
+    c.drawCentredString(width/2, title_y, "Relatório Financeiro")
+
+    c.setFont("Helvetica", 12)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawCentredString(width/2, title_y - 20, f"Período: {periodo}")
+
+    c.setFont("Helvetica", 9)
+    c.setFillColorRGB(0.3, 0.3, 0.3)
+    c.drawCentredString(
+        width/2,
+        title_y - 35,
+        f"Gerado em: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}"
+    )
+    return title_y
+
+
+def _desenhar_resumo(c, width, resumo_y, totais):
+    # Box do resumo
+    c.setFillColorRGB(0.95, 0.95, 0.95)
+    c.roundRect(70, resumo_y - 129, width - 140, 139, 8, fill=1, stroke=1)
+
+    c.setFont("Helvetica-Bold", 14)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawCentredString(width/2, resumo_y - 15, "Resumo Financeiro:")
+
+    # Total de Receitas (verde)
+    c.setFont("Helvetica", 12)
+    c.setFillColorRGB(0, 0.6, 0)
+    c.drawString(90, resumo_y - 35, f"Total de Receitas: R$ {totais['receitas']:.2f}")
+
+    # Despesas sem cartão (vermelho)
+    c.setFillColorRGB(0.8, 0, 0)
+    c.drawString(90, resumo_y - 52, f"Total de Despesas (sem cartão): R$ {totais['despesas_sem_cartao']:.2f}")
+
+    # Fatura do cartão que vence no período (vermelho)
+    c.drawString(90, resumo_y - 69, f"Fatura do Cartão (vencimento no período): R$ {totais.get('fatura_cartao', 0):.2f}")
+
+    # Saldo corrente: inicial do primeiro mês e final do último (preto)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(90, resumo_y - 86, f"Saldo inicial: R$ {totais['saldo_inicial']:.2f}")
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(90, resumo_y - 103, f"Saldo final: R$ {totais['saldo_final']:.2f}")
+
+    # Gastos no cartão (laranja) - DENTRO DA CAIXA
+    c.setFont("Helvetica", 11)
+    c.setFillColorRGB(0.9, 0.5, 0)
+    c.drawString(90, resumo_y - 120, f"Gastos no Cartão (entram nas próximas faturas): R$ {totais['despesas_cartao']:.2f}")
+
+
+def _desenhar_subtotal(c, width, y, ano, mes, receitas, despesas):
+    c.setFillColorRGB(0.85, 0.87, 1.0)
+    c.rect(40, y - 2, width - 80, 20, fill=1, stroke=0)
+    c.setFont("Helvetica-Bold", 9)
+    c.setFillColorRGB(0, 0, 0)
+    c.drawString(50, y + 3, f"Subtotal {mes:02d}/{ano}")
+    c.setFillColorRGB(0, 0.55, 0)
+    c.drawString(220, y + 3, f"Receitas: R$ {receitas:.2f}")
+    c.setFillColorRGB(0.9, 0, 0)
+    c.drawRightString(530, y + 3, f"Despesas: R$ {despesas:.2f}")
+
+
+def _desenhar_resumo_categorias(c, width, height, df):
+    c.showPage()
+    y = height - 70
+    c.setFont("Helvetica-Bold", 16)
+    c.setFillColorRGB(0.30, 0.40, 0.95)
+    c.drawCentredString(width/2, y, "Resumo por Categoria")
+    y -= 40
+
+    df = df[~linhas_de_saldo(df)]
+    totais = df[["Tipo", "Categoria"]].assign(Centavos=para_centavos(df["Valor"])).groupby(
+        ["Tipo", "Categoria"], observed=True)["Centavos"].sum() / 100
+    for tipo in ["Receita", "Despesa"]:
+        if tipo not in totais.index.get_level_values(0):
+            continue
+        c.setFont("Helvetica-Bold", 12)
+        cor = (0, 0.55, 0) if tipo == "Receita" else (0.9, 0, 0)
+        c.setFillColorRGB(*cor)
+        c.drawString(60, y, "Receitas" if tipo == "Receita" else "Despesas")
+        y -= 20
+        c.setFont("Helvetica", 10)
+        c.setFillColorRGB(0, 0, 0)
+        for categoria, valor in totais.loc[tipo].sort_values(ascending=False).items():
+            if y < 60:
+                c.showPage()
+                y = height - 70
+                c.setFont("Helvetica", 10)
+                c.setFillColorRGB(0, 0, 0)
+            c.drawString(80, y, str(categoria)[:40])
+            c.drawRightString(530, y, f"R$ {valor:.2f}")
+            y -= 16
+        y -= 14
+
+    # Gráfico das despesas (PNG do cache de graficos)
+    if "Despesa" in totais.index.get_level_values(0):
+        try:
+            png = graficos.barras_png(totais.loc["Despesa"].sort_values(ascending=False), "Despesas por Categoria", "#ff6b6b")
+            from reportlab.lib.utils import ImageReader
+
+            img = ImageReader(BytesIO(png))
+            iw, ih = img.getSize()
+            target_w = width - 160
+            target_h = (ih / iw) * target_w
+            if y - target_h < 60:
+                c.showPage()
+                y = height - 70
+            c.drawImage(img, 80, y - target_h, width=target_w, height=target_h)
+        except Exception as e:
+            print("Erro ao inserir gráfico no PDF:", e)
+
+
+# -----------------------------
+# Motor de relatórios
+# -----------------------------
+def meses_do_periodo(tipo, numero):
+    # tipo: "mes" (numero = mês), "trimestre" (1-4) ou "ano" (numero ignorado)
+    if tipo == "mes":
+        return [int(numero)]
+    if tipo == "trimestre":
+        return list(range(3 * int(numero) - 2, 3 * int(numero) + 1))
+    if tipo == "ano":
+        return list(range(1, 13))
+    raise ValueError(f"Tipo de relatório desconhecido: {tipo}")
+
+
+def descrever_periodo(tipo, ano, numero):
+    if tipo == "mes":
+        return f"{int(numero):02d}/{ano}"
+    if tipo == "trimestre":
+        return f"{int(numero)}º trimestre/{ano}"
+    return str(ano)
+
+
+def somar_totais(lista):
+    # ``lista``: totais de cada mês do período, em ordem. Os fluxos são somados
+    # em centavos (sem acumular erro de ponto flutuante entre os meses); o
+    # saldo inicial é o do primeiro mês e o final, o do último
+    lista = list(lista)
+    soma = {"receitas": 0, "despesas_sem_cartao": 0, "despesas_cartao": 0, "fatura_cartao": 0, "saldo": 0}
+    for totais in lista:
+        for k in soma:
+            soma[k] += round(totais.get(k, 0) * 100)
+    resultado = {k: v / 100 for k, v in soma.items()}
+    resultado["saldo_inicial"] = lista[0].get("saldo_inicial", 0.0) if lista else 0.0
+    resultado["saldo_final"] = lista[-1].get("saldo_final", 0.0) if lista else 0.0
+    return resultado
+
+
+def gerar_relatorio(df, periodo, totais, subtotais_mensais=False, resumo_categorias=False):
+    # O ReportLab só é importado quando um PDF é de fato gerado
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase.pdfmetrics import stringWidth
+    from reportlab.pdfgen import canvas
+
+    _configurar_reportlab()
+
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+
+    title_y = _desenhar_topo(c, width, height, periodo)
+    resumo_y = title_y - 65
+    _desenhar_resumo(c, width, resumo_y, totais)
+
+    # ==========================
+    # TABELA
+    # ==========================
+    _definir_cabecalho_tabela(c, width)
+    y = resumo_y - 147
+    _desenhar_cabecalho_tabela(c, y)
+
+    y -= 26
+    row_height = 20
+
+    if subtotais_mensais:
+        df = df.sort_values("Data", kind="stable")
+
+    # Percorre arrays das colunas em vez de iterrows() (nenhuma Series por
+    # linha) e escreve o texto de cada página num único objeto de texto, em vez
+    # de um por drawString.
+    linhas = zip(
+        df["Data Formatada"].to_numpy(),
+        df["Tipo"].astype(str).to_numpy(),
+        df["Descrição"].astype(str).to_numpy(),
+        df["Categoria"].astype(str).to_numpy(),
+        df["Forma de pagamento"].astype(str).to_numpy(),
+        df["Valor"].to_numpy(dtype=float),
+        para_centavos(df["Valor"]).to_numpy(),
+        df["Ano"].to_numpy(),
+        df["Mês"].to_numpy(),
+    )
+
+    texto = c.beginText()
+    texto.setFont("Helvetica", 9)
+
+    def escrever(x, s):
+        texto.setTextOrigin(x, y)
+        texto.textOut(s)
+
+    def quebrar_pagina():
+        nonlocal texto, y
+        c.drawText(texto)
+        c.showPage()
+        y = height - 100
+        _desenhar_cabecalho_tabela(c, y)
+        y -= 26
+        texto = c.beginText()
+        texto.setFont("Helvetica", 9)
+
+    mes_atual = None
+    # Subtotais somados em centavos inteiros
+    receitas_mes = despesas_mes = 0
+
+    for i, (data_fmt, tipo, descricao, categoria, forma, valor, centavos, ano, mes) in enumerate(linhas):
+        if subtotais_mensais and mes_atual is not None and (ano, mes) != mes_atual:
+            if y < 60:
+                quebrar_pagina()
+            _desenhar_subtotal(c, width, y, *mes_atual, receitas_mes / 100, despesas_mes / 100)
+            y -= row_height + 6
+            receitas_mes = despesas_mes = 0
+        mes_atual = (ano, mes)
+
+        if y < 60:
+            quebrar_pagina()
+
+        if i % 2 == 0:
+            c.setFillColorRGB(0.95, 0.95, 0.95)
+            c.rect(40, y - 2, width - 80, row_height, fill=1, stroke=0)
+
+        texto.setFillColorRGB(0, 0, 0)
+        escrever(50, data_fmt)
+        escrever(110, tipo[:8])
+        escrever(165, descricao[:25])
+        escrever(320, categoria[:15])
+        escrever(420, forma[:12])
+
+        # Cor do valor baseado no tipo; o saldo informado não entra no subtotal
+        if tipo == "Receita":
+            texto.setFillColorRGB(0, 0.55, 0)
+            if (tipo, categoria, forma) != CELULA_SALDO:
+                receitas_mes += int(centavos)
+        else:
+            texto.setFillColorRGB(0.9, 0, 0)
+            despesas_mes += int(centavos)
+
+        valor_fmt = f"R$ {valor:.2f}"
+        escrever(530 - stringWidth(valor_fmt, "Helvetica", 9), valor_fmt)
+
+        y -= row_height
+
+    if subtotais_mensais and mes_atual is not None:
+        if y < 60:
+            quebrar_pagina()
+        _desenhar_subtotal(c, width, y, *mes_atual, receitas_mes / 100, despesas_mes / 100)
+
+    c.drawText(texto)
+
+    if resumo_categorias and not df.empty:
+        _desenhar_resumo_categorias(c, width, height, df)
+
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+
+def gerar_pdf(df, ano, mes, totais):
+    return gerar_relatorio(df, descrever_periodo("mes", ano, mes), totais)
+
+
+# -----------------------------
+# Cache e geração em segundo plano
+# -----------------------------
+def pdf_em_cache(chave):
+    with _cache_lock:
+        if chave in _cache:
+            _cache.move_to_end(chave)
+            return _cache[chave]
+    return None
+
+
+def _gerar_e_guardar(chave, funcao, args):
+    try:
+        dados = funcao(*args).getvalue()
+        with _cache_lock:
+            _cache[chave] = dados
+            _cache.move_to_end(chave)
+            while len(_cache) > LIMITE_CACHE:
+                _cache.popitem(last=False)
+        return dados
+    finally:
+        with _cache_lock:
+            _pendentes.pop(chave, None)
+
+
+def solicitar(chave, funcao, *args):
+    # Future com os bytes do PDF; pedidos repetidos da mesma chave reaproveitam
+    # o trabalho já em andamento.
+    with _cache_lock:
+        if chave in _pendentes:
+            return _pendentes[chave]
+        futuro = _executor.submit(_gerar_e_guardar, chave, funcao, args)
+        _pendentes[chave] = futuro
+        return futuro
+
+
+def dados_do_periodo(ledger, tipo, ano, numero):
+    # (df, totais) do período, com os meses vindos do ledger e os totais do
+    # índice agregado; os totais passam por todos os meses do período para o
+    # saldo inicial ser o do primeiro e o final, o do último
+    meses = [m for m in meses_do_periodo(tipo, numero) if (int(ano), m) in ledger.periodos]
+    frames = [ledger.mes(ano, m) for m in meses]
+    if not frames:
+        df = tipar(pd.DataFrame(columns=COLUNAS))
+    elif len(frames) == 1:
+        df = frames[0]
+    else:
+        df = frames[0]
+        for frame in frames[1:]:
+            df = concatenar(df, frame)
+    totais = somar_totais(ledger.totais(ano, m) for m in meses_do_periodo(tipo, numero))
+    return df, totais
+
+
+def chave_periodo(ledger, tipo, ano, numero):
+    # Usuário (as regras ficam em gastos_<md5>.regras.json em qualquer backend)
+    # + período + versão dos arquivos: qualquer escrita em transações, regras
+    # ou cartão muda a chave, inclusive a que altera o saldo transportado
+    opcoes = {
+        "usuario": os.path.abspath(ledger.backend.caminho_regras),
+        "versao": ledger.versao,
+        "tipo": tipo,
+        "ano": int(ano),
+        "numero": int(numero),
+    }
+    return hashlib.sha1(json.dumps(opcoes, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _gerar_do_ledger(ledger, tipo, ano, numero):
+    df, totais = dados_do_periodo(ledger, tipo, ano, numero)
+    multi = tipo != "mes"
+    return gerar_relatorio(df, descrever_periodo(tipo, ano, numero), totais, multi, multi)
+
+
+def solicitar_relatorio(ledger, tipo, ano, numero):
+    # As linhas do período são lidas na thread de trabalho, não no rerun
+    return solicitar(chave_periodo(ledger, tipo, ano, numero), _gerar_do_ledger, ledger, tipo, ano, numero)
+
+
+# -----------------------------
+# Medição
+# -----------------------------
+def medir_relatorio_anual(n_linhas=10000, ano=2025):
+    # Tempo (s) e pico de memória (MiB) para um relatório anual sintético
+    import time
+    import tracemalloc
+
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    datas = pd.Timestamp(ano, 1, 1) + pd.to_timedelta(np.sort(rng.integers(0, 365, n_linhas)), unit="D")
+    df = pd.DataFrame({
+        "Id": [str(i) for i in range(n_linhas)],
+        "Data": datas,
+        "Tipo": pd.Categorical(rng.choice(["Despesa", "Receita"], n_linhas, p=[0.9, 0.1])),
+        "Descrição": [f"Transação {i}" for i in range(n_linhas)],
+        "Valor": rng.uniform(1, 500, n_linhas).round(2),
+        "Forma de pagamento": pd.Categorical(rng.choice(["Cartão", "Pix", "Dinheiro"], n_linhas)),
+        "Categoria": pd.Categorical(rng.choice(["Alimentação", "Transporte", "Lazer", "Salário"], n_linhas)),
+    })
+    df["Data Formatada"] = df["Data"].dt.strftime("%d/%m/%Y")
+    df["Ano"] = df["Data"].dt.year
+    df["Mês"] = df["Data"].dt.month
+    totais = {"receitas": 0.0, "despesas_sem_cartao": 0.0, "despesas_cartao": 0.0, "fatura_cartao": 0.0, "saldo": 0.0, "saldo_inicial": 0.0, "saldo_final": 0.0}
+
+    # Tempo e memória em execuções separadas: o tracemalloc deixa a geração
+    # várias vezes mais lenta
+    inicio = time.perf_counter()
+    pdf = gerar_relatorio(df, descrever_periodo("ano", ano, 0), totais, True, True)
+    duracao = time.perf_counter() - inicio
+
+    tracemalloc.start()
+    gerar_relatorio(df, descrever_periodo("ano", ano, 0), totais, True, True)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"linhas": n_linhas, "segundos": duracao, "pico_mib": pico / 2**20, "bytes_pdf": pdf.getbuffer().nbytes}
+
+
+if __name__ == "__main__":
+    print(medir_relatorio_anual())
@@ -0,0 +1,131 @@
+"""Saldo corrente: saldo inicial e final de cada mês a partir de todo o histórico.
+
+O fluxo líquido do mês (receitas - despesas fora do cartão, sem contar o saldo
+informado) sai do índice agregado, menos a fatura do cartão que vence no mês
+(``faturas``). O saldo final de um mês é o saldo inicial
+mais o fluxo, e o saldo inicial é o final do mês anterior, a menos que o
+usuário tenha informado o "Saldo inicial do mês" (que então prevalece).
+
+Com ``P`` a soma acumulada dos fluxos e ``k`` o último mês com saldo
+informado até ``i``::
+
+    inicial[i] = informado[k] + P[i-1] - P[k-1]      (ou P[i-1] sem nenhum k)
+    final[i]   = inicial[i] + fluxo[i]
+
+Tudo em arrays numpy de centavos. Uma alteração num mês passado só recalcula
+o fluxo dos meses em ``agregados.sujos`` e ``faturas.sujos`` e refaz as somas acumuladas; depois
+disso cada consulta é uma indexação.
+"""
+import numpy as np
+
+# Célula do índice agregado que representa o saldo informado pelo usuário
+DESCRICAO_SALDO = "Saldo inicial do mês"
+CELULA_SALDO = ("Receita", "Saldo Inicial", "Saldo")
+
+
+def registro_de_saldo(ano, mes, valor, id_):
+    return {
+        "Id": id_,
+        "Data": f"{int(ano):04d}-{int(mes):02d}-01",
+        "Tipo": CELULA_SALDO[0],
+        "Descrição": DESCRICAO_SALDO,
+        "Valor": float(valor),
+        "Forma de pagamento": CELULA_SALDO[2],
+        "Categoria": CELULA_SALDO[1],
+    }
+
+
+def linhas_de_saldo(df):
+    # Máscara dos lançamentos de saldo informado num DataFrame do ledger
+    return (df["Tipo"] == CELULA_SALDO[0]) & (df["Categoria"] == CELULA_SALDO[1]) & (df["Forma de pagamento"] == CELULA_SALDO[2])
+
+
+def _indice_mes(ano, mes):
+    return int(ano) * 12 + int(mes) - 1
+
+
+def _fluxo_do_mes(celulas):
+    # (fluxo, informado, tem_informado) em centavos
+    fluxo = informado = 0
+    tem_informado = False
+    for chave, (centavos, _) in celulas.items():
+        tipo, _, forma = chave
+        if chave == CELULA_SALDO:
+            informado += centavos
+            tem_informado = True
+        elif tipo == "Receita":
+            fluxo += centavos
+        elif tipo == "Despesa" and forma != "Cartão":
+            fluxo -= centavos
+    return fluxo, informado, tem_informado
+
+
+class SaldoCorrente:
+    def __init__(self, agregados, faturas):
+        self.agregados = agregados
+        self.faturas = faturas
+        self._zerar(0, 0)
+
+    def _zerar(self, inicio, n):
+        self._inicio = inicio
+        self._fluxo = np.zeros(n, dtype=np.int64)
+        self._informado = np.zeros(n, dtype=np.int64)
+        self._tem_informado = np.zeros(n, dtype=bool)
+        self._inicial = np.zeros(n, dtype=np.int64)
+        self._final = np.zeros(n, dtype=np.int64)
+
+    def _atualizar(self):
+        sujos = self.agregados.sujos | self.faturas.sujos
+        if not sujos:
+            return
+        self.agregados.sujos = set()
+        self.faturas.sujos = set()
+        # A fatura das últimas compras pode vencer depois do último mês com lançamentos
+        periodos = sorted(set(self.agregados.periodos()) | set(self.faturas.periodos()))
+        if not periodos:
+            self._zerar(0, 0)
+            return
+
+        inicio, fim = _indice_mes(*periodos[0]), _indice_mes(*periodos[-1]) + 1
+        if inicio != self._inicio or fim - inicio != len(self._fluxo):
+            # O intervalo de meses mudou: refaz os arrays e recalcula todos os meses
+            self._zerar(inicio, fim - inicio)
+            sujos = periodos
+        for ano, mes in sujos:
+            i = _indice_mes(ano, mes) - inicio
+            if 0 <= i < len(self._fluxo):
+                fluxo, self._informado[i], self._tem_informado[i] = _fluxo_do_mes(self.agregados.celulas(ano, mes))
+                self._fluxo[i] = fluxo - self.faturas.centavos(ano, mes)
+
+        acumulado = np.cumsum(self._fluxo)
+        anterior = np.concatenate(([0], acumulado[:-1]))
+        ultimo = np.maximum.accumulate(np.where(self._tem_informado, np.arange(len(self._fluxo)), -1))
+        k = np.maximum(ultimo, 0)
+        base = np.where(ultimo >= 0, self._informado[k] - anterior[k], 0)
+        self._inicial = base + anterior
+        self._final = self._inicial + self._fluxo
+
+    def _posicao(self, ano, mes):
+        self._atualizar()
+        return _indice_mes(ano, mes) - self._inicio
+
+    def inicial(self, ano, mes):
+        i = self._posicao(ano, mes)
+        if not len(self._inicial) or i < 0:
+            return 0.0
+        if i >= len(self._inicial):
+            return int(self._final[-1]) / 100
+        return int(self._inicial[i]) / 100
+
+    def final(self, ano, mes):
+        i = self._posicao(ano, mes)
+        if not len(self._final) or i < 0:
+            return 0.0
+        return int(self._final[min(i, len(self._final) - 1)]) / 100
+
+    def informado(self, ano, mes):
+        # Saldo informado pelo usuário no mês ou None (saldo transportado)
+        i = self._posicao(ano, mes)
+        if 0 <= i < len(self._tem_informado) and self._tem_informado[i]:
+            return int(self._informado[i]) / 100
+        return None
@@ -0,0 +1,76 @@
+"""Tendências de vários anos por categoria: variação mês a mês e ano a ano,
+média móvel de 12 meses e categorias que mais cresceram.
+
+Tudo parte do índice agregado (que já tem o total de cada mês por categoria
+para todo o histórico), então não há varredura das transações: a matriz
+meses x categorias é montada com um groupby, completada com ``resample`` e as
+variações são operações vetorizadas sobre ela. O resultado fica em cache no
+``Ledger`` enquanto a revisão do índice não mudar.
+"""
+import numpy as np
+import pandas as pd
+
+from .saldos import CELULA_SALDO
+
+
+def matriz_mensal(agregados, tipo):
+    # DataFrame (primeiro dia do mês x categoria) com os totais em reais,
+    # incluindo os meses sem lançamentos (zero)
+    linhas = [
+        (ano, mes, categoria, centavos)
+        for ano, mes in agregados.periodos()
+        for (t, categoria, forma), (centavos, _) in agregados.celulas(ano, mes).items()
+        if t == tipo and (t, categoria, forma) != CELULA_SALDO
+    ]
+    if not linhas:
+        return pd.DataFrame(dtype=float)
+    base = pd.DataFrame(linhas, columns=["Ano", "Mês", "Categoria", "Centavos"])
+    base["Mês"] = pd.to_datetime(dict(year=base["Ano"], month=base["Mês"], day=1))
+    matriz = base.groupby(["Mês", "Categoria"])["Centavos"].sum().unstack(fill_value=0)
+    return matriz.resample("MS").sum() / 100
+
+
+def _variacao(matriz, periodos):
+    # Variação percentual; sem base (mês anterior zerado) fica NaN
+    variacao = matriz.pct_change(periods=periodos, fill_method=None) * 100
+    return variacao.replace([np.inf, -np.inf], np.nan)
+
+
+def crescimento(matriz, janela=None):
+    # Soma das categorias nos últimos ``janela`` meses contra os ``janela``
+    # anteriores. Padrão: 12 meses com dois anos de histórico, senão metade dele
+    if matriz.empty:
+        return pd.DataFrame(columns=["Atual", "Anterior", "Diferença", "Variação %"])
+    if janela is None:
+        janela = 12 if len(matriz) >= 24 else max(1, len(matriz) // 2)
+    atual = matriz.iloc[-janela:].sum()
+    anterior = matriz.iloc[-2 * janela:-janela].sum()
+    tabela = pd.DataFrame({"Atual": atual, "Anterior": anterior, "Diferença": atual - anterior})
+    tabela["Variação %"] = (tabela["Diferença"] / tabela["Anterior"].where(tabela["Anterior"] != 0) * 100)
+    return tabela.sort_values("Diferença", ascending=False)
+
+
+def calcular(agregados, tipo):
+    matriz = matriz_mensal(agregados, tipo)
+    if not matriz.empty:
+        matriz["Total"] = matriz.sum(axis=1)
+    return {
+        "mensal": matriz,
+        "variacao_mensal": _variacao(matriz, 1),
+        "variacao_anual": _variacao(matriz, 12),
+        "media_12m": matriz.rolling(12, min_periods=1).mean(),
+        "crescimento": crescimento(matriz.drop(columns="Total", errors="ignore")),
+    }
+
+
+def resumo_do_mes(tendencias, ano, mes):
+    # Uma linha por categoria: total do mês, variações e média de 12 meses
+    data = pd.Timestamp(int(ano), int(mes), 1)
+    if tendencias["mensal"].empty or data not in tendencias["mensal"].index:
+        return pd.DataFrame(columns=["Total", "Mês a mês %", "Ano a ano %", "Média 12 meses"])
+    return pd.DataFrame({
+        "Total": tendencias["mensal"].loc[data],
+        "Mês a mês %": tendencias["variacao_mensal"].loc[data],
+        "Ano a ano %": tendencias["variacao_anual"].loc[data],
+        "Média 12 meses": tendencias["media_12m"].loc[data],
+    }).sort_values("Total", ascending=False)
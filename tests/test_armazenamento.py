@@ -0,0 +1,31 @@
+"""Snapshot + journal: compactação e revisões."""
+
+import pytest
+
+from financeiro import armazenamento
+
+
+def registro(id_, valor=10.0):
+    return {"Id": id_, "Data": "2025-03-10", "Tipo": "Despesa", "Descrição": f"Compra {id_}", "Valor": valor, "Forma de pagamento": "Pix", "Categoria": "Outros"}
+
+
+def test_compactacao_nao_apaga_historico_se_o_snapshot_nao_abre(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    armazenamento.inserir(arquivo, registro("a"))
+    armazenamento.compactar(arquivo)
+    armazenamento.inserir(arquivo, registro("b"))
+
+    with open(arquivo, "ab") as f:
+        f.write(b"\xff\xfe;\xe9\n")
+    with open(arquivo, "rb") as f:
+        snapshot = f.read()
+    with open(armazenamento.caminho_journal(arquivo), "rb") as f:
+        journal = f.read()
+
+    with pytest.raises(Exception):
+        armazenamento.compactar(arquivo)
+
+    with open(arquivo, "rb") as f:
+        assert f.read() == snapshot
+    with open(armazenamento.caminho_journal(arquivo), "rb") as f:
+        assert f.read() == journal
@@ -0,0 +1,70 @@
+"""Resumos por partição do backend parquet (agregados e cartão por dia)."""
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from financeiro.agregados import agregar_mensal
+from financeiro.backends import abrir_backend
+from financeiro.esquema import COLUNAS
+from financeiro.faturas import agregar_cartao
+
+EMAIL = "teste@exemplo.com"
+
+
+def registro(id_, data, valor, forma, tipo="Despesa"):
+    return {"Id": id_, "Data": data, "Tipo": tipo, "Descrição": f"Compra {id_}", "Valor": valor, "Forma de pagamento": forma, "Categoria": "Outros"}
+
+
+REGISTROS = [
+    registro("a", "2025-02-03", 10.0, "Cartão"),
+    registro("b", "2025-02-20", 2.5, "Pix"),
+    registro("c", "2025-03-10", 100.0, "Cartão"),
+    registro("d", "2025-03-10", 7.0, "Pix", "Receita"),
+]
+
+
+def esperado(registros):
+    df = pd.DataFrame(registros, columns=COLUNAS)
+    return agregar_mensal(df), agregar_cartao(df)
+
+
+def assert_resumos(backend, registros):
+    agregados, cartao = esperado(registros)
+    chave = ["Ano", "Mês", "Tipo", "Categoria", "Forma de pagamento"]
+    obtido = backend.agregados_mensais().sort_values(chave, ignore_index=True)
+    assert obtido.astype(str).equals(agregados.sort_values(chave, ignore_index=True).astype(str))
+    assert backend.cartao_por_dia().sort_values("Data", ignore_index=True).equals(cartao)
+
+
+def test_resumos_vem_do_arquivo_sem_ler_as_particoes(tmp_path, monkeypatch):
+    abrir_backend(EMAIL, "parquet", tmp_path).inserir(*REGISTROS)
+    novo = abrir_backend(EMAIL, "parquet", tmp_path)
+    monkeypatch.setattr(novo, "_ler_particao", lambda ano, mes: pytest.fail("partição lida"))
+    assert_resumos(novo, REGISTROS)
+
+
+def test_resumo_ausente_ou_de_outra_versao_da_particao_e_ignorado(tmp_path):
+    backend = abrir_backend(EMAIL, "parquet", tmp_path)
+    backend.inserir(*REGISTROS)
+    os.remove(backend._caminho_resumo(2025, 2))
+    # Partição regravada por fora: o resumo.json de março fica velho
+    marco = pd.DataFrame(REGISTROS[2:] + [registro("e", "2025-03-11", 1.0, "Cartão")], columns=COLUNAS)
+    marco.to_parquet(backend._caminho_particao(2025, 3), index=False)
+
+    assert_resumos(abrir_backend(EMAIL, "parquet", tmp_path), REGISTROS[:2] + marco.to_dict("records"))
+
+
+def test_resumos_acompanham_escritas(tmp_path):
+    backend = abrir_backend(EMAIL, "parquet", tmp_path)
+    backend.inserir(*REGISTROS)
+    backend.agregados_mensais()
+    outro = abrir_backend(EMAIL, "parquet", tmp_path)
+    outro.excluir("b")
+    outro.inserir(registro("a", "2025-04-01", 30.0, "Cartão"))
+
+    restantes = [registro("a", "2025-04-01", 30.0, "Cartão")] + REGISTROS[2:]
+    assert_resumos(backend, restantes)
+    assert not os.path.exists(backend._caminho_resumo(2025, 2))
@@ -0,0 +1,30 @@
+"""Leitura de extratos: colunas e convenção de sinal."""
+from financeiro import importacao
+
+FATURA_CARTAO = "date,title,amount\n2025-03-02,Mercado Bom Preço,120.50\n2025-03-05,Pagamento recebido,-300.00\n"
+EXTRATO_CONTA = "Data;Histórico;Valor\n02/03/2025;Padaria;-12,30\n05/03/2025;Salário;5000,00\n"
+
+
+def test_fatura_do_cartao_em_csv_tem_compras_positivas():
+    df = importacao.ler_extrato(FATURA_CARTAO, "fatura.csv", "Cartão")
+    assert list(df["Descrição"]) == ["Mercado Bom Preço", "Pagamento recebido"]
+    assert list(df["Tipo"]) == ["Despesa", "Receita"]
+    assert list(df["Valor"]) == [120.5, 300.0]
+
+
+def test_extrato_de_conta_tem_debitos_negativos():
+    df = importacao.ler_extrato(EXTRATO_CONTA, "extrato.csv", "Pix")
+    assert list(df["Tipo"]) == ["Despesa", "Receita"]
+
+
+def test_convencao_de_sinal_informada_vence_o_padrao():
+    df = importacao.ler_extrato(FATURA_CARTAO, "fatura.csv", "Transferência", despesas_positivas=True)
+    assert list(df["Tipo"]) == ["Despesa", "Receita"]
+    df = importacao.ler_extrato(EXTRATO_CONTA, "extrato.csv", "Cartão", despesas_positivas=False)
+    assert list(df["Tipo"]) == ["Despesa", "Receita"]
+
+
+def test_cabecalhos_e_categorias_sem_acentos():
+    df = importacao.ler_extrato("DATA;Histórico ;Valor (R$)\n02/03/2025;AÇOUGUE São João;-40,00\n", "extrato.csv", "Pix")
+    assert list(df["Descrição"]) == ["AÇOUGUE São João"]
+    assert list(df["Categoria"]) == ["Alimentação"]
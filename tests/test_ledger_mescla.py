@@ -0,0 +1,96 @@
+"""Ledger em memória x disco quando outro processo grava no mesmo usuário.
+
+O "outro processo" é um segundo backend aberto no mesmo arquivo, que não
+compartilha nada com o ledger testado além do disco.
+"""
+import pytest
+
+from financeiro.backends import abrir_backend
+from financeiro.ledger import Ledger
+
+EMAIL = "teste@exemplo.com"
+
+
+def registro(id_, data="2025-03-10", valor=10.0, forma="Pix", tipo="Despesa"):
+    return {
+        "Id": id_,
+        "Data": data,
+        "Tipo": tipo,
+        "Descrição": f"Compra {id_}",
+        "Valor": valor,
+        "Forma de pagamento": forma,
+        "Categoria": "Outros",
+    }
+
+
+def assert_igual_ao_disco(ledger, tipo, base_dir, periodos):
+    novo = Ledger(abrir_backend(EMAIL, tipo, base_dir))
+    for periodo in periodos:
+        assert ledger.totais(*periodo) == novo.totais(*periodo)
+        assert ledger.saldo_final(*periodo) == novo.saldo_final(*periodo)
+    assert ledger.faturas_do_cartao().equals(novo.faturas_do_cartao())
+
+
+@pytest.mark.parametrize("mes_carregado", [False, True])
+def test_inserir_com_mescla_nao_conta_duas_vezes(tmp_path, mes_carregado):
+    ledger = Ledger(abrir_backend(EMAIL, "csv", tmp_path))
+    ledger.inserir(registro("a", valor=1.0))
+    if mes_carregado:
+        ledger.mes(2025, 3)
+
+    abrir_backend(EMAIL, "csv", tmp_path).inserir(registro("b", valor=10.0, forma="Cartão"))
+    ledger.inserir(registro("c", valor=100.0), registro("d", valor=5.0, forma="Cartão"))
+
+    assert ledger.totais(2025, 3)["despesas_sem_cartao"] == 101.0
+    assert ledger.totais(2025, 3)["despesas_cartao"] == 15.0
+    assert sorted(ledger.mes(2025, 3)["Id"]) == ["a", "b", "c", "d"]
+    assert_igual_ao_disco(ledger, "csv", tmp_path, [(2025, 3), (2025, 4), (2025, 5)])
+
+
+@pytest.mark.parametrize("mes_carregado", [False, True])
+def test_excluir_com_mescla_nao_desconta_duas_vezes(tmp_path, mes_carregado):
+    ledger = Ledger(abrir_backend(EMAIL, "csv", tmp_path))
+    ledger.inserir(registro("a", valor=1.0), registro("c", valor=100.0, forma="Cartão"))
+    if mes_carregado:
+        ledger.mes(2025, 3)
+
+    abrir_backend(EMAIL, "csv", tmp_path).inserir(registro("b", valor=10.0))
+    ledger.excluir("c")
+
+    assert ledger.totais(2025, 3)["despesas_sem_cartao"] == 11.0
+    assert ledger.totais(2025, 3)["despesas_cartao"] == 0.0
+    assert sorted(ledger.mes(2025, 3)["Id"]) == ["a", "b"]
+    assert_igual_ao_disco(ledger, "csv", tmp_path, [(2025, 3), (2025, 4)])
+
+
+@pytest.mark.parametrize("tipo", ["csv", "sqlite", "parquet"])
+def test_escrita_apos_escrita_externa_nao_esconde_a_externa(tmp_path, tipo):
+    if tipo == "parquet":
+        pytest.importorskip("pyarrow")
+    from financeiro import cache_ledgers
+
+    cache_ledgers.limpar()
+    try:
+        ledger = cache_ledgers.obter_ledger(EMAIL, tipo, tmp_path)
+        ledger.inserir(registro("a", valor=1.0))
+
+        abrir_backend(EMAIL, tipo, tmp_path).inserir(registro("b", valor=10.0))
+        ledger.inserir(registro("c", valor=100.0))
+
+        atual = cache_ledgers.obter_ledger(EMAIL, tipo, tmp_path)
+        assert atual.totais(2025, 3)["despesas_sem_cartao"] == 111.0
+        assert sorted(atual.mes(2025, 3)["Id"]) == ["a", "b", "c"]
+        assert_igual_ao_disco(atual, tipo, tmp_path, [(2025, 3)])
+    finally:
+        cache_ledgers.limpar()
+
+
+def test_regra_apos_escrita_externa_recarrega(tmp_path):
+    from financeiro import recorrencias
+
+    ledger = Ledger(abrir_backend(EMAIL, "sqlite", tmp_path))
+    abrir_backend(EMAIL, "sqlite", tmp_path).inserir(registro("b", valor=10.0))
+    ledger.salvar_regra(recorrencias.nova_regra("Despesa", "Internet", 100, "Boleto", "Internet", "2025-03-05", fim="2025-03"))
+
+    assert ledger.totais(2025, 3)["despesas_sem_cartao"] == 110.0
+    assert ledger.versao == ledger.versao_no_disco()
@@ -0,0 +1,29 @@
+"""Migração dos CSVs (snapshot + journal) para SQLite e Parquet."""
+import pytest
+
+from financeiro import armazenamento
+from financeiro.backends import abrir_backend, migrar_csvs
+from financeiro.ledger import Ledger
+
+EMAIL = "teste@exemplo.com"
+
+
+def registro(id_, data, valor):
+    return {"Id": id_, "Data": data, "Tipo": "Despesa", "Descrição": f"Compra {id_}", "Valor": valor, "Forma de pagamento": "Pix", "Categoria": "Outros"}
+
+
+@pytest.mark.parametrize("tipo", ["sqlite", "parquet"])
+@pytest.mark.parametrize("compactado", [False, True])
+def test_migracao_copia_snapshot_e_journal(tmp_path, tipo, compactado):
+    if tipo == "parquet":
+        pytest.importorskip("pyarrow")
+    origem = Ledger(abrir_backend(EMAIL, "csv", tmp_path))
+    origem.inserir(registro("a", "2025-01-10", 10.0), registro("b", "2025-02-10", 20.0))
+    if compactado:
+        armazenamento.compactar(origem.backend.arquivo)
+        origem.inserir(registro("c", "2025-02-11", 5.0))
+
+    assert migrar_csvs(tipo, str(tmp_path)) == 1
+    migrado = Ledger(abrir_backend(EMAIL, tipo, tmp_path))
+    for periodo in [(2025, 1), (2025, 2)]:
+        assert migrado.totais(*periodo) == origem.totais(*periodo)
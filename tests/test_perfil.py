@@ -0,0 +1,42 @@
+"""Log de reruns: rotação e percentis pelo final do arquivo."""
+import json
+
+from financeiro import perfil
+
+
+def registro(total_ms, usuario="u"):
+    return {"usuario": usuario, "total_ms": total_ms, "fases_ms": {}, "contadores": {}}
+
+
+def test_percentis_do_usuario(tmp_path):
+    caminho = str(tmp_path / "perfil.jsonl")
+    for ms in range(1, 101):
+        perfil.registrar(registro(float(ms)), caminho)
+    perfil.registrar(registro(9999.0, "outro"), caminho)
+
+    estatisticas = perfil.percentis(caminho, "u")
+    assert estatisticas["n"] == 100
+    assert estatisticas["p50_ms"] == 50.5
+    assert perfil.percentis(str(tmp_path / "ausente.jsonl")) == {"n": 0, "p50_ms": None, "p95_ms": None}
+
+
+def test_percentis_leem_so_o_final(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfil, "BYTES_PERCENTIS", 1000)
+    caminho = str(tmp_path / "perfil.jsonl")
+    with open(caminho, "w", encoding="utf-8") as f:
+        for ms in range(500):
+            f.write(json.dumps(registro(float(ms))) + "\n")
+
+    estatisticas = perfil.percentis(caminho)
+    assert 0 < estatisticas["n"] < 500
+    assert estatisticas["p95_ms"] > 490
+
+
+def test_log_rotaciona_acima_do_limite(tmp_path, monkeypatch):
+    monkeypatch.setattr(perfil, "TAMANHO_MAXIMO_LOG", 500)
+    caminho = str(tmp_path / "perfil.jsonl")
+    for ms in range(50):
+        perfil.registrar(registro(float(ms)), caminho)
+
+    assert (tmp_path / "perfil.jsonl").stat().st_size < 600
+    assert (tmp_path / "perfil.jsonl.1").exists()
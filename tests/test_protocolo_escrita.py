@@ -0,0 +1,179 @@
+"""Protocolo de escrita concorrente: revisão esperada, mescla, conflito e
+compactação; e o ledger incremental igual a um recém-carregado em todos os
+backends."""
+import pytest
+
+from financeiro import armazenamento, recorrencias
+from financeiro.backends import BackendCSV, abrir_backend
+from financeiro.ledger import Ledger
+
+EMAIL = "teste@exemplo.com"
+BACKENDS = ["csv", "sqlite", "parquet"]
+
+
+def registro(id_, data="2025-03-10", valor=10.0, forma="Pix", tipo="Despesa", categoria="Outros"):
+    return {"Id": id_, "Data": data, "Tipo": tipo, "Descrição": f"Compra {id_}", "Valor": valor, "Forma de pagamento": forma, "Categoria": categoria}
+
+
+def ids_no_disco(arquivo):
+    return sorted(r["Id"] for r in armazenamento.carregar_gastos(arquivo))
+
+
+# -----------------------------
+# armazenamento
+# -----------------------------
+def test_escrita_desatualizada_recebe_os_eventos_que_faltam(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    conhecida = armazenamento.inserir(arquivo, registro("a"))
+    armazenamento.inserir(arquivo, registro("b"))
+    armazenamento.excluir(arquivo, "a")
+    recebidos = []
+
+    nova = armazenamento.inserir(arquivo, registro("c"), revisao_esperada=conhecida, mesclar=lambda eventos, atual: recebidos.append((eventos, atual)))
+
+    (eventos, atual), = recebidos
+    assert [(e["op"], e["rev"]) for e in eventos] == [("inserir", conhecida + 1), ("excluir", conhecida + 2)]
+    assert atual == conhecida + 2 and nova == conhecida + 3
+    assert ids_no_disco(arquivo) == ["b", "c"]
+
+
+def test_sem_mescla_a_escrita_desatualizada_e_recusada(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    conhecida = armazenamento.inserir(arquivo, registro("a"))
+    armazenamento.inserir(arquivo, registro("b"))
+
+    with pytest.raises(armazenamento.RevisaoDesatualizada) as erro:
+        armazenamento.inserir(arquivo, registro("c"), revisao_esperada=conhecida)
+    assert erro.value.atual == conhecida + 1
+    assert ids_no_disco(arquivo) == ["a", "b"]
+
+
+def test_conflito_na_mescla_nao_grava_nada(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    conhecida = armazenamento.inserir(arquivo, registro("a"))
+    armazenamento.atualizar(arquivo, registro("a", valor=20.0))
+
+    def mesclar(eventos, atual):
+        raise armazenamento.ConflitoDeEscrita(["a"])
+
+    with pytest.raises(armazenamento.ConflitoDeEscrita):
+        armazenamento.excluir(arquivo, "a", revisao_esperada=conhecida, mesclar=mesclar)
+    assert armazenamento.revisao(arquivo) == conhecida + 1
+    assert ids_no_disco(arquivo) == ["a"]
+
+
+def test_escrita_depois_da_compactacao_e_desatualizada(tmp_path):
+    # Os eventos que faltam saíram do journal: a mescla não é possível
+    arquivo = str(tmp_path / "gastos.csv")
+    conhecida = armazenamento.inserir(arquivo, registro("a"))
+    armazenamento.inserir(arquivo, registro("b"))
+    armazenamento.compactar(arquivo)
+
+    with pytest.raises(armazenamento.RevisaoDesatualizada):
+        armazenamento.inserir(arquivo, registro("c"), revisao_esperada=conhecida, mesclar=lambda eventos, atual: pytest.fail("mesclou"))
+    assert ids_no_disco(arquivo) == ["a", "b"]
+
+
+# -----------------------------
+# BackendCSV
+# -----------------------------
+def test_backend_rele_o_arquivo_quando_os_eventos_foram_compactados(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    nosso, outro = BackendCSV(arquivo), BackendCSV(arquivo)
+    nosso.inserir(registro("a"))
+    outro.inserir(registro("b", data="2025-04-02"))
+    armazenamento.compactar(arquivo)
+
+    alterados = nosso.inserir(registro("c"))
+
+    assert (2025, 4) in alterados
+    assert sorted(r["Id"] for r in nosso.carregar()) == ["a", "b", "c"]
+    assert ids_no_disco(arquivo) == ["a", "b", "c"]
+
+
+def test_backend_recusa_alterar_registro_alterado_em_outra_sessao(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    nosso, outro = BackendCSV(arquivo), BackendCSV(arquivo)
+    nosso.inserir(registro("a"))
+    outro.carregar()
+    outro.atualizar(registro("a", valor=20.0))
+
+    with pytest.raises(armazenamento.ConflitoDeEscrita):
+        nosso.atualizar(registro("a", valor=30.0))
+    # A memória passa a refletir o disco
+    assert [r["Valor"] for r in nosso.carregar()] == [20.0]
+
+
+def test_exclusao_do_mesmo_registro_nas_duas_sessoes_nao_e_conflito(tmp_path):
+    arquivo = str(tmp_path / "gastos.csv")
+    nosso, outro = BackendCSV(arquivo), BackendCSV(arquivo)
+    nosso.inserir(registro("a"), registro("b"))
+    outro.carregar()
+    outro.excluir("a")
+
+    nosso.excluir("a", "b")
+    assert ids_no_disco(arquivo) == []
+
+
+# -----------------------------
+# Ledger incremental x recém-carregado
+# -----------------------------
+def assert_igual_a_recem_carregado(ledger, tipo, base_dir):
+    novo = Ledger(abrir_backend(EMAIL, tipo, base_dir))
+    assert ledger.periodos == novo.periodos
+    for periodo in sorted(novo.periodos):
+        assert ledger.totais(*periodo) == novo.totais(*periodo)
+        assert ledger.saldo_final(*periodo) == novo.saldo_final(*periodo)
+        assert ledger.por_categoria(*periodo, "Despesa").to_dict() == novo.por_categoria(*periodo, "Despesa").to_dict()
+        assert sorted(ledger.mes(*periodo)["Id"]) == sorted(novo.mes(*periodo)["Id"])
+    assert ledger.faturas_do_cartao().equals(novo.faturas_do_cartao())
+
+
+@pytest.mark.parametrize("tipo", BACKENDS)
+def test_totais_incrementais_iguais_aos_do_disco(tmp_path, tipo):
+    if tipo == "parquet":
+        pytest.importorskip("pyarrow")
+    ledger = Ledger(abrir_backend(EMAIL, tipo, tmp_path))
+    ledger.inserir(
+        registro("a", "2025-01-20", 1234.56, tipo="Receita", categoria="Salário"),
+        registro("b", "2025-01-24", 99.99, "Cartão"),
+        registro("c", "2025-01-27", 0.01, "Cartão", categoria="Lazer"),
+        registro("d", "2025-02-10", 300.10),
+    )
+    ledger.mes(2025, 1)
+    # Atualização que muda de mês e de forma de pagamento
+    ledger.inserir(registro("b", "2025-02-26", 50.05, "Pix"))
+    assert ledger.totais(2025, 1)["despesas_cartao"] == 0.01
+    assert "b" not in set(ledger.mes(2025, 1)["Id"])
+    assert_igual_a_recem_carregado(ledger, tipo, tmp_path)
+    ledger.excluir("d")
+    ledger.salvar_regra(recorrencias.nova_regra("Despesa", "Celular", 1200, "Cartão", "Internet", "2025-01-15", parcelas=3))
+    ledger.configurar_cartao(10, 20)
+    ledger.inserir(registro("e", "2025-03-31", 7.77, "Cartão"))
+    ocorrencia = sorted(i for i in ledger.mes(2025, 2)["Id"] if recorrencias.eh_ocorrencia(i))[0]
+    ledger.excluir(ocorrencia)
+
+    assert_igual_a_recem_carregado(ledger, tipo, tmp_path)
+
+
+@pytest.mark.parametrize("tipo", BACKENDS)
+@pytest.mark.parametrize("mes_carregado", [False, True])
+def test_regravar_um_id_substitui_a_versao_antiga(tmp_path, tipo, mes_carregado):
+    if tipo == "parquet":
+        pytest.importorskip("pyarrow")
+    ledger = Ledger(abrir_backend(EMAIL, tipo, tmp_path))
+    ledger.inserir(registro("a", valor=99.99), registro("b", "2025-04-01", 5.0, "Cartão"))
+    if mes_carregado:
+        ledger.mes(2025, 3)
+        ledger.mes(2025, 4)
+
+    ledger.inserir(registro("a", valor=10.0))
+    assert ledger.totais(2025, 3)["despesas_sem_cartao"] == 10.0
+    assert list(ledger.mes(2025, 3)["Valor"]) == [10.0]
+
+    # Sai do único lançamento de abril: o mês deixa de existir
+    ledger.inserir(registro("b", "2025-03-20", 5.0, "Pix"))
+    assert (2025, 4) not in ledger.periodos
+    assert ledger.totais(2025, 3)["despesas_sem_cartao"] == 15.0
+    assert ledger.faturas_do_cartao().empty
+    assert_igual_a_recem_carregado(ledger, tipo, tmp_path)
@@ -0,0 +1,26 @@
+"""Regras de recorrentes e parcelados."""
+from financeiro import recorrencias
+from financeiro.backends import abrir_backend
+from financeiro.ledger import Ledger
+
+EMAIL = "teste@exemplo.com"
+
+
+def test_arquivo_de_regras_ilegivel_abre_sem_regras_e_e_preservado(tmp_path, capsys):
+    backend = abrir_backend(EMAIL, "csv", tmp_path)
+    conteudo = '{"regras": [{"Id": "x", "Tipo": "Desp'
+    with open(backend.caminho_regras, "w", encoding="utf-8") as f:
+        f.write(conteudo)
+
+    ledger = Ledger(backend)
+    assert ledger.regras_ativas() == []
+    assert "regras" in capsys.readouterr().out
+    with open(backend.caminho_regras, encoding="utf-8") as f:
+        assert f.read() == conteudo
+
+    # A próxima alteração grava as regras novas e guarda o arquivo ilegível
+    regra = recorrencias.nova_regra("Despesa", "Internet", 100, "Boleto", "Internet", "2025-03-05", fim="2025-03")
+    ledger.salvar_regra(regra)
+    assert [r["Id"] for r in Ledger(backend).regras_ativas()] == [regra["Id"]]
+    with open(backend.caminho_regras + ".ilegivel", encoding="utf-8") as f:
+        assert f.read() == conteudo
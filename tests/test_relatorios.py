@@ -0,0 +1,134 @@
+"""Totais do PDF e do lote x saldo corrente do ledger."""
+import os
+
+import pandas as pd
+import pytest
+
+from financeiro import lote, relatorios, saldos
+from financeiro.backends import abrir_backend, hash_usuario, usuarios
+from financeiro.ledger import Ledger
+
+EMAIL = "teste@exemplo.com"
+
+
+def despesa(id_, data, valor):
+    return {"Id": id_, "Data": data, "Tipo": "Despesa", "Descrição": f"Compra {id_}", "Valor": valor, "Forma de pagamento": "Pix", "Categoria": "Outros"}
+
+
+def receita(id_, data, valor):
+    return dict(despesa(id_, data, valor), Tipo="Receita", Categoria="Salário")
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    # Janeiro com saldo informado; fevereiro transporta o saldo de janeiro
+    ledger = Ledger(abrir_backend(EMAIL, "csv", tmp_path))
+    ledger.inserir(
+        saldos.registro_de_saldo(2025, 1, 1000, "s1"),
+        receita("r1", "2025-01-05", 200.0),
+        despesa("d1", "2025-01-10", 300.0),
+        receita("r2", "2025-02-05", 500.0),
+        despesa("d2", "2025-02-10", 50.0),
+    )
+    return ledger
+
+
+def test_mes_com_saldo_transportado(ledger):
+    assert ledger.saldo_inicial(2025, 2) == 900.0 and ledger.saldo_final(2025, 2) == 1350.0
+    _, totais = relatorios.dados_do_periodo(ledger, "mes", 2025, 2)
+    assert totais["saldo_inicial"] == 900.0
+    assert totais["saldo_final"] == 1350.0
+    assert totais["receitas"] == 500.0
+
+
+def test_saldo_informado_nao_entra_nas_receitas(ledger):
+    _, totais = relatorios.dados_do_periodo(ledger, "mes", 2025, 1)
+    assert totais["receitas"] == 200.0
+    assert (totais["saldo_inicial"], totais["saldo_final"]) == (1000.0, 900.0)
+
+
+def test_trimestre_com_saldo_informado_em_todos_os_meses(tmp_path):
+    ledger = Ledger(abrir_backend(EMAIL, "csv", tmp_path))
+    ledger.inserir(
+        saldos.registro_de_saldo(2025, 1, 1000, "s1"),
+        saldos.registro_de_saldo(2025, 2, 900, "s2"),
+        saldos.registro_de_saldo(2025, 3, 900, "s3"),
+        despesa("d1", "2025-03-10", 100.0),
+    )
+    _, totais = relatorios.dados_do_periodo(ledger, "trimestre", 2025, 1)
+    assert totais["receitas"] == 0.0
+    assert totais["despesas_sem_cartao"] == 100.0
+    assert totais["saldo_inicial"] == ledger.saldo_inicial(2025, 1) == 1000.0
+    assert totais["saldo_final"] == ledger.saldo_final(2025, 3) == 800.0
+
+
+def test_ano_comeca_e_termina_em_meses_sem_lancamentos(ledger):
+    _, totais = relatorios.dados_do_periodo(ledger, "ano", 2025, 0)
+    assert totais["saldo_inicial"] == 1000.0
+    assert totais["saldo_final"] == ledger.saldo_final(2025, 12) == 1350.0
+
+
+def test_resumo_do_lote_usa_o_saldo_corrente(ledger, tmp_path):
+    saida = tmp_path / "saida"
+    usuario, _ = lote.processar_usuario(str(tmp_path), hash_usuario(EMAIL), 2025, saida=str(saida), anual=False, tipo="csv")
+    resumo = pd.read_csv(os.path.join(saida, usuario, "resumo_2025.csv"), sep=";")
+    fevereiro = resumo[resumo["Mês"] == 2].iloc[0]
+    assert fevereiro["Saldo Inicial"] == 900.0
+    assert fevereiro["Saldo Final"] == ledger.saldo_final(2025, 2)
+    assert resumo[resumo["Mês"] == 1].iloc[0]["Receitas"] == 200.0
+
+
+def test_lote_le_o_backend_configurado(ledger, tmp_path):
+    # O CSV do fixture fica para trás, como depois de uma migração
+    Ledger(abrir_backend(EMAIL, "sqlite", tmp_path)).inserir(
+        saldos.registro_de_saldo(2025, 1, 1000, "s1"), receita("r3", "2025-03-05", 70.0))
+
+    saida = tmp_path / "saida"
+    resultado = lote.gerar_lote(str(tmp_path), 2025, 3, str(saida), processos=1, progresso=lambda _: None, tipo="sqlite")
+
+    assert resultado == {"usuarios": 1, "pdfs": 1, "erros": []}
+    resumo = pd.read_csv(saida / hash_usuario(EMAIL) / "resumo_2025_03.csv", sep=";")
+    assert resumo.iloc[0]["Receitas"] == 70.0
+    assert resumo.iloc[0]["Saldo Final"] == 1070.0
+
+
+def test_usuarios_de_cada_backend(ledger, tmp_path):
+    assert usuarios("csv", str(tmp_path)) == [hash_usuario(EMAIL)]
+    assert usuarios("sqlite", str(tmp_path)) == []
+
+
+
+def test_chave_do_pdf_nao_le_as_transacoes(ledger, monkeypatch):
+    novo = Ledger(ledger.backend)
+    monkeypatch.setattr(novo, "mes", lambda *a: pytest.fail("mês carregado para montar a chave"))
+    chave = relatorios.chave_periodo(novo, "ano", 2025, 0)
+
+    assert chave == relatorios.chave_periodo(novo, "ano", 2025, 0)
+    assert chave != relatorios.chave_periodo(novo, "trimestre", 2025, 1)
+    ledger.inserir(despesa("d3", "2025-02-11", 1.0))
+    assert relatorios.chave_periodo(ledger, "ano", 2025, 0) != chave
+
+
+def test_pdf_solicitado_fica_em_cache_pela_chave(ledger):
+    chave = relatorios.chave_periodo(ledger, "mes", 2025, 2)
+    dados = relatorios.solicitar_relatorio(ledger, "mes", 2025, 2).result()
+    assert dados.startswith(b"%PDF")
+    assert relatorios.pdf_em_cache(chave) == dados
+
+
+def test_subtotal_do_mes_nao_cai_na_margem_inferior(monkeypatch):
+    alturas = []
+    desenhar = relatorios._desenhar_subtotal
+    monkeypatch.setattr(relatorios, "_desenhar_subtotal", lambda c, w, y, *a: (alturas.append(y), desenhar(c, w, y, *a)))
+    totais = relatorios.somar_totais([])
+    for n in range(1, 90):
+        # ``n`` linhas em janeiro e uma em fevereiro: em algum ``n`` a troca de
+        # mês cai no fim da página
+        datas = pd.to_datetime(["2025-01-15"] * n + ["2025-02-15"])
+        df = pd.DataFrame({
+            "Data": datas, "Tipo": "Despesa", "Descrição": "x", "Valor": 1.0,
+            "Forma de pagamento": "Pix", "Categoria": "Outros",
+            "Data Formatada": datas.strftime("%d/%m/%Y"), "Ano": datas.year, "Mês": datas.month,
+        })
+        relatorios.gerar_relatorio(df, "2025", totais, subtotais_mensais=True)
+    assert min(alturas) >= 60